@@ -0,0 +1,243 @@
+"""
+Compiled kernels for the weighted sums over energy bins, used when numba is installed.
+
+Each kernel fuses a NumPy expression that would otherwise allocate (rows, bins) temporaries into one loop over the
+bins, and runs in parallel over the rows (spectra, trials or filter stacks). Without numba, `njit` leaves the
+kernels as plain Python functions, which are only meant for testing, and the 'auto' backend selects NumPy.
+
+Compiled and NumPy results differ only by the order of the floating point additions: they agree to a relative
+tolerance of `TOLERANCE`. Statistics computed from deviations from the mean, such as the standard deviation of
+Monte Carlo samples, amplify these differences by the ratio of the mean to the standard deviation: they agree to
+`TOLERANCE` while that ratio is below 1e5 (a coefficient of variation above 0.001 %).
+
+Kernels are not cached on disk (cache=True): numba's cache records the name of the importing module, and it breaks
+when the package is imported both as `src.spectrometry` and as `spectrometry`.
+
+Numba selects its threading layer when the first kernel runs. Processes forked after a parallel kernel has run
+inherit the state of the layer, which only the 'workqueue' layer survives: the TBB layer can deadlock them. The
+process pools of `uncertainty.monte_carlo` and `batch.run_batch` therefore start their workers with `pool_context`,
+which forks only when that is safe; otherwise scripts need the `if __name__ == '__main__':` guard of
+multiprocessing. Applications can call `select_threading_layer` first to keep forking, which starts workers faster.
+The 'workqueue' layer cannot run two kernels at once, so kernels are serialized when it is active; with the other
+layers, only the first call of a kernel, which compiles it, holds a lock. Threaded applications should run the
+kernels once from the main thread first: a TBB layer started by another thread can keep the interpreter from
+exiting.
+"""
+import os
+from functools import wraps
+from multiprocessing import get_all_start_methods, get_context
+from math import exp
+from threading import Lock
+
+import numpy as np
+
+try:
+    from numba import config, njit, prange, threading_layer
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+    prange = range
+
+    def njit(*args, **kwargs):
+        """
+        Return the function unchanged (numba is not installed).
+        """
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda function: function
+
+BACKENDS = ('auto', 'numpy', 'numba')
+TOLERANCE = 1e-10
+
+_lock = Lock()
+_exclusive = None  # Whether kernels must run one at a time, known once the threading layer is initialized
+
+
+def resolve_backend(backend):
+    """
+    Return the backend to use, 'numpy' or 'numba'.
+
+    Parameters
+    ----------
+    backend : str
+        'auto' (numba if it is installed, NumPy otherwise), 'numpy' or 'numba'.
+
+    Returns
+    -------
+    str
+        The backend.
+
+    Raises
+    ------
+    ValueError
+        If the backend is invalid, or if it is 'numba' and numba is not installed.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Invalid backend: {backend}. Valid backends are: auto, numpy, numba")
+    if backend == 'auto':
+        return 'numba' if NUMBA_AVAILABLE else 'numpy'
+    if backend == 'numba' and not NUMBA_AVAILABLE:
+        raise ValueError("The numba backend requires numba, which is not installed.")
+    return backend
+
+
+def select_threading_layer(layer='workqueue'):
+    """
+    Select the numba threading layer, unless the NUMBA_THREADING_LAYER environment variable sets it.
+
+    The layer is initialized when the first parallel kernel runs, so this function must be called before that.
+
+    Parameters
+    ----------
+    layer : str, optional
+        The threading layer, e.g. 'workqueue', 'omp' or 'tbb'. Default is 'workqueue', which is safe for process
+        pools forked after parallel kernels have run.
+
+    Returns
+    -------
+    str or None
+        The selected threading layer, None if numba is not installed.
+    """
+    if not NUMBA_AVAILABLE:
+        return None
+    if 'NUMBA_THREADING_LAYER' not in os.environ:
+        config.THREADING_LAYER = layer
+    return config.THREADING_LAYER
+
+
+def pool_context():
+    """
+    Return the multiprocessing context of the process pools started after kernels may have run.
+
+    Returns
+    -------
+    multiprocessing context or None
+        A 'forkserver' context ('spawn' where it is unavailable) if a threading layer other than 'workqueue' is
+        initialized, since forked processes could deadlock. None (the default context) otherwise.
+    """
+    if not NUMBA_AVAILABLE:
+        return None
+    try:
+        if threading_layer() == 'workqueue':
+            return None
+    except ValueError:
+        # Not initialized: no kernel has run with numba parallelism
+        return None
+    return get_context('forkserver' if 'forkserver' in get_all_start_methods() else 'spawn')
+
+
+def _serialized(kernel):
+    """
+    Wrap a kernel so that its first call, which compiles it, holds a lock, and so that every call does if the
+    threading layer cannot run two kernels at once.
+    """
+    compiled = False
+
+    @wraps(kernel)
+    def wrapper(*args):
+        nonlocal compiled
+        if compiled and not _exclusive:
+            return kernel(*args)
+        with _lock:
+            result = kernel(*args)
+            if not compiled:
+                compiled = True
+                _set_exclusive()
+            return result
+    wrapper.kernel = kernel
+    return wrapper
+
+
+def _set_exclusive():
+    """
+    Record whether the active threading layer can only run one kernel at a time.
+    """
+    global _exclusive
+    if _exclusive is None and NUMBA_AVAILABLE:
+        try:
+            _exclusive = threading_layer() == 'workqueue'
+        except ValueError:
+            # Not initialized: the kernel ran without numba parallelism
+            pass
+
+
+@njit
+def _row(row, values):
+    """
+    Return the row of `values` to use for a row of the output: the same one, or the first one if it is shared.
+    """
+    return np.int64(row) if values.shape[0] > 1 else np.int64(0)
+
+
+@_serialized
+@njit(parallel=True)
+def weighted_sums(energy, fluence, mu_tr, hk_factor, hk):
+    """
+    Calculate Σ E·Φ·mutr·f·hK / Σ E·Φ·mutr for every row.
+
+    `energy`, `fluence`, `mu_tr` and `hk_factor` are (rows, bins) arrays, or (1, bins) arrays shared by all the
+    rows, and `hk` is (bins, columns). Returns a (rows, columns) array.
+    """
+    rows = max(energy.shape[0], fluence.shape[0], mu_tr.shape[0], hk_factor.shape[0])
+    bins, columns = hk.shape
+    result = np.zeros((rows, columns))
+    for row in prange(rows):
+        e = energy[_row(row, energy)]
+        f = fluence[_row(row, fluence)]
+        m = mu_tr[_row(row, mu_tr)]
+        k = hk_factor[_row(row, hk_factor)]
+        total = 0.0
+        for j in range(bins):
+            weight = e[j] * f[j] * m[j]
+            total += weight
+            weight *= k[j]
+            for column in range(columns):
+                result[row, column] += weight * hk[j, column]
+        for column in range(columns):
+            result[row, column] /= total
+    return result
+
+
+@_serialized
+@njit(parallel=True)
+def stack_transmission(weights, mu, thickness):
+    """
+    Calculate Σ w·exp(-Σ t·mu) for every stack of layers.
+
+    `weights` is (bins,) and normalized, `mu` is (layers, bins) and `thickness` is (stacks, layers). Returns a
+    (stacks,) array.
+    """
+    stacks, layers = thickness.shape
+    bins = weights.shape[0]
+    result = np.zeros(stacks)
+    for stack in prange(stacks):
+        total = 0.0
+        for j in range(bins):
+            exponent = 0.0
+            for layer in range(layers):
+                exponent += thickness[stack, layer] * mu[layer, j]
+            total += weights[j] * exp(-exponent)
+        result[stack] = total
+    return result
+
+
+@_serialized
+@njit(parallel=True)
+def newton_terms(weights, mu, thickness):
+    """
+    Calculate the transmission Σ w·exp(-mu·t) and its derivative -Σ w·mu·exp(-mu·t) for every row.
+
+    `weights` is (rows, bins), `mu` is (rows, bins) or (1, bins) and `thickness` is (rows,). Returns two (rows,)
+    arrays.
+    """
+    rows, bins = weights.shape
+    transmission, derivative = np.zeros(rows), np.zeros(rows)
+    for row in prange(rows):
+        m = mu[_row(row, mu)]
+        t, d = 0.0, 0.0
+        for j in range(bins):
+            attenuated = weights[row, j] * exp(-m[j] * thickness[row])
+            t += attenuated
+            d -= attenuated * m[j]
+        transmission[row], derivative[row] = t, d
+    return transmission, derivative
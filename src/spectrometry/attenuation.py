@@ -0,0 +1,272 @@
+from collections import OrderedDict
+from os import PathLike
+from threading import RLock
+
+from .tables import as_table, read_table
+
+QUANTITIES = ('mu', 'mu_tr')
+
+
+class AttenuationRegistry:
+    """
+    Registry of the attenuation coefficients of materials, loaded and fitted once per process.
+
+    Materials are registered with the sources of their mass attenuation coefficient (mu/rho) and mass
+    energy-transfer coefficient (mutr/rho) tables, and optionally their density. A table is read and its log-log
+    interpolant fitted the first time it is used, and then kept in memory, so every spectrum reuses the same
+    fitted table. Coefficients are stored per unit mass; the density is only applied when `mu` or `mu_tr` are
+    evaluated.
+
+    The number of materials held in memory is bounded: when it is exceeded, the least recently used material is
+    dropped, and it is reloaded from its source if it is used again.
+
+    Parameters
+    ----------
+    max_materials : int, optional
+        The maximum number of materials whose fitted tables are held in memory. Default is 16.
+    method : str, optional
+        The interpolation method of the tables. Default is 'Akima1D'.
+
+    Attributes
+    ----------
+    sources : dict
+        The registered materials, mapping each name to a dict with its 'mu' and 'mu_tr' sources and its 'density'.
+        It can be passed to `initialize_worker` to rebuild the registry in another process.
+    """
+
+    def __init__(self, max_materials=16, method='Akima1D'):
+        self.max_materials = max_materials
+        self.method = method
+        self.sources = {}
+        self._tables = OrderedDict()
+        self._lock = RLock()
+
+    def __repr__(self):
+        """
+        Return a string representation of the AttenuationRegistry object.
+
+        Returns
+        -------
+        str
+            A string representation of the AttenuationRegistry object.
+        """
+        return f"AttenuationRegistry(materials={list(self.sources)}, loaded={list(self._tables)})"
+
+    def __contains__(self, name):
+        """
+        Return whether a material is registered.
+        """
+        return name in self.sources
+
+    def register(self, name, mu=None, mu_tr=None, density=None):
+        """
+        Register a material.
+
+        Registering a material again replaces its sources and drops its fitted tables.
+
+        Parameters
+        ----------
+        name : str
+            The name of the material, e.g. 'Al' or 'air'.
+        mu : str, path-like, CoefficientTable or table-like, optional
+            The mass attenuation coefficient table, as a file path or any input accepted by `tables.as_table`.
+        mu_tr : str, path-like, CoefficientTable or table-like, optional
+            The mass energy-transfer coefficient table, as a file path or any input accepted by `tables.as_table`.
+        density : float, optional
+            The density of the material, used to obtain linear coefficients. Default is None.
+        """
+        with self._lock:
+            self.sources[name] = {'mu': mu, 'mu_tr': mu_tr, 'density': density}
+            self._tables.pop(name, None)
+
+    def table(self, name, quantity):
+        """
+        Return the fitted table of a material, loading it if needed.
+
+        Parameters
+        ----------
+        name : str
+            The name of the material.
+        quantity : str
+            The coefficient, 'mu' or 'mu_tr'.
+
+        Returns
+        -------
+        CoefficientTable
+            The fitted table of mass coefficients.
+
+        Raises
+        ------
+        ValueError
+            If the quantity is invalid, the material is not registered or it has no table for the quantity.
+        """
+        if quantity not in QUANTITIES:
+            raise ValueError(f"Invalid coefficient: {quantity}. Valid coefficients are: mu, mu_tr")
+        with self._lock:
+            if name not in self.sources:
+                raise ValueError(f"Material not registered: {name}.")
+            tables = self._tables.get(name)
+            if tables is not None and quantity in tables:
+                self._tables.move_to_end(name)
+                return tables[quantity]
+            source = self.sources[name][quantity]
+            if source is None:
+                raise ValueError(f"Material {name} has no {quantity} table.")
+            # Only successfully loaded tables are stored, so a read error is raised again on the next call
+            table = _load_table(source, self.method)
+            if tables is None:
+                tables = self._tables[name] = {}
+                while len(self._tables) > self.max_materials:
+                    self._tables.popitem(last=False)
+            else:
+                self._tables.move_to_end(name)
+            tables[quantity] = table
+            return table
+
+    def density(self, name):
+        """
+        Return the registered density of a material (None if it was not given).
+        """
+        return self.sources[name]['density']
+
+    def mu(self, name, energy, density=None):
+        """
+        Evaluate the attenuation coefficient of a material.
+
+        Parameters
+        ----------
+        name : str
+            The name of the material.
+        energy : array-like
+            The energies at which to evaluate the coefficient.
+        density : float, optional
+            The density of the material. Default is None (the registered density, or 1 if there is none, which
+            returns the mass attenuation coefficient).
+
+        Returns
+        -------
+        numpy.ndarray
+            The attenuation coefficient at every energy.
+        """
+        return self.table(name, 'mu')(energy) * self._density(name, density)
+
+    def mu_tr(self, name, energy, density=None):
+        """
+        Evaluate the energy-transfer coefficient of a material.
+
+        Parameters
+        ----------
+        name : str
+            The name of the material.
+        energy : array-like
+            The energies at which to evaluate the coefficient.
+        density : float, optional
+            The density of the material. Default is None (the registered density, or 1 if there is none, which
+            returns the mass energy-transfer coefficient).
+
+        Returns
+        -------
+        numpy.ndarray
+            The energy-transfer coefficient at every energy.
+        """
+        return self.table(name, 'mu_tr')(energy) * self._density(name, density)
+
+    def preload(self, names=None):
+        """
+        Load and fit the tables of the given materials (all registered materials by default).
+
+        Parameters
+        ----------
+        names : iterable of str, optional
+            The names of the materials to load. Default is None (all, up to `max_materials`).
+        """
+        with self._lock:
+            names = list(self.sources) if names is None else list(names)
+            for name in names[-self.max_materials:]:
+                for quantity in QUANTITIES:
+                    if self.sources[name][quantity] is not None:
+                        self.table(name, quantity)
+
+    def _density(self, name, density):
+        """
+        Return the given density, or else the registered one, or else 1.
+        """
+        if density is None:
+            density = self.density(name)
+        return 1.0 if density is None else density
+
+
+def _load_table(source, method):
+    """
+    Read (if it is a file path) and fit a coefficient table.
+    """
+    if isinstance(source, (str, PathLike)):
+        return read_table(source, method)
+    return as_table(source, method)
+
+
+registry = AttenuationRegistry()
+
+
+def get_registry():
+    """
+    Return the process-wide attenuation registry.
+
+    Returns
+    -------
+    AttenuationRegistry
+        The registry shared by all the library functions of this process.
+    """
+    return registry
+
+
+def initialize_worker(sources, preload=True):
+    """
+    Register (and optionally preload) materials in the process-wide registry of a worker process.
+
+    This function is meant to be the `initializer` of a process pool, with the `sources` attribute of the parent
+    process registry as argument, so that every worker reads and fits each table once, before its first task.
+
+    Parameters
+    ----------
+    sources : dict
+        The registered materials, as in `AttenuationRegistry.sources`.
+    preload : bool, optional
+        If True, load and fit all the tables immediately. Default is True.
+    """
+    for name, source in sources.items():
+        registry.register(name, **source)
+    if preload:
+        registry.preload(sources)
+
+
+def resolve_table(table, quantity, method='Akima1D'):
+    """
+    Return the fitted table for a table input or a registered material name.
+
+    Parameters
+    ----------
+    table : str, CoefficientTable or table-like
+        A material name of the process-wide registry, or any input accepted by `tables.as_table`.
+    quantity : str
+        The coefficient to take from the registry, 'mu' or 'mu_tr'.
+    method : str, optional
+        The interpolation method used if a new table has to be fitted. Default is 'Akima1D'.
+
+    Returns
+    -------
+    CoefficientTable
+        The fitted table.
+    """
+    if isinstance(table, str):
+        return registry.table(table, quantity)
+    return as_table(table, method)
+
+
+def resolve_density(table, density):
+    """
+    Return the density to apply to a table: the given one, or else the registered one for a material name, or 1.
+    """
+    if density is None and isinstance(table, str):
+        density = registry.density(table)
+    return 1.0 if density is None else density
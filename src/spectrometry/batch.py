@@ -0,0 +1,498 @@
+from collections import namedtuple
+from collections.abc import Mapping
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from os import cpu_count
+from inspect import signature
+from os.path import basename, splitext
+from time import perf_counter
+
+import numpy as np
+
+from ._kernels import pool_context
+from .attenuation import _load_table
+from .incremental import ResultCache, digest, task_key
+from .spectrometry import Spectrum, read_spectrum
+from .uncertainty import conversion_coefficient_mc, hvl_mc
+
+HVL = 'hvl'
+
+
+class BatchResult(namedtuple('BatchResult', ['spectrum', 'quantity', 'table', 'angle', 'value', 'uncertainty'])):
+    """
+    One result of a batch: the HVL of a spectrum, or its conversion coefficient for one table and angle.
+
+    Attributes
+    ----------
+    spectrum : str
+        The name of the spectrum.
+    quantity : str
+        'hvl' or 'hk'.
+    table : str
+        The name of the conversion coefficient table, or 'absorber' for the HVL.
+    angle : str
+        The label of the angle column of the table, or '' for the HVL and one-column tables.
+    value : float
+        The HVL or the conversion coefficient.
+    uncertainty : float
+        The standard uncertainty, NaN if it was not calculated.
+    """
+    __slots__ = ()
+
+
+class Progress(namedtuple('Progress', ['done', 'total', 'elapsed', 'eta'])):
+    """
+    Progress of a batch, reported after every completed chunk of tasks.
+
+    Attributes
+    ----------
+    done : int
+        The number of completed (spectrum, table) tasks.
+    total : int
+        The total number of tasks.
+    elapsed : float
+        The elapsed time, in seconds.
+    eta : float
+        The estimated remaining time, in seconds, extrapolated from the mean time per completed task.
+    """
+    __slots__ = ()
+
+
+class BatchContext(namedtuple('BatchContext', ['hk_tables', 'mu', 'mu_tr', 'density', 'options'])):
+    """
+    The fitted tables and the calculation options of a batch, built by `initialize`.
+
+    Attributes
+    ----------
+    hk_tables : dict
+        The fitted conversion coefficient tables, by name.
+    mu : CoefficientTable or None
+        The fitted mu/rho table of the absorber, None if the HVL is not calculated.
+    mu_tr : CoefficientTable
+        The fitted mutr/rho table of air.
+    density : float or None
+        The density of the absorber.
+    options : dict
+        The calculation options, see `prepare`.
+    """
+    __slots__ = ()
+
+
+def file_name(file_path):
+    """
+    Return the name of a file without its directory and extension.
+    """
+    return splitext(basename(str(file_path)))[0]
+
+
+def named_files(paths, kind='file'):
+    """
+    Key file paths by file name (see `file_name`).
+
+    Parameters
+    ----------
+    paths : iterable of str or path-like
+        The file paths.
+    kind : str, optional
+        What the files contain, for the error message. Default is 'file'.
+
+    Returns
+    -------
+    dict
+        The file paths, by name, in the order of `paths`.
+
+    Raises
+    ------
+    ValueError
+        If two files have the same name, e.g. the same file name in different directories.
+    """
+    named = {}
+    for path in paths:
+        name = file_name(path)
+        if name in named and str(named[name]) != str(path):
+            raise ValueError(f"Batch failed. Duplicate {kind} name: {name} ({named[name]}, {path}). Rename one of "
+                             f"the files, or pass a mapping of names to files.")
+        named[name] = path
+    return named
+
+
+def load_spectra(spectra):
+    """
+    Read spectra once, keyed by name.
+
+    Parameters
+    ----------
+    spectra : mapping or iterable
+        A mapping of names to Spectrum objects or file paths, or spectrum file paths, which are named after the
+        files. Files are read with `spectrometry.read_spectrum`.
+
+    Returns
+    -------
+    dict
+        The spectra, by name.
+
+    Raises
+    ------
+    ValueError
+        If there is an error reading a file, or if two spectrum files have the same name.
+    """
+    if not isinstance(spectra, Mapping):
+        spectra = named_files(spectra, 'spectrum')
+    return {name: spectrum if isinstance(spectrum, Spectrum) else read_spectrum(spectrum)
+            for name, spectrum in spectra.items()}
+
+
+def plan(spectra, tables, hvl=True):
+    """
+    Build the tasks of a batch: one per (spectrum, table) pair, and one per spectrum for the HVL.
+
+    Every conversion coefficient task produces the results of all the angles of its table at once. Tasks are
+    ordered spectrum by spectrum, so that a chunk of consecutive tasks needs few spectra.
+
+    Parameters
+    ----------
+    spectra : iterable of str
+        The names of the spectra.
+    tables : iterable of str
+        The names of the conversion coefficient tables.
+    hvl : bool, optional
+        If True, add an HVL task per spectrum. Default is True.
+
+    Returns
+    -------
+    list of tuple
+        The (spectrum, table) tasks, where the table is `HVL` for the HVL tasks.
+    """
+    tables = ([HVL] if hvl else []) + list(tables)
+    return [(spectrum, table) for spectrum in spectra for table in tables]
+
+
+def prepare(hk_tables=None, mutr_table=None, mu_table=None, density=None, method='Akima1D', uncertainty='none',
+            trials=10 ** 5, seed=None, relative_uncertainties=None):
+    """
+    Validate the inputs and options of batch calculations and return the arguments of `initialize`.
+
+    The calculation options are 'method', 'uncertainty', 'trials', 'seed' and 'relative_uncertainties', with the
+    value of every relative uncertainty, given or default, so that they are all part of the keys of cached results.
+
+    Parameters
+    ----------
+    hk_tables, mutr_table, mu_table, density, method, uncertainty, trials, seed, relative_uncertainties
+        As in `run_batch`.
+
+    Returns
+    -------
+    tuple
+        The conversion coefficient tables by name, the materials to register ('air' and, if `mu_table` is given,
+        'absorber') and the calculation options.
+
+    Raises
+    ------
+    ValueError
+        If `mutr_table` is missing, if the uncertainty mode is invalid, if a relative uncertainty is unknown or if
+        two table files have the same name.
+    """
+    if mutr_table is None:
+        raise ValueError("Batch failed. The mutr/rho table of air is required.")
+    if uncertainty not in ('none', 'MonteCarlo', 'GUM'):
+        raise ValueError('Uncertainty modes: none, MonteCarlo and GUM')
+    if not isinstance(hk_tables, Mapping):
+        hk_tables = named_files(hk_tables or [], 'table')
+    sources = {'air': {'mu': None, 'mu_tr': mutr_table, 'density': None}}
+    if mu_table is not None:
+        sources['absorber'] = {'mu': mu_table, 'mu_tr': None, 'density': density}
+    options = {'method': method, 'uncertainty': uncertainty, 'trials': trials, 'seed': seed,
+               'relative_uncertainties': _relative_uncertainties(relative_uncertainties)}
+    return hk_tables, sources, options
+
+
+def run_batch(spectra, hk_tables=None, mutr_table=None, mu_table=None, density=None, method='Akima1D',
+              uncertainty='none', trials=10 ** 5, seed=None, jobs=1, chunk_size=None, progress=None, cache=None,
+              relative_uncertainties=None):
+    """
+    Calculate the HVL and the conversion coefficients of many spectra, streaming the results as they complete.
+
+    Every input is loaded once: spectra are read, and every table is read and fitted, by the calling process, before
+    any worker process is started, so that an input that cannot be read raises a ValueError. The fitted tables are
+    sent to every worker process once. The (spectrum, table) tasks are grouped in chunks of consecutive tasks, and
+    the chunks are queued to a pool of worker processes, which take the next chunk as soon as they finish one, so
+    that fast and slow tasks are balanced among the workers. Results are yielded as their chunks complete, so their
+    order depends on the scheduling; the values do not (every Monte Carlo calculation uses the same `seed`).
+
+    With a `cache`, the results of every task are stored under a key that hashes the contents of its inputs and
+    the calculation parameters (see `incremental.ResultCache`). Tasks whose key is already stored are not
+    recomputed, and their spectra are not even read: their stored results are yielded first.
+
+    Parameters
+    ----------
+    spectra : mapping or iterable
+        The spectra, see `load_spectra`.
+    hk_tables : mapping or iterable, optional
+        The conversion coefficient tables: a mapping of names to file paths or table-like inputs, or file paths
+        (named after the files). Default is None.
+    mutr_table : str, path-like or table-like
+        The mass energy-transfer coefficient table of air, as a file path or any input accepted by
+        `tables.as_table`.
+    mu_table : str, path-like or table-like, optional
+        The mass attenuation coefficient table of the absorber. The HVL is calculated only if it is given.
+    density : float, optional
+        The density of the absorber. Default is None (1, mass thickness).
+    method : str, optional
+        The interpolation method of the tables. Default is 'Akima1D'.
+    uncertainty : str, optional
+        'none', 'MonteCarlo' or 'GUM'. Default is 'none'.
+    trials : int, optional
+        The number of Monte Carlo trials. Default is 10**5.
+    seed : int, optional
+        The seed of the Monte Carlo trials. Default is None.
+    jobs : int or None, optional
+        The number of worker processes, None or 0 for all the CPUs. Default is 1 (no worker processes).
+    chunk_size : int, optional
+        The number of tasks per chunk. Default is None (about four chunks per worker).
+    progress : callable, optional
+        Called with a `Progress` after every completed chunk, and once for all the stored results. Default is None.
+    cache : ResultCache, str or path-like, optional
+        The store of results, or its directory, for incremental recomputation. Default is None.
+    relative_uncertainties : dict, optional
+        The relative uncertainties of the inputs, by argument name ('u_energy', 'u_fluence', 'u_mu', 'u_mu_tr' and
+        'u_hk'), as in `uncertainty.hvl_mc` and `uncertainty.conversion_coefficient_mc`. Default is None (their
+        default values).
+
+    Yields
+    ------
+    BatchResult
+        The results, as they complete.
+
+    Raises
+    ------
+    ValueError
+        If an input cannot be read, if two input files have the same name, if `mutr_table` is missing, if the
+        uncertainty mode is invalid or if a worker process terminates abruptly.
+    """
+    hk_tables, sources, options = prepare(hk_tables, mutr_table, mu_table, density, method, uncertainty, trials,
+                                          seed, relative_uncertainties)
+    if not isinstance(spectra, Mapping):
+        spectra = named_files(spectra, 'spectrum')
+
+    tasks = plan(spectra, hk_tables, hvl=mu_table is not None)
+    total, start, done = len(tasks), perf_counter(), 0
+
+    def report(count):
+        nonlocal done
+        done += count
+        if progress is not None and count:
+            elapsed = perf_counter() - start
+            progress(Progress(done, total, elapsed, elapsed / done * (total - done)))
+
+    keys = {}
+    if cache is not None:
+        cache = cache if isinstance(cache, ResultCache) else ResultCache(cache)
+        keys = _task_keys(tasks, spectra, hk_tables, sources, options)
+        stored = [task for task in tasks if keys[task] in cache]
+        for task in stored:
+            yield from (BatchResult(*row) for row in cache.get(keys[task]))
+        report(len(stored))
+        tasks = [task for task in tasks if keys[task] not in cache]
+
+    spectra = load_spectra({name: spectra[name] for name in dict.fromkeys(name for name, _ in tasks)})
+    jobs = cpu_count() if not jobs else jobs
+    if chunk_size is None:
+        chunk_size = max(1, len(tasks) // (4 * jobs))
+    chunks = [_chunk(spectra, tasks[start:start + chunk_size]) for start in range(0, len(tasks), chunk_size)]
+
+    def complete(chunk, results):
+        if cache is not None:
+            for task, rows in _group(results).items():
+                cache.put(keys[task], rows)
+        report(sum(len(tables) for _, _, tables in chunk))
+        return results
+
+    context = initialize(hk_tables, sources, options)
+    if jobs == 1 or len(chunks) <= 1:
+        for chunk in chunks:
+            yield from complete(chunk, run_chunk(chunk, context))
+        return
+
+    try:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(chunks)), initializer=_set_context,
+                                 initargs=(context,), mp_context=pool_context()) as executor:
+            queue, pending = iter(chunks), {}
+            for chunk in queue:
+                pending[executor.submit(run_chunk, chunk)] = chunk
+                if len(pending) == 2 * jobs:
+                    break
+            while pending:
+                completed, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    chunk = pending.pop(future)
+                    for next_chunk in queue:
+                        pending[executor.submit(run_chunk, next_chunk)] = next_chunk
+                        break
+                    yield from complete(chunk, future.result())
+    except BrokenProcessPool as e:
+        raise ValueError(f"Batch failed. A worker process terminated abruptly: {e}")
+
+
+def task_of(result):
+    """
+    Return the (spectrum, table) task of a result, as planned by `plan`.
+    """
+    return result.spectrum, HVL if result.quantity == HVL else result.table
+
+
+def initialize(hk_tables, sources, options):
+    """
+    Read and fit the tables of a batch.
+
+    The tables are fitted for this batch only: the process-wide attenuation registry is not modified, so batches
+    with different tables can run in the same process.
+
+    Parameters
+    ----------
+    hk_tables : mapping
+        The conversion coefficient tables, by name, as file paths or table-like inputs.
+    sources : dict
+        The 'air' and (optionally) 'absorber' materials, as in `attenuation.AttenuationRegistry.sources`.
+    options : dict
+        The calculation options, see `prepare`.
+
+    Returns
+    -------
+    BatchContext
+        The fitted tables and the options, to pass to `run_chunk`.
+
+    Raises
+    ------
+    ValueError
+        If a table cannot be read.
+    """
+    method = options['method']
+    absorber = sources.get('absorber')
+    return BatchContext({name: _load_table(table, method) for name, table in hk_tables.items()},
+                        None if absorber is None else _load_table(absorber['mu'], method),
+                        _load_table(sources['air']['mu_tr'], method),
+                        None if absorber is None else absorber['density'], dict(options))
+
+
+def run_chunk(chunk, context=None):
+    """
+    Run a chunk of batch tasks.
+
+    Parameters
+    ----------
+    chunk : list of tuple
+        (name, spectrum, tables) entries, with the names of the tables (or `HVL`) of every spectrum.
+    context : BatchContext, optional
+        The fitted tables and options of the batch, see `initialize`. Default is None (the context of this worker
+        process of `run_batch`).
+
+    Returns
+    -------
+    list of BatchResult
+        The results of the chunk.
+    """
+    context = _context if context is None else context
+    return [result for name, spectrum, tables in chunk for table in tables
+            for result in _run_task(context, name, spectrum, table)]
+
+
+_context = None  # Batch context of this worker process
+
+
+def _set_context(context):
+    """
+    Set the batch context of a worker process.
+    """
+    global _context
+    _context = context
+
+
+def _task_keys(tasks, spectra, hk_tables, sources, options):
+    """
+    Return the content-addressed key of every task (see `incremental.task_key`).
+    """
+    method = options['method']
+    digests = {name: digest(spectrum, method) for name, spectrum in spectra.items()}
+    tables = {name: digest(table, method) for name, table in hk_tables.items()}
+    air = digest(sources['air']['mu_tr'], method)
+    if 'absorber' in sources:
+        tables[HVL] = task_key(digest(sources['absorber']['mu'], method), density=sources['absorber']['density'])
+    return {(name, table): task_key(digests[name], tables[table], air, task=HVL if table == HVL else 'hk',
+                                    **options)
+            for name, table in tasks}
+
+
+def _relative_uncertainties(given):
+    """
+    Return the value of every relative uncertainty of the HVL and conversion coefficient calculations, by name.
+    """
+    values = {}
+    for function in (hvl_mc, conversion_coefficient_mc):
+        values.update((name, parameter.default) for name, parameter in signature(function).parameters.items()
+                      if name.startswith('u_'))
+    unknown = set(given or {}) - set(values)
+    if unknown:
+        raise ValueError(f"Invalid relative uncertainties: {', '.join(sorted(unknown))}. Valid relative "
+                         f"uncertainties are: {', '.join(sorted(values))}")
+    values.update(given or {})
+    return {name: float(values[name]) for name in sorted(values)}
+
+
+def _inputs(function, relative_uncertainties):
+    """
+    Return the relative uncertainties that are arguments of an uncertainty function.
+    """
+    names = signature(function).parameters
+    return {name: value for name, value in relative_uncertainties.items() if name in names}
+
+
+def _group(results):
+    """
+    Group results by task.
+    """
+    groups = {}
+    for result in results:
+        groups.setdefault(task_of(result), []).append(result)
+    return groups
+
+
+def _chunk(spectra, tasks):
+    """
+    Group consecutive tasks by spectrum, so that every spectrum of a chunk is sent to the workers once.
+    """
+    chunk = []
+    for name, table in tasks:
+        if chunk and chunk[-1][0] == name:
+            chunk[-1][2].append(table)
+        else:
+            chunk.append((name, spectra[name], [table]))
+    return chunk
+
+
+def _run_task(context, name, spectrum, table):
+    """
+    Calculate the HVL, or the conversion coefficients of one table, of a spectrum.
+    """
+    options = context.options
+    method, mode = options['method'], options['uncertainty']
+    kwargs = {} if mode != 'MonteCarlo' else {'trials': options['trials'], 'seed': options['seed']}
+
+    if table == HVL:
+        hvl, uncertainty = spectrum.calculate_hvl(context.mu, context.mu_tr, context.density, method=method), np.nan
+        if mode != 'none':
+            result = spectrum.hvl_uncertainty(context.mu, context.mu_tr, context.density, mode=mode, method=method,
+                                              **_inputs(hvl_mc, options['relative_uncertainties']), **kwargs)
+            uncertainty = result.std if mode == 'MonteCarlo' else result.uncertainty
+        return [BatchResult(name, 'hvl', 'absorber', '', hvl, float(uncertainty))]
+
+    hk_table = context.hk_tables[table]
+    coefficients = spectrum.angular_conversion_coefficients(hk_table, context.mu_tr, method)
+    uncertainties = np.full(len(coefficients), np.nan)
+    if mode != 'none':
+        result = spectrum.conversion_coefficient_uncertainty(
+            hk_table, context.mu_tr, mode=mode, method=method,
+            **_inputs(conversion_coefficient_mc, options['relative_uncertainties']), **kwargs)
+        uncertainties = np.atleast_1d(result.std if mode == 'MonteCarlo' else result.uncertainty)
+    angles = coefficients.index if hk_table.values.ndim > 1 else ['']
+    return [BatchResult(name, 'hk', table, str(angle), float(value), float(uncertainty))
+            for angle, value, uncertainty in zip(angles, coefficients.values, uncertainties)]
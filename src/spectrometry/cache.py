@@ -0,0 +1,147 @@
+from collections import OrderedDict
+from hashlib import blake2b
+from threading import RLock
+
+import numpy as np
+
+
+class GridCache:
+    """
+    Cache of coefficient values evaluated on spectrum energy grids.
+
+    Many spectra share the same energy grid, so the coefficients interpolated on that grid (mu, mutr, hK) are the
+    same for all of them. This cache maps (coefficient table fingerprint, energy grid fingerprint) to the evaluated
+    coefficient values, so that only the first spectrum on a grid interpolates the table and the others go
+    straight to the weighted sums. Cached arrays are read-only.
+
+    The total size of the cached arrays is bounded: when it is exceeded, the least recently used entries are
+    dropped.
+
+    Parameters
+    ----------
+    max_bytes : int, optional
+        The maximum total size of the cached arrays, in bytes. Zero disables the cache. Default is 2**27 (128 MiB).
+
+    Attributes
+    ----------
+    nbytes : int
+        The total size of the cached arrays, in bytes.
+    hits : int
+        The number of lookups served from the cache.
+    misses : int
+        The number of lookups that required an interpolation.
+    """
+
+    def __init__(self, max_bytes=2 ** 27):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits, self.misses = 0, 0
+        self._entries = OrderedDict()
+        self._lock = RLock()
+
+    def __len__(self):
+        """
+        Return the number of cached arrays.
+        """
+        return len(self._entries)
+
+    def __repr__(self):
+        """
+        Return a string representation of the GridCache object.
+
+        Returns
+        -------
+        str
+            A string representation of the GridCache object.
+        """
+        return f"GridCache(entries={len(self)}, nbytes={self.nbytes}, max_bytes={self.max_bytes})"
+
+    def get(self, table, energy):
+        """
+        Return the coefficients of a table on an energy grid, interpolating them only if they are not cached.
+
+        Parameters
+        ----------
+        table : CoefficientTable
+            The fitted coefficient table.
+        energy : numpy.ndarray
+            The energy grid.
+
+        Returns
+        -------
+        numpy.ndarray
+            The read-only coefficient values on the grid.
+        """
+        energy = np.asarray(energy, dtype=np.float64)
+        key = (table.fingerprint, fingerprint(energy))
+        with self._lock:
+            values = self._entries.get(key)
+            if values is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return values
+            self.misses += 1
+        values = table(energy)
+        values.setflags(write=False)
+        self._store(key, values)
+        return values
+
+    def clear(self):
+        """
+        Remove all the cached arrays.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def _store(self, key, values):
+        """
+        Store an array, dropping the least recently used ones to stay within the size limit.
+        """
+        if values.nbytes > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = values
+            self.nbytes += values.nbytes
+            while self.nbytes > self.max_bytes:
+                _, dropped = self._entries.popitem(last=False)
+                self.nbytes -= dropped.nbytes
+
+
+def fingerprint(*arrays):
+    """
+    Return a fast content hash of one or more arrays, including their shapes and types.
+
+    Parameters
+    ----------
+    *arrays : numpy.ndarray
+        The arrays to hash.
+
+    Returns
+    -------
+    bytes
+        A 16-byte BLAKE2b digest.
+    """
+    digest = blake2b(digest_size=16)
+    for array in arrays:
+        array = np.ascontiguousarray(array)
+        digest.update(f'{array.dtype.str}{array.shape}'.encode())
+        digest.update(array.data)
+    return digest.digest()
+
+
+grid_cache = GridCache()
+
+
+def get_grid_cache():
+    """
+    Return the process-wide grid cache.
+
+    Returns
+    -------
+    GridCache
+        The cache shared by all the library functions of this process.
+    """
+    return grid_cache
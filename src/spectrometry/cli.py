@@ -0,0 +1,186 @@
+import argparse
+import os
+import sys
+from datetime import datetime
+from glob import glob
+from os.path import isdir, join, splitext
+
+import pandas as pd
+
+from ._kernels import select_threading_layer
+from .batch import BatchResult, named_files, plan, run_batch, task_of
+from .store import ResultStore, parameters_hash
+from .watch import SPECTRUM_EXTENSIONS, watch
+
+TABLE_EXTENSIONS = ('.txt', '.csv', '.dat')
+COLUMNS = list(BatchResult._fields)
+
+
+def build_parser():
+    """
+    Build the parser of the command line arguments.
+
+    Returns
+    -------
+    argparse.ArgumentParser
+        The parser.
+    """
+    parser = argparse.ArgumentParser(
+        prog='spectrometry',
+        description="Calculate the HVL and the conversion coefficients of X-ray spectra, without a GUI.")
+    parser.add_argument('spectra', nargs='+',
+                        help="Spectrum files (CSV or Excel), directories or glob patterns. With --watch, the directory "
+                             "to watch.")
+    parser.add_argument('--hk', nargs='+', default=[],
+                        help="Monoenergetic conversion coefficient tables (one column per angle), directories or "
+                             "glob patterns.")
+    parser.add_argument('--mutr', required=True, help="Mass energy-transfer coefficient table of air (mutr/rho).")
+    parser.add_argument('--mu', help="Mass attenuation coefficient table of the absorber (mu/rho), for the HVL.")
+    parser.add_argument('--density', type=float, help="Density of the absorber. Default: 1 (mass thickness).")
+    parser.add_argument('--method', default='Akima1D', help="Interpolation method of the tables. Default: Akima1D.")
+    parser.add_argument('--uncertainty', choices=['none', 'MonteCarlo', 'GUM'], default='none',
+                        help="Uncertainty calculation. Default: none.")
+    parser.add_argument('--trials', type=int, default=10 ** 5, help="Monte Carlo trials. Default: 100000.")
+    parser.add_argument('--seed', type=int, help="Seed of the Monte Carlo trials.")
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help="Number of worker processes, 0 for all the CPUs. Default: 1.")
+    parser.add_argument('--cache',
+                        help="Directory of stored results: only the tasks whose inputs or options changed are "
+                             "recomputed.")
+    parser.add_argument('--store', help="SQLite result store (see store.ResultStore) to add the results to.")
+    parser.add_argument('--campaign',
+                        help="Campaign name of the results in the result store. Default: the current date and time.")
+    parser.add_argument('--watch', action='store_true',
+                        help="Watch the spectra directory and process new or modified files as they arrive, "
+                             "appending their results to the output, until interrupted.")
+    parser.add_argument('--interval', type=float, default=0.2,
+                        help="Polling interval of --watch, in seconds. Default: 0.2.")
+    parser.add_argument('--progress', action='store_true', help="Print the progress and ETA to the standard error.")
+    parser.add_argument('-o', '--output', default='-',
+                        help="Consolidated results file (CSV). Default: standard output.")
+    return parser
+
+
+def expand_paths(patterns, extensions):
+    """
+    Return the files given as file paths, directories or glob patterns, in order and without duplicates.
+
+    Parameters
+    ----------
+    patterns : iterable of str
+        File paths, directories (all their files with one of the `extensions`) or glob patterns.
+    extensions : tuple of str
+        The lower case extensions of the files taken from directories.
+
+    Returns
+    -------
+    list of str
+        The file paths. Paths that match nothing are kept, so that reading them reports the error.
+    """
+    paths = []
+    for pattern in patterns:
+        if isdir(pattern):
+            paths.extend(sorted(path for path in glob(join(pattern, '*')) if splitext(path)[1].lower() in extensions))
+        else:
+            paths.extend(sorted(glob(pattern)) or [pattern])
+    return list(dict.fromkeys(paths))
+
+
+def main(argv=None):
+    """
+    Run the command line interface.
+
+    Parameters
+    ----------
+    argv : list of str, optional
+        The command line arguments. Default is None (`sys.argv`).
+
+    Returns
+    -------
+    int
+        The exit status: 0 on success, 1 if an input could not be processed.
+    """
+    args = build_parser().parse_args(argv)
+    # Worker pools are forked after the compiled kernels have run in this process
+    select_threading_layer()
+    hk_paths = expand_paths(args.hk, TABLE_EXTENSIONS)
+    if args.watch:
+        return _watch(args, hk_paths)
+    spectra = expand_paths(args.spectra, SPECTRUM_EXTENSIONS)
+    progress = _print_progress if args.progress else None
+
+    try:
+        results = list(run_batch(spectra, hk_paths, args.mutr, args.mu, args.density, args.method, args.uncertainty,
+                                 args.trials, args.seed, args.jobs, progress=progress, cache=args.cache))
+        if args.store is not None:
+            with ResultStore(args.store) as store:
+                store.insert(_campaign(args), results, _parameters(args))
+    except ValueError as e:
+        print(f"spectrometry: {e}", file=sys.stderr)
+        return 1
+
+    # Results stream in completion order; write them in the order of the inputs
+    order = {task: position for position, task in enumerate(plan(named_files(spectra), named_files(hk_paths)))}
+    results.sort(key=lambda result: order[task_of(result)])
+    pd.DataFrame(results, columns=COLUMNS).to_csv(sys.stdout if args.output == '-' else args.output, index=False)
+    return 0
+
+
+def _watch(args, hk_paths):
+    """
+    Run the watch mode of the command line interface, until it is interrupted.
+    """
+    if len(args.spectra) != 1:
+        print("spectrometry: --watch requires one directory.", file=sys.stderr)
+        return 1
+    store = None
+    try:
+        results = watch(args.spectra[0], hk_paths, args.mutr, args.mu, args.density, args.method, args.uncertainty,
+                        args.trials, args.seed, args.interval)
+        store = ResultStore(args.store) if args.store is not None else None
+        campaign, parameters = _campaign(args), _parameters(args)
+        header = args.output == '-' or not (os.path.isfile(args.output) and os.stat(args.output).st_size != 0)
+        for ingested in results:
+            if ingested.error is not None:
+                print(f"spectrometry: {ingested.error}", file=sys.stderr)
+                continue
+            output = sys.stdout if args.output == '-' else args.output
+            pd.DataFrame(ingested.results, columns=COLUMNS).to_csv(output, header=header, index=False, mode='a')
+            header = False
+            if args.output == '-':
+                sys.stdout.flush()
+            if store is not None:
+                store.insert(campaign, ingested.results, parameters)
+    except ValueError as e:
+        print(f"spectrometry: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if store is not None:
+            store.close()
+    return 0
+
+
+def _campaign(args):
+    """
+    Return the campaign name of the results in the result store.
+    """
+    return args.campaign or datetime.now().isoformat(timespec='seconds')
+
+
+def _parameters(args):
+    """
+    Return the hash of the calculation parameters of the results in the result store.
+    """
+    return parameters_hash(method=args.method, uncertainty=args.uncertainty, trials=args.trials, seed=args.seed,
+                           density=args.density)
+
+
+def _print_progress(progress):
+    """
+    Print the progress of a batch to the standard error.
+    """
+    end = '\n' if progress.done == progress.total else ''
+    print(f"\r{progress.done}/{progress.total} tasks, {progress.elapsed:.0f} s elapsed, ETA {progress.eta:.0f} s",
+          end=end, file=sys.stderr, flush=True)
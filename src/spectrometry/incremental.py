@@ -0,0 +1,157 @@
+import json
+import os
+from hashlib import blake2b
+from os import PathLike
+from os.path import exists, join
+
+import numpy as np
+
+from .cache import fingerprint
+from .spectrometry import Spectrum
+from .tables import as_table
+
+
+class ResultCache:
+    """
+    Content-addressed store of batch results on disk.
+
+    Every (spectrum, table) task of a batch is identified by a key that hashes the contents of all its inputs and
+    the parameters of the calculation (see `task_key`). The results of a task are stored in a JSON file named after
+    its key, so a rerun finds the results of every task whose inputs did not change, whatever the names or paths
+    of the files, and only recomputes the others. Files are written atomically, so an interrupted run leaves no
+    partial entries.
+
+    Parameters
+    ----------
+    directory : str or path-like
+        The directory of the stored results. It is created if it does not exist.
+
+    Attributes
+    ----------
+    directory : str
+        The directory of the stored results.
+    """
+
+    def __init__(self, directory):
+        self.directory = str(directory)
+        os.makedirs(self.directory, exist_ok=True)
+
+    def __repr__(self):
+        """
+        Return a string representation of the ResultCache object.
+
+        Returns
+        -------
+        str
+            A string representation of the ResultCache object.
+        """
+        return f"ResultCache(directory='{self.directory}')"
+
+    def __contains__(self, key):
+        """
+        Return whether the results of a task are stored.
+        """
+        return exists(self._path(key))
+
+    def get(self, key):
+        """
+        Return the stored results of a task.
+
+        Parameters
+        ----------
+        key : str
+            The key of the task.
+
+        Returns
+        -------
+        list of list or None
+            The stored result rows, or None if there are none.
+        """
+        try:
+            with open(self._path(key), encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return None
+
+    def put(self, key, rows):
+        """
+        Store the results of a task.
+
+        Parameters
+        ----------
+        key : str
+            The key of the task.
+        rows : list of sequence
+            The result rows, made of strings and numbers.
+        """
+        path = self._path(key)
+        temporary = f"{path}.{os.getpid()}.tmp"
+        with open(temporary, 'w', encoding='utf-8') as file:
+            json.dump([list(row) for row in rows], file)
+        os.replace(temporary, path)
+
+    def _path(self, key):
+        """
+        Return the path of the file of a task.
+        """
+        return join(self.directory, f"{key}.json")
+
+
+def digest(source, method='Akima1D'):
+    """
+    Return a content hash of an input of a batch.
+
+    Files are hashed by their bytes, so renaming or touching a file does not change its digest. Spectra are hashed
+    by their arrays, and tables by the fingerprint of the fitted table (see `tables.CoefficientTable`).
+
+    Parameters
+    ----------
+    source : str, path-like, Spectrum, CoefficientTable or table-like
+        The input.
+    method : str, optional
+        The interpolation method used if a table has to be fitted to be hashed. Default is 'Akima1D'.
+
+    Returns
+    -------
+    str
+        The hexadecimal digest.
+
+    Raises
+    ------
+    ValueError
+        If there is an error reading a file.
+    """
+    if isinstance(source, (str, PathLike)):
+        hasher = blake2b(digest_size=16)
+        try:
+            with open(source, 'rb') as file:
+                for block in iter(lambda: file.read(2 ** 20), b''):
+                    hasher.update(block)
+        except OSError as e:
+            raise ValueError(f"Error reading file: {e}")
+        return hasher.hexdigest()
+    if isinstance(source, Spectrum):
+        kerma = np.empty(0) if source.kerma is None else source.kerma
+        return fingerprint(source.energy, source.values, kerma).hex()
+    return as_table(source, method).fingerprint.hex()
+
+
+def task_key(*digests, **parameters):
+    """
+    Return the key of a task from the digests of its inputs and its calculation parameters.
+
+    Parameters
+    ----------
+    *digests : str or None
+        The digests of the inputs of the task.
+    **parameters : dict
+        The parameters of the calculation, e.g. interpolation method, uncertainty mode, trials and seed.
+
+    Returns
+    -------
+    str
+        The hexadecimal key.
+    """
+    hasher = blake2b(digest_size=20)
+    hasher.update(repr((digests, sorted(parameters.items()))).encode())
+    return hasher.hexdigest()
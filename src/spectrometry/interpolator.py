@@ -1,3 +1,5 @@
+import json
+from functools import partial
 from warnings import warn
 from collections.abc import Iterable
 from numbers import Number
@@ -6,7 +8,13 @@ from os.path import splitext
 import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
-from scipy.interpolate import CubicSpline, PchipInterpolator, Akima1DInterpolator, make_interp_spline
+from scipy.interpolate import (BSpline, CubicSpline, PchipInterpolator, PPoly, Akima1DInterpolator,
+                               make_interp_spline)
+
+from .cache import fingerprint
+from .plotting import MAX_POINTS, FigureTemplate, decimate, plot_job
+
+FORMAT_VERSION = 1
 
 
 class Interpolator:
@@ -43,15 +51,25 @@ class Interpolator:
         The logarithm of the x-coordinates for which interpolation is performed.
     log_new_y : numpy.ndarray or None
         The logarithm of the interpolated y-coordinates.
+    interpolants : dict
+        The fitted interpolants of the last interpolation, by method. They are reused by later interpolations with
+        the same data, scale and keyword arguments.
 
     Methods
     -------
     interpolate(new_x, methods, k=3, log=False)
         Perform interpolation using one or more specified methods.
+    iter_interpolate(new_x, methods, log=False, chunk_size=2**16)
+        Perform interpolation chunk by chunk, yielding (x_chunk, y_chunk) pairs.
     to_file(file_path, csv=True)
         Save the interpolation results to a file.
-    plot(fig_size=(10, 6), show=True, save=False, file_path='interpolation_plot', file_format='png')
-        Plot the interpolation results.
+    save(file_path)
+        Save the fitted interpolants to a NumPy .npz file, see `load`.
+    plot(fig_size=(10, 6), show=True, save=False, file_path='interpolation_plot', file_format='png',
+         max_points=MAX_POINTS, decimation='minmax')
+        Plot the interpolation results, decimated to `plotting.MAX_POINTS` points per line by default.
+    render(file_path, template=None, title=None)
+        Save a plot of the interpolation results without pyplot, see `plotting`.
 
     Raises
     ------
@@ -72,6 +90,36 @@ class Interpolator:
         self.new_x, self.new_y = None, None
         self.log_x, self.log_y = None, None
         self.log_new_x, self.log_new_y = None, None
+        self.interpolants, self._fit_key = {}, None
+
+    def __getstate__(self):
+        """
+        Return the state of the Interpolator object for pickling.
+
+        The arguments given to the constructor are not pickled, since `x` and `y` hold the same data: a
+        DataFrame passed as `data` would otherwise be serialized too. The fitted interpolants are pickled, so an
+        unpickled Interpolator does not refit them.
+
+        Returns
+        -------
+        dict
+            The state of the Interpolator object.
+        """
+        state = self.__dict__.copy()
+        state['_x'], state['_y'], state['_data'] = None, None, None
+        return state
+
+    def __setstate__(self, state):
+        """
+        Restore the state of the Interpolator object after unpickling.
+
+        Parameters
+        ----------
+        state : dict
+            The state returned by `__getstate__`.
+        """
+        self.__dict__.update(state)
+        self._x, self._y = self.x, self.y
 
     def _validate_arguments_combination(self):
         """
@@ -206,7 +254,7 @@ class Interpolator:
         """
         return self.interpolate(new_x, methods, log=log, **kwargs)
 
-    def interpolate(self, new_x, algorithms, log=False, **kwargs):
+    def interpolate(self, new_x, algorithms, log=False, chunk_size=None, **kwargs):
         """
         Interpolate the data using the specified methods and store the results.
 
@@ -219,6 +267,10 @@ class Interpolator:
             'PiecewiseLinear', 'CubicSpline', 'Pchip', 'Akima1D', 'B-splines'.
         log : bool, optional
             If True, apply logarithmic transformation to the data before interpolation. Default is False.
+        chunk_size : int, optional
+            If given, `new_x` is evaluated in chunks of `chunk_size` points written into the result, so that the
+            temporaries (logarithm of the chunk, interpolated logarithm) are bounded by the chunk size instead of
+            the size of `new_x`. `log_new_x` and `log_new_y` are then not stored. Default is None (one evaluation).
         **kwargs : dict, optional
             Additional keyword arguments to pass to the interpolation methods.
 
@@ -233,7 +285,11 @@ class Interpolator:
         ------
         ValueError
             If an invalid interpolation method is provided.
+            If `chunk_size` is not a positive integer.
         """
+        if chunk_size is not None:
+            return self._interpolate_chunked(new_x, algorithms, log, chunk_size, kwargs)
+
         if log:
             self.x, self.y = clean_arrays(self.x, self.y)
 
@@ -246,8 +302,7 @@ class Interpolator:
 
         results = {}
         for algorithm in algorithms:
-            new_y = interpolate(x, y, new_x, algorithm, **kwargs)
-            results[algorithm] = new_y
+            results[algorithm] = self._interpolant(x, y, algorithm, log, kwargs)(new_x)
 
         if len(results) == 1:
             new_y = next(iter(results.values()))
@@ -258,6 +313,153 @@ class Interpolator:
 
         return self.new_y
 
+    def iter_interpolate(self, new_x, algorithms, log=False, chunk_size=2 ** 16, **kwargs):
+        """
+        Interpolate the data in chunks of new x-coordinates, yielding the results of every chunk.
+
+        The interpolants are fitted once, and every chunk of `new_x` is evaluated separately, so the memory used is
+        bounded by `chunk_size` whatever the size of `new_x`, which can be e.g. a memory-mapped array. The results
+        are not stored in the Interpolator: each chunk can be written to disk as it is yielded.
+
+        Parameters
+        ----------
+        new_x : array-like
+            The x-coordinates at which to interpolate.
+        algorithms : str or list of str
+            The interpolation method(s) to use, as in `interpolate`.
+        log : bool, optional
+            If True, apply logarithmic transformation to the data before interpolation. Default is False.
+        chunk_size : int, optional
+            The number of x-coordinates per chunk. Default is 2**16.
+        **kwargs : dict, optional
+            Additional keyword arguments to pass to the interpolation methods.
+
+        Yields
+        ------
+        tuple
+            The x-coordinates of the chunk (numpy.ndarray) and their interpolated y-coordinates: a numpy array for a
+            single method, or a pandas DataFrame with one column per method.
+
+        Raises
+        ------
+        ValueError
+            If an invalid interpolation method is provided.
+            If `chunk_size` is not a positive integer.
+        """
+        for _, x_chunk, results in self._chunks(new_x, algorithms, log, chunk_size, kwargs):
+            yield x_chunk, next(iter(results.values())) if len(results) == 1 else pd.DataFrame(results)
+
+    def _interpolate_chunked(self, new_x, algorithms, log, chunk_size, kwargs):
+        """
+        Interpolate the data in chunks, writing every chunk into the stored results. See `interpolate`.
+        """
+        if isinstance(new_x, Number):
+            new_x = [new_x]
+        new_x = np.asarray(new_x)
+        results = None
+        for start, x_chunk, chunk_results in self._chunks(new_x, algorithms, log, chunk_size, kwargs):
+            if results is None:
+                results = {algorithm: np.empty(len(new_x), dtype=values.dtype)
+                           for algorithm, values in chunk_results.items()}
+            for algorithm, values in chunk_results.items():
+                results[algorithm][start:start + len(x_chunk)] = values
+        if results is None:
+            results = {algorithm: np.empty(0) for algorithm in
+                       ([algorithms] if isinstance(algorithms, str) else algorithms)}
+
+        self.new_x = new_x
+        self.log_new_x, self.log_new_y = None, None
+        self.new_y = next(iter(results.values())) if len(results) == 1 else pd.DataFrame(results, copy=False)
+        return self.new_y
+
+    def _chunks(self, new_x, algorithms, log, chunk_size, kwargs):
+        """
+        Yield the start index, the x-coordinates and the interpolated y-coordinates by method of every chunk.
+        """
+        if not isinstance(chunk_size, (int, np.integer)) or chunk_size < 1:
+            raise ValueError("Interpolation failed. chunk_size must be a positive integer.")
+        if log:
+            self.x, self.y = clean_arrays(self.x, self.y)
+            self.log_x, self.log_y = np.log(self.x), np.log(self.y)
+        x, y = (self.log_x, self.log_y) if log else (self.x, self.y)
+        if isinstance(algorithms, str):
+            algorithms = [algorithms]
+        interpolants = {algorithm: self._interpolant(x, y, algorithm, log, kwargs) for algorithm in algorithms}
+        if isinstance(new_x, Number):
+            new_x = [new_x]
+
+        for start in range(0, len(new_x), chunk_size):
+            x_chunk = np.asarray(new_x[start:start + chunk_size])
+            log_x_chunk = np.log(x_chunk) if log else x_chunk
+            results = {}
+            for algorithm, interpolant in interpolants.items():
+                values = interpolant(log_x_chunk)
+                results[algorithm] = np.exp(values, out=values) if log else values
+            yield start, x_chunk, results
+
+    def save(self, file_path):
+        """
+        Save the fitted interpolants to a NumPy .npz file.
+
+        The file holds the data points and, for every fitted method, the piecewise polynomial coefficients and
+        breakpoints (CubicSpline, Pchip, Akima1D), the B-spline knots and coefficients (B-splines) or the data points
+        ('PiecewiseLinear'), with the scale and keyword arguments of the fit. `load` restores an Interpolator whose
+        interpolants are evaluated without refitting.
+
+        Parameters
+        ----------
+        file_path : str
+            The path to the file. The '.npz' extension is added if it is missing.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        ValueError
+            If there are no fitted interpolants to save.
+        """
+        if not self.interpolants:
+            raise ValueError("No fitted interpolants to save. Please run the interpolate method first.")
+
+        arrays = {'x': self.x, 'y': self.y}
+        methods = {}
+        for algorithm, interpolant in self.interpolants.items():
+            kind, interpolant_arrays, parameters = _interpolant_state(interpolant)
+            methods[algorithm] = {'kind': kind, **parameters}
+            arrays.update({f'{algorithm}/{name}': array for name, array in interpolant_arrays.items()})
+        log, kwargs, _ = self._fit_key
+        metadata = {'version': FORMAT_VERSION, 'log': log, 'kwargs': kwargs, 'methods': methods}
+        np.savez(file_path, metadata=np.array(json.dumps(metadata)), **arrays)
+
+    def _interpolant(self, x, y, algorithm, log, kwargs):
+        """
+        Return the fitted interpolant of a method, fitting it only if the data, scale or keyword arguments changed.
+
+        Parameters
+        ----------
+        x, y : numpy.ndarray
+            The data points, in the interpolation scale.
+        algorithm : str
+            The interpolation method.
+        log : bool
+            Whether the data points are in logarithmic scale.
+        kwargs : dict
+            Additional keyword arguments to pass to the interpolation method.
+
+        Returns
+        -------
+        callable
+            The fitted interpolant.
+        """
+        key = (bool(log), repr(sorted(kwargs.items())), fingerprint(self.x, self.y).hex())
+        if key != self._fit_key:
+            self.interpolants, self._fit_key = {}, key
+        if algorithm not in self.interpolants:
+            self.interpolants[algorithm] = make_interpolant(x, y, algorithm, **kwargs)
+        return self.interpolants[algorithm]
+
     def _set_interpolation_attr(self, new_x, log):
         """
         Set the attributes for interpolation.
@@ -379,7 +581,8 @@ class Interpolator:
         else:
             df.to_excel(file_path, index=False)
 
-    def plot(self, fig_size=(10, 6), show=True, save=False, file_path='interpolation_plot', file_format='png'):
+    def plot(self, fig_size=(10, 6), show=True, save=False, file_path='interpolation_plot', file_format='png',
+             max_points=MAX_POINTS, decimation='minmax'):
         """
         Plot the interpolation results.
 
@@ -395,6 +598,12 @@ class Interpolator:
             The path to the file where the plot will be saved. Default is 'interpolation_plot'.
         file_format : str, optional
             The format of the file to save the plot. Default is 'png'.
+        max_points : int, optional
+            The point budget of every interpolated series: denser series are decimated before they are plotted (see
+            `plotting.decimate`), so plotting time and file size do not grow with the number of points.
+            Default is `plotting.MAX_POINTS` (4000). None plots every point.
+        decimation : str, optional
+            The decimation method, 'minmax' or 'lttb'. Default is 'minmax'.
 
         Returns
         -------
@@ -421,10 +630,11 @@ class Interpolator:
         # Check if new_y is a pandas DataFrame with multiple interpolation methods
         if isinstance(self.new_y, pd.DataFrame):
             for method_name in self.new_y.columns:
-                plt.plot(self.new_x, self.new_y[method_name], label=f'{method_name}')
+                plt.plot(*decimate(self.new_x, self.new_y[method_name], max_points, decimation),
+                         label=f'{method_name}')
         else:
             # Plot single method interpolation results
-            plt.plot(self.new_x, self.new_y, label='Interpolated')
+            plt.plot(*decimate(self.new_x, self.new_y, max_points, decimation), label='Interpolated')
 
         plt.xlabel('x')
         plt.ylabel('y')
@@ -440,6 +650,38 @@ class Interpolator:
         if show:
             plt.show()
 
+    def render(self, file_path, template=None, title=None):
+        """
+        Save a plot of the interpolation results to an image file, without pyplot.
+
+        Unlike `plot`, this method uses no global state and no display, so it can run in any thread or process.
+        To render many figures, reuse one template, or use `plotting.render_many` with `plotting.plot_job`.
+
+        Parameters
+        ----------
+        file_path : str
+            The path of the image file. Its extension sets the format.
+        template : FigureTemplate, optional
+            The layout of the figure. Default is None (a new `plotting.FigureTemplate` with the default options).
+        title : str, optional
+            The title of the figure. Default is None (the title of the template).
+
+        Returns
+        -------
+        str
+            The path of the saved image.
+
+        Raises
+        ------
+        ValueError
+            If there are no interpolation results to plot (i.e., `new_y` or `new_x` is None).
+        """
+        job = plot_job(self, file_path, title)
+        if template is not None:
+            return template.render(job)
+        with FigureTemplate() as template:
+            return template.render(job)
+
 
 def clean_arrays(x, y):
     """
@@ -512,6 +754,47 @@ def interpolate(x, y, new_x, algorithm, **kwargs):
     ValueError
         If an invalid interpolation method is provided.
     """
+    interpolator = make_interpolant(x, y, algorithm, **kwargs)
+    new_y = interpolator(new_x)
+
+    return new_y
+
+
+def make_interpolant(x, y, algorithm, **kwargs):
+    """
+    Fit an interpolant using the specified method without evaluating it.
+
+    The returned object can be evaluated as many times as needed at any set of new x-coordinates,
+    so the fit is only computed once. If `y` is two-dimensional, all its columns are fitted at once
+    along `axis` (0 by default).
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        The x-coordinates of the data points to be used for interpolation.
+    y : numpy.ndarray
+        The y-coordinates of the data points to be used for interpolation.
+    algorithm : str
+        The interpolation method to use. Can be one of:
+        'PiecewiseLinear', 'CubicSpline', 'Pchip', 'Akima1D', 'B-splines'.
+    **kwargs : dict, optional
+        Additional keyword arguments to pass to the interpolation methods.
+
+    Returns
+    -------
+    callable
+        The fitted interpolant. Calling it with new x-coordinates returns the interpolated y-coordinates.
+
+    Raises
+    ------
+    ValueError
+        If an invalid interpolation method is provided.
+
+    Notes
+    -----
+    'PiecewiseLinear' uses `numpy.interp` for one-dimensional `y`. For two-dimensional `y`, a degree 1 B-spline is
+    used instead, which gives the same values inside the data range.
+    """
     method_kwargs = {
         'PiecewiseLinear': ['left', 'right', 'period'],
         'CubicSpline': ['axis', 'bc_type', 'extrapolate'],
@@ -528,21 +811,101 @@ def interpolate(x, y, new_x, algorithm, **kwargs):
     filtered_kwargs = {key: value for key, value in kwargs.items() if key in method_kwargs[algorithm]}
 
     if algorithm == 'PiecewiseLinear':
-        new_y = np.interp(new_x, x, y, **filtered_kwargs)
+        if np.ndim(y) > 1:
+            interpolator = make_interp_spline(x, y, k=1, axis=kwargs.get('axis', 0))
+        else:
+            interpolator = partial(np.interp, xp=x, fp=y, **filtered_kwargs)
     elif algorithm == 'CubicSpline':
         interpolator = CubicSpline(x, y, **filtered_kwargs)
-        new_y = interpolator(new_x)
     elif algorithm == 'Pchip':
         interpolator = PchipInterpolator(x, y, **filtered_kwargs)
-        new_y = interpolator(new_x)
     elif algorithm == 'Akima1D':
         interpolator = Akima1DInterpolator(x, y, **filtered_kwargs)
-        new_y = interpolator(new_x)
     elif algorithm == 'B-splines':
         interpolator = make_interp_spline(x, y, **filtered_kwargs)
-        new_y = interpolator(new_x)
 
-    return new_y
+    return interpolator
+
+
+def load(file_path):
+    """
+    Load an Interpolator with its fitted interpolants from a file written by `Interpolator.save`.
+
+    Interpolating with the saved methods, scale and keyword arguments evaluates the loaded interpolants directly,
+    without refitting them.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the .npz file.
+
+    Returns
+    -------
+    Interpolator
+        The Interpolator, with its `interpolants` restored.
+
+    Raises
+    ------
+    ValueError
+        If there is an error reading the file, or if it was not written by `Interpolator.save`.
+    """
+    try:
+        with np.load(file_path, allow_pickle=False) as file:
+            arrays = dict(file)
+        metadata = json.loads(str(arrays.pop('metadata')))
+        if metadata.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported format version: {metadata.get('version')}.")
+        interpolator = Interpolator(arrays.pop('x'), arrays.pop('y'))
+        interpolator.interpolants = {
+            algorithm: _restore_interpolant({name.split('/', 1)[1]: array for name, array in arrays.items()
+                                             if name.split('/', 1)[0] == algorithm}, **parameters)
+            for algorithm, parameters in metadata['methods'].items()}
+        interpolator._fit_key = (metadata['log'], metadata['kwargs'],
+                                 fingerprint(interpolator.x, interpolator.y).hex())
+    except KeyError as e:
+        raise ValueError(f"Error reading file: missing entry {e}.")
+    except Exception as e:
+        raise ValueError(f"Error reading file: {e}")
+    return interpolator
+
+
+def _interpolant_state(interpolant):
+    """
+    Return the kind, arrays and parameters that describe a fitted interpolant.
+
+    Parameters
+    ----------
+    interpolant : callable
+        An interpolant returned by `make_interpolant`.
+
+    Returns
+    -------
+    tuple
+        The kind ('PPoly', 'BSpline' or 'interp'), a dict of arrays and a dict of JSON-serializable parameters.
+    """
+    if isinstance(interpolant, PPoly):
+        return 'PPoly', {'c': interpolant.c, 'x': interpolant.x}, {'extrapolate': interpolant.extrapolate,
+                                                                   'axis': interpolant.axis}
+    if isinstance(interpolant, BSpline):
+        return 'BSpline', {'t': interpolant.t, 'c': interpolant.c}, {'k': int(interpolant.k),
+                                                                     'extrapolate': interpolant.extrapolate,
+                                                                     'axis': interpolant.axis}
+    keywords = dict(interpolant.keywords)
+    return 'interp', {'xp': keywords.pop('xp'), 'fp': keywords.pop('fp')}, {'keywords': keywords}
+
+
+def _restore_interpolant(arrays, kind, **parameters):
+    """
+    Rebuild a fitted interpolant from the output of `_interpolant_state`, without refitting it.
+    """
+    if kind == 'PPoly':
+        return PPoly.construct_fast(arrays['c'], arrays['x'], parameters['extrapolate'], parameters['axis'])
+    if kind == 'BSpline':
+        return BSpline.construct_fast(arrays['t'], arrays['c'], parameters['k'], parameters['extrapolate'],
+                                      parameters['axis'])
+    if kind == 'interp':
+        return partial(np.interp, xp=arrays['xp'], fp=arrays['fp'], **parameters['keywords'])
+    raise ValueError(f"Unknown interpolant kind: {kind}.")
 
 
 def read_file(file_path, sheet_name=0, x_col=0, y_col=1, header=True):
@@ -0,0 +1,336 @@
+"""
+Headless rendering of interpolation figures.
+
+Figures are drawn with the object-oriented matplotlib API on Agg canvases: no pyplot state machine, no display and
+no GUI event loop, so figures can be rendered from any thread or worker process. Each `FigureTemplate` owns one
+figure, which is reused for every rendering, so memory does not grow with the number of figures. Dense series are
+decimated to a point budget before they are drawn (see `decimate`), so rendering time does not grow with them either.
+"""
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from os import cpu_count
+
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+DECIMATION_METHODS = ('minmax', 'lttb')
+MAX_POINTS = 4000  # Default point budget of a series, about two points per pixel column of a default figure
+
+
+class PlotJob(namedtuple('PlotJob', ['file_path', 'x', 'y', 'new_x', 'series', 'title'])):
+    """
+    The data of one figure: data points and interpolated series.
+
+    Attributes
+    ----------
+    file_path : str
+        The path of the image file. Its extension sets the format.
+    x, y : numpy.ndarray
+        The data points.
+    new_x : numpy.ndarray
+        The x-coordinates of the interpolated series.
+    series : dict
+        The interpolated y-coordinates, by label.
+    title : str or None
+        The title of the figure, None for the title of the template.
+    """
+    __slots__ = ()
+
+
+def plot_job(interpolator, file_path, title=None):
+    """
+    Return the PlotJob of the interpolation results of an Interpolator.
+
+    Parameters
+    ----------
+    interpolator : Interpolator
+        The Interpolator, after an interpolation.
+    file_path : str
+        The path of the image file.
+    title : str, optional
+        The title of the figure. Default is None (the title of the template).
+
+    Returns
+    -------
+    PlotJob
+        The data of the figure.
+
+    Raises
+    ------
+    ValueError
+        If there are no interpolation results to plot.
+    """
+    if interpolator.new_y is None or interpolator.new_x is None:
+        raise ValueError("No interpolation results to plot. Please run the interpolate method first.")
+    if isinstance(interpolator.new_y, np.ndarray):
+        series = {'Interpolated': interpolator.new_y}
+    else:
+        series = {str(column): interpolator.new_y[column].values for column in interpolator.new_y.columns}
+    return PlotJob(str(file_path), np.asarray(interpolator.x), np.asarray(interpolator.y),
+                   np.asarray(interpolator.new_x), series, title)
+
+
+class FigureTemplate:
+    """
+    A reusable figure layout for rendering many figures of the same kind.
+
+    The figure, its canvas and its axes (labels, scales, grid) are created once. Every call to `render` removes the
+    data of the previous figure, draws the new data and saves the image, so rendering many figures with one
+    template costs one figure of memory. Templates can be pickled (without their figure), e.g. to configure the
+    worker processes of `render_many`.
+
+    Parameters
+    ----------
+    fig_size : tuple of float, optional
+        The size of the figure (width, height) in inches. Default is (10, 6).
+    dpi : float, optional
+        The resolution of raster images, in dots per inch. Default is 100.
+    title : str, optional
+        The default title. Default is 'Interpolation Results'.
+    xlabel, ylabel : str, optional
+        The axis labels. Default is 'x' and 'y'.
+    xscale, yscale : str, optional
+        The axis scales, e.g. 'linear' or 'log'. Default is 'linear'.
+    max_points : int or None, optional
+        The point budget of every interpolated series, see `decimate`. Default is `MAX_POINTS` (4000), about two
+        points per pixel column of the default figure. None draws every point.
+    decimation : str, optional
+        The decimation method, 'minmax' or 'lttb'. Default is 'minmax'.
+    """
+
+    def __init__(self, fig_size=(10, 6), dpi=100, title='Interpolation Results', xlabel='x', ylabel='y',
+                 xscale='linear', yscale='linear', max_points=MAX_POINTS, decimation='minmax'):
+        if decimation not in DECIMATION_METHODS:
+            raise ValueError(f"Invalid decimation method: {decimation}. Valid methods are: minmax, lttb")
+        self.options = {'fig_size': tuple(fig_size), 'dpi': dpi, 'title': title, 'xlabel': xlabel,
+                        'ylabel': ylabel, 'xscale': xscale, 'yscale': yscale, 'max_points': max_points,
+                        'decimation': decimation}
+        self.figure = Figure(figsize=fig_size, dpi=dpi)
+        FigureCanvasAgg(self.figure)
+        self.axes = self.figure.add_subplot()
+        self.axes.set_xlabel(xlabel)
+        self.axes.set_ylabel(ylabel)
+        self.axes.set_xscale(xscale)
+        self.axes.set_yscale(yscale)
+        self.axes.grid(True)
+
+    def __repr__(self):
+        """
+        Return a string representation of the FigureTemplate object.
+
+        Returns
+        -------
+        str
+            A string representation of the FigureTemplate object.
+        """
+        options = ', '.join(f"{name}={value!r}" for name, value in self.options.items())
+        return f"FigureTemplate({options})"
+
+    def __getstate__(self):
+        """
+        Return the options of the template, which are enough to rebuild it.
+        """
+        return self.options
+
+    def __setstate__(self, options):
+        """
+        Rebuild the template from its options.
+        """
+        self.__init__(**options)
+
+    def __enter__(self):
+        """
+        Return the template, which is closed when the context exits.
+        """
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Close the template.
+        """
+        self.close()
+
+    def render(self, job):
+        """
+        Render a figure and save it.
+
+        Parameters
+        ----------
+        job : PlotJob
+            The data of the figure.
+
+        Returns
+        -------
+        str
+            The path of the saved image.
+        """
+        axes = self.axes
+        axes.set_prop_cycle(None)
+        try:
+            axes.plot(job.x, job.y, 'o', label='Data')
+            for label, values in job.series.items():
+                axes.plot(*decimate(job.new_x, values, self.options['max_points'], self.options['decimation']),
+                          label=label)
+            axes.set_title(self.options['title'] if job.title is None else job.title)
+            axes.relim()
+            axes.autoscale_view()
+            axes.legend()
+            self.figure.savefig(job.file_path)
+        finally:
+            for artist in list(axes.lines):
+                artist.remove()
+            if axes.get_legend() is not None:
+                axes.get_legend().remove()
+        return job.file_path
+
+    def close(self):
+        """
+        Release the figure of the template.
+        """
+        self.figure.clear()
+
+
+def decimate(x, y, max_points, method='minmax'):
+    """
+    Reduce a dense series to a point budget, keeping its visual shape.
+
+    With 'minmax', the x range is split into max_points / 2 buckets of equal width, and the minimum and the maximum
+    of every non-empty bucket are kept, in their original order, so that non-uniform grids are decimated evenly
+    along the x axis. With about two points per pixel column, the drawn line covers the same pixels as the full
+    series, including narrow spikes such as absorption edges. With 'lttb' (largest-triangle-three-buckets), one
+    point per bucket is kept: the one that forms the largest triangle with the point kept in the previous bucket and
+    the mean of the next bucket, which preserves the shape of smooth series with fewer points. The first and last
+    points are always kept. The series should be ordered by x.
+
+    Parameters
+    ----------
+    x, y : array-like
+        The series.
+    max_points : int or None
+        The maximum number of points to keep, at least 4. None (or a budget not smaller than the series) keeps every
+        point.
+    method : str, optional
+        'minmax' or 'lttb'. Default is 'minmax'.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        The x and y coordinates of the kept points.
+
+    Raises
+    ------
+    ValueError
+        If the method is invalid or the budget is smaller than 4 points.
+    """
+    if method not in DECIMATION_METHODS:
+        raise ValueError(f"Invalid decimation method: {method}. Valid methods are: minmax, lttb")
+    if max_points is not None and max_points < 4:
+        raise ValueError("Decimation failed. The point budget must be at least 4 points.")
+    x, y = np.asarray(x), np.asarray(y)
+    if max_points is None or len(x) <= max_points:
+        return x, y
+    index = _minmax(x, y, max_points) if method == 'minmax' else _lttb(x, y, max_points)
+    return x[index], y[index]
+
+
+def _minmax(x, y, max_points):
+    """
+    Return the indices of the first and last points and of the extremes of every bucket of x, in order.
+    """
+    n = len(y)
+    buckets = max(1, (max_points - 2) // 2)
+    x = x.astype(np.float64)
+    span = x[-1] - x[0]
+    if np.isfinite(span) and span > 0:
+        bucket = np.minimum(((x - x[0]) * (buckets / span)).astype(np.int64), buckets - 1)
+    else:
+        # No usable x range: buckets of consecutive points
+        bucket = np.arange(n) * buckets // n
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    segment = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, n]))
+    # NaN values (e.g. outside of the data range) are kept only if a whole bucket is NaN
+    low = np.where(np.isnan(y), np.inf, y.astype(np.float64))
+    high = np.where(np.isnan(y), -np.inf, y.astype(np.float64))
+    minimum = _first(low == np.minimum.reduceat(low, starts)[segment], segment)
+    maximum = _first(high == np.maximum.reduceat(high, starts)[segment], segment)
+    return np.unique(np.concatenate([[0, n - 1], minimum, maximum]))
+
+
+def _first(mask, segment):
+    """
+    Return the index of the first true value of every segment.
+    """
+    index = np.flatnonzero(mask)
+    return index[np.r_[True, segment[index[1:]] != segment[index[:-1]]]]
+
+
+def _lttb(x, y, max_points):
+    """
+    Return the indices of the points kept by the largest-triangle-three-buckets algorithm.
+    """
+    n = len(x)
+    x, y = x.astype(np.float64), y.astype(np.float64)
+    every = (n - 2) / (max_points - 2)
+    index = np.empty(max_points, dtype=np.int64)
+    index[0], index[-1] = 0, n - 1
+    a = 0
+    for bucket in range(max_points - 2):
+        start, end = int(bucket * every) + 1, int((bucket + 1) * every) + 1
+        next_end = min(int((bucket + 2) * every) + 1, n)
+        mean_x, mean_y = x[end:next_end].mean(), y[end:next_end].mean()
+        area = np.abs((x[a] - mean_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (mean_y - y[a]))
+        a = start + int(np.where(np.isnan(area), -1.0, area).argmax())
+        index[bucket + 1] = a
+    return index
+
+
+def render_many(jobs, template=None, processes=None, chunk_size=8):
+    """
+    Render many figures, in parallel worker processes.
+
+    Every worker process builds the template once and renders all its figures with it (see `FigureTemplate`).
+
+    Parameters
+    ----------
+    jobs : iterable of PlotJob
+        The figures to render.
+    template : FigureTemplate, optional
+        The layout of the figures. Default is None (a `FigureTemplate` with the default options).
+    processes : int, optional
+        The number of worker processes, None or 0 for all the CPUs, 1 to render in this process. Default is None.
+    chunk_size : int, optional
+        The number of figures sent to a worker at a time. Default is 8.
+
+    Returns
+    -------
+    list of str
+        The paths of the saved images, in the order of the jobs.
+    """
+    if template is None:
+        with FigureTemplate() as template:
+            return render_many(jobs, template, processes, chunk_size)
+    jobs = list(jobs)
+    processes = min(cpu_count() if not processes else processes, len(jobs))
+    if processes <= 1:
+        return [template.render(job) for job in jobs]
+    with ProcessPoolExecutor(max_workers=processes, initializer=_initialize, initargs=(template,)) as executor:
+        return list(executor.map(_render, jobs, chunksize=chunk_size))
+
+
+_template = None  # Figure template of this worker process
+
+
+def _initialize(template):
+    """
+    Set the figure template of a worker process.
+    """
+    global _template
+    _template = template
+
+
+def _render(job):
+    """
+    Render a figure in a worker process.
+    """
+    return _template.render(job)
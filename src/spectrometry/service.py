@@ -0,0 +1,580 @@
+import argparse
+import json
+import sys
+from math import isfinite
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Event, Lock, RLock, Thread
+from time import sleep
+
+import numpy as np
+
+from .attenuation import _load_table, get_registry, resolve_density, resolve_table
+from .interpolator import Interpolator
+from .uncertainty import half_value_layer
+
+
+class TableBatcher:
+    """
+    Evaluator of a fitted table that coalesces concurrent requests into batched evaluations.
+
+    The first request that finds the table idle becomes the leader: it optionally waits `window` seconds for other
+    requests to arrive, then evaluates the table once on the concatenation of the energy grids of all the pending
+    requests (each distinct grid only once) and hands every request its slice of the result. Requests that arrive
+    while an evaluation is running wait for the next batch: once its own request is evaluated, the leader hands
+    the lead to the first of them, so that no caller keeps evaluating the requests of others. Under load the table
+    is evaluated once per batch instead of once per request, and with no load a request is evaluated immediately.
+
+    Parameters
+    ----------
+    table : CoefficientTable
+        The fitted table.
+    window : float, optional
+        The time the leader waits for concurrent requests before the first evaluation, in seconds. Default is 0.
+
+    Attributes
+    ----------
+    requests : int
+        The number of evaluations requested.
+    evaluations : int
+        The number of evaluations of the table.
+    """
+
+    def __init__(self, table, window=0.0):
+        self.table = table
+        self.window = window
+        self.requests, self.evaluations = 0, 0
+        self._pending = []
+        self._busy = False
+        self._lock = Lock()
+
+    def __repr__(self):
+        """
+        Return a string representation of the TableBatcher object.
+
+        Returns
+        -------
+        str
+            A string representation of the TableBatcher object.
+        """
+        return f"TableBatcher(table={self.table}, requests={self.requests}, evaluations={self.evaluations})"
+
+    def __call__(self, energy):
+        """
+        Evaluate the table at the given energies, batched with the concurrent requests.
+
+        Parameters
+        ----------
+        energy : array-like
+            The energies at which to evaluate the table.
+
+        Returns
+        -------
+        numpy.ndarray
+            The interpolated coefficients, as returned by `CoefficientTable.__call__`.
+        """
+        request = _Request(np.asarray(energy, dtype=np.float64))
+        with self._lock:
+            self.requests += 1
+            self._pending.append(request)
+            leader, self._busy = not self._busy, True
+        if leader:
+            if self.window:
+                sleep(self.window)
+            self._lead()
+        request.done.wait()
+        if request.lead:
+            # Handed the lead by the previous leader: the request is still pending
+            request.done.clear()
+            self._lead()
+        if request.error is not None:
+            raise request.error
+        return request.values
+
+    def _lead(self):
+        """
+        Evaluate the pending requests once, then hand the lead to the first request that arrived meanwhile, if any.
+        """
+        with self._lock:
+            batch, self._pending = self._pending, []
+            self.evaluations += 1
+        self._evaluate(batch)
+        with self._lock:
+            if self._pending:
+                successor = self._pending[0]
+                successor.lead = True
+                successor.done.set()
+            else:
+                self._busy = False
+
+    def _evaluate(self, batch):
+        """
+        Evaluate the table once for a batch of requests and complete them.
+        """
+        grids = {}
+        for request in batch:
+            grids.setdefault(request.energy.tobytes(), request.energy)
+        try:
+            values = self.table(np.concatenate(list(grids.values())))
+            slices = np.split(values, np.cumsum([grid.size for grid in grids.values()])[:-1])
+            results = dict(zip(grids, slices))
+            for request in batch:
+                request.values = results[request.energy.tobytes()]
+        except Exception as e:
+            for request in batch:
+                request.error = e
+        finally:
+            for request in batch:
+                request.done.set()
+
+
+class _Request:
+    """
+    A pending evaluation of a TableBatcher.
+    """
+    __slots__ = ('energy', 'values', 'error', 'done', 'lead')
+
+    def __init__(self, energy):
+        self.energy = energy
+        self.values, self.error = None, None
+        self.done = Event()
+        self.lead = False
+
+
+class CalculationService:
+    """
+    Calculations of a long-running process, with the fitted tables kept warm in memory.
+
+    Conversion coefficient tables are read and fitted once, when the service is created. Materials are registered
+    in the process-wide attenuation registry (`attenuation.get_registry`) and preloaded, and the HVL solver is run
+    once, so that its compiled kernel (if numba is installed) is compiled, and numba's threading layer started, by
+    the thread that creates the service rather than by a request thread. Every table is evaluated
+    through a `TableBatcher`, so concurrent requests on the same table are evaluated together. The calculation
+    methods take and return JSON-compatible dicts; `make_server` exposes them over HTTP.
+
+    Parameters
+    ----------
+    tables : dict, optional
+        The named tables, e.g. conversion coefficient tables, mapping names to file paths or any input accepted by
+        `tables.as_table`. Default is None.
+    materials : dict, optional
+        The materials to register, mapping names to dicts with optional 'mu', 'mu_tr' and 'density' sources, as in
+        `AttenuationRegistry.register`. Default is None.
+    method : str, optional
+        The interpolation method of the tables. Default is 'Akima1D'.
+    window : float, optional
+        The time to wait for concurrent requests on a table before evaluating it, in seconds. Default is 0.
+
+    Attributes
+    ----------
+    tables : dict
+        The fitted named tables.
+    """
+
+    def __init__(self, tables=None, materials=None, method='Akima1D', window=0.0):
+        self.method = method
+        self.window = window
+        self.tables = {name: _load_table(source, method) for name, source in (tables or {}).items()}
+        registry = get_registry()
+        for name, source in (materials or {}).items():
+            registry.register(name, **source)
+        registry.preload(materials or {})
+        half_value_layer(np.ones(2), np.ones(2), np.ones(2), np.ones(2))
+        self._batchers = {}
+        self._lock = RLock()
+
+    def __repr__(self):
+        """
+        Return a string representation of the CalculationService object.
+
+        Returns
+        -------
+        str
+            A string representation of the CalculationService object.
+        """
+        return f"CalculationService(tables={list(self.tables)}, method='{self.method}')"
+
+    def describe(self):
+        """
+        Return the names of the warm tables and registered materials.
+
+        Returns
+        -------
+        dict
+            'tables' maps every table name to its column labels (None for one-dimensional tables), and 'materials'
+            lists the registered materials.
+        """
+        tables = {name: None if table.values.ndim == 1 else _labels(table) for name, table in self.tables.items()}
+        return {'tables': tables, 'materials': list(get_registry().sources)}
+
+    def interpolate(self, request):
+        """
+        Interpolate a named table, or the x and y data of the request, at new points.
+
+        Parameters
+        ----------
+        request : dict
+            Either 'table' (a table name) and 'energy', or 'x', 'y' and 'new_x' with optional 'algorithm' (a method
+            or a list of methods, default 'Akima1D') and 'log' (default False), as in `Interpolator.interpolate`.
+
+        Returns
+        -------
+        dict
+            'values': the interpolated values, a list, a list of rows for two-dimensional tables, or a dict of lists
+            by method for several methods.
+        """
+        if 'table' in request:
+            return {'values': self._evaluate(self._table(request['table']), _array(request, 'energy')).tolist()}
+        algorithm = request.get('algorithm', 'Akima1D')
+        if not isinstance(algorithm, str) and not (isinstance(algorithm, list) and algorithm and
+                                                   all(isinstance(method, str) for method in algorithm)):
+            raise ValueError("Request failed. Field algorithm must be a method name or a list of method names.")
+        interpolator = Interpolator(_array(request, 'x'), _array(request, 'y'))
+        values = interpolator.interpolate(_array(request, 'new_x'), algorithm, log=bool(request.get('log', False)))
+        if isinstance(values, np.ndarray):
+            return {'values': values.tolist()}
+        return {'values': {column: values[column].tolist() for column in values.columns}}
+
+    def hvl(self, request):
+        """
+        Calculate the Half-Value Layer (HVL) of a spectrum.
+
+        Parameters
+        ----------
+        request : dict
+            'energy' and 'fluence' of the spectrum, 'mu' (the material of the absorber), and optionally 'mu_tr' (the
+            material of the kerma, default 'air'), 'density' (default: the registered density of the absorber) and
+            'ratio' (default 0.5). See `Spectrum.calculate_hvl`.
+
+        Returns
+        -------
+        dict
+            'hvl': the HVL.
+        """
+        energy, fluence = _spectrum(request)
+        material = _field(request, 'mu')
+        mu = self._evaluate(self._material(material, 'mu'), energy)
+        mu = mu * resolve_density(material, _number(request, 'density'))
+        mu_tr = self._evaluate(self._material(request.get('mu_tr', 'air'), 'mu_tr'), energy)
+        return {'hvl': float(half_value_layer(energy, fluence, mu, mu_tr, ratio=_number(request, 'ratio', 0.5)))}
+
+    def conversion_coefficient(self, request):
+        """
+        Calculate the spectrum-averaged conversion coefficients of a spectrum.
+
+        Parameters
+        ----------
+        request : dict
+            'energy' and 'fluence' of the spectrum, 'table' (the name of a conversion coefficient table) and
+            optionally 'mu_tr' (the material of the kerma, default 'air'). See `Spectrum.conversion_coefficient`.
+
+        Returns
+        -------
+        dict
+            'values': the conversion coefficient, or a dict of conversion coefficients by column label for
+            two-dimensional tables.
+        """
+        energy, fluence = _spectrum(request)
+        table = self._table(request.get('table'))
+        weights = energy * fluence * self._evaluate(self._material(request.get('mu_tr', 'air'), 'mu_tr'), energy)
+        coefficients = np.dot(weights, self._evaluate(table, energy)) / weights.sum()
+        if table.values.ndim == 1:
+            return {'values': float(coefficients)}
+        return {'values': dict(zip(_labels(table), coefficients.tolist()))}
+
+    def batcher(self, table):
+        """
+        Return the TableBatcher of a fitted table, creating it if needed.
+
+        Parameters
+        ----------
+        table : CoefficientTable
+            The fitted table.
+
+        Returns
+        -------
+        TableBatcher
+            The batcher shared by all the requests on the table.
+        """
+        with self._lock:
+            batcher = self._batchers.get(table.fingerprint)
+            if batcher is None:
+                batcher = self._batchers[table.fingerprint] = TableBatcher(table, self.window)
+            return batcher
+
+    def _evaluate(self, table, energy):
+        """
+        Evaluate a fitted table through its batcher.
+        """
+        return self.batcher(table)(energy)
+
+    def _table(self, name):
+        """
+        Return a named table.
+        """
+        if not isinstance(name, str):
+            raise ValueError("Request failed. Tables must be given by name.")
+        if name not in self.tables:
+            raise ValueError(f"Request failed. Unknown table: {name}.")
+        return self.tables[name]
+
+    def _material(self, name, quantity):
+        """
+        Return the fitted table of a registered material.
+        """
+        if not isinstance(name, str):
+            raise ValueError("Request failed. Materials must be given by name.")
+        return resolve_table(name, quantity, self.method)
+
+
+def _labels(table):
+    """
+    Return the column labels of a two-dimensional table, as strings.
+    """
+    labels = table.labels if table.labels is not None else range(table.values.shape[1])
+    return [str(label) for label in labels]
+
+
+def _field(request, name):
+    """
+    Return a required field of a request.
+    """
+    if name not in request:
+        raise ValueError(f"Request failed. Missing field: {name}.")
+    return request[name]
+
+
+def _array(request, name):
+    """
+    Return a required field of a request as a one-dimensional float array.
+    """
+    try:
+        array = np.asarray(_field(request, name), dtype=np.float64)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Request failed. Invalid field {name}: {e}")
+    if array.ndim != 1:
+        raise ValueError(f"Request failed. Field {name} must be a list of numbers.")
+    return array
+
+
+def _number(request, name, default=None):
+    """
+    Return an optional numeric field of a request as a float, or the default if it is missing or null.
+    """
+    value = request.get(name)
+    if value is None:
+        return default
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"Request failed. Field {name} must be a number.")
+    return float(value)
+
+
+def _spectrum(request):
+    """
+    Return the energy and fluence arrays of a request.
+    """
+    energy, fluence = _array(request, 'energy'), _array(request, 'fluence')
+    if energy.shape != fluence.shape:
+        raise ValueError("Request failed. Energy and fluence must have the same length.")
+    return energy, fluence
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    HTTP/JSON front end of a CalculationService.
+
+    GET /health and GET /tables describe the service. POST /interpolate, /hvl and /conversion-coefficient take a
+    JSON object and answer with the JSON result of the corresponding `CalculationService` method. Invalid requests
+    are answered with status 400 and {"error": message}, and unexpected errors with status 500. Values that are
+    not finite (e.g. interpolated outside of a table) are sent as null.
+    """
+    protocol_version = 'HTTP/1.1'
+    routes = {'/interpolate': 'interpolate', '/hvl': 'hvl', '/conversion-coefficient': 'conversion_coefficient'}
+
+    def do_GET(self):
+        """
+        Answer a GET request.
+        """
+        if self.path == '/health':
+            self._send(HTTPStatus.OK, {'status': 'ok'})
+        elif self.path == '/tables':
+            self._send(HTTPStatus.OK, self.server.service.describe())
+        else:
+            self._send(HTTPStatus.NOT_FOUND, {'error': f"Unknown path: {self.path}"})
+
+    def do_POST(self):
+        """
+        Answer a POST request.
+        """
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            if length < 0:
+                raise ValueError(length)
+        except ValueError:
+            # The body cannot be skipped, so the connection cannot be reused
+            self.close_connection = True
+            self._send(HTTPStatus.BAD_REQUEST, {'error': "Request failed. Invalid Content-Length header."})
+            return
+        body = self.rfile.read(length)
+        if self.path not in self.routes:
+            self._send(HTTPStatus.NOT_FOUND, {'error': f"Unknown path: {self.path}"})
+            return
+        try:
+            request = json.loads(body)
+            if not isinstance(request, dict):
+                raise ValueError("Request failed. The body must be a JSON object.")
+            response = getattr(self.server.service, self.routes[self.path])(request)
+        except ValueError as e:
+            self._send(HTTPStatus.BAD_REQUEST, {'error': str(e)})
+        except Exception as e:
+            self.log_error("%s failed: %r", self.path, e)
+            self._send(HTTPStatus.INTERNAL_SERVER_ERROR, {'error': f"Internal error: {type(e).__name__}: {e}"})
+        else:
+            self._send(HTTPStatus.OK, response)
+
+    def log_message(self, format, *args):
+        """
+        Log requests only if the server is verbose.
+        """
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send(self, status, content):
+        """
+        Send a JSON response.
+        """
+        body = json.dumps(_finite(content), allow_nan=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def _finite(content):
+    """
+    Return JSON content with the values that are not finite (NaN, infinity) replaced by None.
+    """
+    if isinstance(content, dict):
+        return {key: _finite(value) for key, value in content.items()}
+    if isinstance(content, (list, tuple)):
+        return [_finite(value) for value in content]
+    if isinstance(content, float) and not isfinite(content):
+        return None
+    return content
+
+
+def make_server(service, host='127.0.0.1', port=0, verbose=False):
+    """
+    Create an HTTP server for a CalculationService, answering every request in its own thread.
+
+    Parameters
+    ----------
+    service : CalculationService
+        The service.
+    host : str, optional
+        The address to listen on. Default is '127.0.0.1' (local requests only).
+    port : int, optional
+        The port to listen on. Default is 0 (any free port, see the `server_address` attribute of the server).
+    verbose : bool, optional
+        If True, log every request to the standard error. Default is False.
+
+    Returns
+    -------
+    http.server.ThreadingHTTPServer
+        The server, not started yet: call its `serve_forever` method, and `shutdown` to stop it.
+    """
+    server = ThreadingHTTPServer((host, port), ServiceHandler)
+    server.daemon_threads = True
+    server.service, server.verbose = service, verbose
+    return server
+
+
+def start_server(service, host='127.0.0.1', port=0):
+    """
+    Start an HTTP server for a CalculationService in a background thread.
+
+    Parameters
+    ----------
+    service : CalculationService
+        The service.
+    host : str, optional
+        The address to listen on. Default is '127.0.0.1'.
+    port : int, optional
+        The port to listen on. Default is 0 (any free port).
+
+    Returns
+    -------
+    http.server.ThreadingHTTPServer
+        The running server. Call its `shutdown` and `server_close` methods to stop it.
+    """
+    server = make_server(service, host, port)
+    Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main(argv=None):
+    """
+    Run the calculation service until it is interrupted.
+
+    Parameters
+    ----------
+    argv : list of str, optional
+        The command line arguments. Default is None (`sys.argv`).
+
+    Returns
+    -------
+    int
+        The exit status: 0 when interrupted, 1 if a table could not be read.
+    """
+    parser = argparse.ArgumentParser(prog='spectrometry.service',
+                                     description="Serve HVL, conversion coefficient and interpolation calculations "
+                                                 "over HTTP/JSON, with the tables kept in memory.")
+    parser.add_argument('--table', action='append', default=[], metavar='NAME=PATH',
+                        help="Named coefficient table, e.g. a conversion coefficient table. Repeatable.")
+    parser.add_argument('--mutr', required=True, help="Mass energy-transfer coefficient table of air (mutr/rho).")
+    parser.add_argument('--material', action='append', default=[], metavar='NAME=PATH[,DENSITY]',
+                        help="Mass attenuation coefficient table (mu/rho) of an absorber, for the HVL. Repeatable.")
+    parser.add_argument('--method', default='Akima1D', help="Interpolation method of the tables. Default: Akima1D.")
+    parser.add_argument('--window', type=float, default=0.0,
+                        help="Seconds to wait for concurrent requests on a table before evaluating it. Default: 0.")
+    parser.add_argument('--host', default='127.0.0.1', help="Address to listen on. Default: 127.0.0.1.")
+    parser.add_argument('--port', type=int, default=8000, help="Port to listen on. Default: 8000.")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Log every request to the standard error.")
+    args = parser.parse_args(argv)
+
+    try:
+        tables = dict(_option(value, '--table') for value in args.table)
+        materials = {'air': {'mu_tr': args.mutr}}
+        for value in args.material:
+            name, source = _option(value, '--material')
+            path, _, density = source.partition(',')
+            materials[name] = {'mu': path, 'density': float(density) if density else None}
+        service = CalculationService(tables, materials, args.method, args.window)
+    except ValueError as e:
+        print(f"spectrometry: {e}", file=sys.stderr)
+        return 1
+
+    server = make_server(service, args.host, args.port, args.verbose)
+    print(f"Serving on http://{server.server_address[0]}:{server.server_address[1]}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+def _option(value, option):
+    """
+    Split a NAME=VALUE command line option.
+    """
+    name, separator, source = value.partition('=')
+    if not separator or not name or not source:
+        raise ValueError(f"Invalid {option}: {value}. Expected NAME=VALUE.")
+    return name, source
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,394 @@
+from os.path import basename, splitext
+
+import numpy as np
+import pandas as pd
+from scipy.interpolate import CubicSpline, PchipInterpolator, Akima1DInterpolator
+
+from .attenuation import resolve_density, resolve_table
+from .cache import grid_cache
+from .spectrometry import Spectrum, read_spectrum, rebin, summarize
+from .tables import as_table
+from .uncertainty import conversion_coefficient, half_value_layer
+
+
+class SpectrumSet:
+    """
+    Collection of spectra sharing one energy axis, stored as one contiguous two-dimensional array.
+
+    Every operation is applied to all the spectra at once, as array operations over the (spectra, bins) array,
+    instead of looping over Spectrum objects. Spectra are identified by name, and an optional metadata table holds
+    one row per spectrum.
+
+    Parameters
+    ----------
+    energy : array-like
+        The energy of every bin, (bins,), shared by all spectra.
+    values : array-like
+        The fluence (or fluence rate) of every spectrum and bin, (spectra, bins).
+    names : array-like, optional
+        The names of the spectra. Default is None (0, 1, 2...).
+    metadata : pandas.DataFrame, optional
+        One row per spectrum, in the same order. Its index is replaced by the names. Default is None (no columns).
+    kerma : array-like, optional
+        The air kerma of every spectrum and bin, (spectra, bins), if measured. Default is None.
+
+    Attributes
+    ----------
+    energy : numpy.ndarray
+        The energy of every bin.
+    values : numpy.ndarray
+        The fluence of every spectrum and bin.
+    kerma : numpy.ndarray or None
+        The air kerma of every spectrum and bin.
+    names : pandas.Index
+        The names of the spectra.
+    metadata : pandas.DataFrame
+        The metadata of the spectra, indexed by name.
+
+    Raises
+    ------
+    ValueError
+        If the shapes of the arrays, the names or the metadata do not match.
+    """
+
+    def __init__(self, energy, values, names=None, metadata=None, kerma=None):
+        self.energy = np.asarray(energy, dtype=np.float64)
+        self.values = np.ascontiguousarray(np.atleast_2d(np.asarray(values, dtype=np.float64)))
+        self.kerma = None
+        if kerma is not None:
+            self.kerma = np.ascontiguousarray(np.atleast_2d(np.asarray(kerma, dtype=np.float64)))
+        if self.energy.ndim != 1 or self.values.shape[1] != self.energy.size:
+            raise ValueError("SpectrumSet constructor failed. Values must have one column per energy.")
+        if self.kerma is not None and self.kerma.shape != self.values.shape:
+            raise ValueError("SpectrumSet constructor failed. Kerma and values must have the same shape.")
+        self.names = pd.Index(range(len(self.values)) if names is None else names)
+        if len(self.names) != len(self.values):
+            raise ValueError("SpectrumSet constructor failed. There must be one name per spectrum.")
+        if metadata is None:
+            metadata = pd.DataFrame(index=self.names)
+        elif len(metadata) != len(self.values):
+            raise ValueError("SpectrumSet constructor failed. Metadata must have one row per spectrum.")
+        self.metadata = metadata.set_axis(self.names, axis=0)
+
+    @classmethod
+    def from_spectra(cls, spectra, names=None, metadata=None, energy=None):
+        """
+        Create a SpectrumSet from Spectrum objects.
+
+        Parameters
+        ----------
+        spectra : iterable of Spectrum
+            The spectra.
+        names : array-like, optional
+            The names of the spectra. Default is None (0, 1, 2...).
+        metadata : pandas.DataFrame, optional
+            One row per spectrum. Default is None.
+        energy : array-like, optional
+            The common energy axis. Spectra on other grids are rebinned onto it (see `spectrometry.rebin`).
+            Default is None (all the spectra must have the same energies).
+
+        Returns
+        -------
+        SpectrumSet
+            The spectra in one collection.
+
+        Raises
+        ------
+        ValueError
+            If there are no spectra, or if `energy` is not given and the spectra have different energies.
+        """
+        spectra = list(spectra)
+        if not spectra:
+            raise ValueError("SpectrumSet creation failed. At least one spectrum is required.")
+        if energy is None:
+            energy = spectra[0].energy
+            if any(not np.array_equal(spectrum.energy, energy) for spectrum in spectra):
+                raise ValueError("SpectrumSet creation failed. Spectra have different energies; "
+                                 "pass a common energy axis to rebin them.")
+        else:
+            energy = np.asarray(energy, dtype=np.float64)
+            spectra = [spectrum if np.array_equal(spectrum.energy, energy) else spectrum.rebin(energy)
+                       for spectrum in spectra]
+        kerma = None
+        if all(spectrum.kerma is not None for spectrum in spectra):
+            kerma = np.stack([spectrum.kerma for spectrum in spectra])
+        return cls(energy, np.stack([spectrum.values for spectrum in spectra]), names, metadata, kerma)
+
+    def __len__(self):
+        """
+        Return the number of spectra.
+        """
+        return len(self.values)
+
+    def __repr__(self):
+        """
+        Return a string representation of the SpectrumSet object.
+
+        Returns
+        -------
+        str
+            A string representation of the SpectrumSet object.
+        """
+        return f"SpectrumSet(spectra={len(self)}, bins={self.energy.size})"
+
+    def __iter__(self):
+        """
+        Iterate over the spectra as Spectrum objects.
+        """
+        return (self._spectrum(row) for row in range(len(self)))
+
+    def __getitem__(self, key):
+        """
+        Select spectra.
+
+        An integer position or a name returns a Spectrum. A slice, a boolean mask, or an array of positions or
+        names returns a SpectrumSet.
+        """
+        if isinstance(key, (int, np.integer)):
+            return self._spectrum(key)
+        if isinstance(key, str):
+            return self._spectrum(self.names.get_loc(key))
+        if isinstance(key, slice):
+            return self._take(np.arange(len(self))[key])
+        key = np.asarray(key)
+        if key.dtype == bool:
+            return self._take(np.flatnonzero(key))
+        if np.issubdtype(key.dtype, np.integer):
+            return self._take(key)
+        rows = self.names.get_indexer(key)
+        if np.any(rows < 0):
+            raise ValueError(f"SpectrumSet selection failed. Unknown names: {list(key[rows < 0])}")
+        return self._take(rows)
+
+    def __add__(self, other):
+        """
+        Add the spectra of another SpectrumSet (with the same energies and number of spectra) bin by bin.
+        """
+        if not isinstance(other, SpectrumSet):
+            return NotImplemented
+        if not np.array_equal(self.energy, other.energy) or len(self) != len(other):
+            raise ValueError("SpectrumSet addition failed. Both sets must have the same energies and size.")
+        kerma = None if self.kerma is None or other.kerma is None else self.kerma + other.kerma
+        return SpectrumSet(self.energy, self.values + other.values, self.names, self.metadata, kerma)
+
+    def sum(self):
+        """
+        Return the sum of all the spectra, as a Spectrum.
+        """
+        kerma = None if self.kerma is None else self.kerma.sum(axis=0)
+        return Spectrum(self.energy, self.values.sum(axis=0), kerma)
+
+    def scale(self, factors):
+        """
+        Multiply every spectrum by a factor.
+
+        Parameters
+        ----------
+        factors : float or array-like
+            One factor for all the spectra, or one factor per spectrum.
+
+        Returns
+        -------
+        SpectrumSet
+            The scaled spectra.
+        """
+        factors = np.asarray(factors, dtype=np.float64)
+        factors = factors[:, None] if factors.ndim else factors
+        kerma = None if self.kerma is None else self.kerma * factors
+        return SpectrumSet(self.energy, self.values * factors, self.names, self.metadata, kerma)
+
+    def normalize(self, mutr_table=None, method='Akima1D'):
+        """
+        Scale every spectrum to unit total fluence or, if `mutr_table` is given, to unit air kerma.
+
+        Parameters
+        ----------
+        mutr_table : str, CoefficientTable or table-like, optional
+            The mutr/rho table of air, see `Spectrum.kerma_weights`. Default is None.
+        method : str, optional
+            The interpolation method used if a new table has to be fitted. Default is 'Akima1D'.
+
+        Returns
+        -------
+        SpectrumSet
+            The normalized spectra.
+        """
+        if mutr_table is None:
+            totals = self.values.sum(axis=1)
+        else:
+            totals = self.kerma_weights(mutr_table, method).sum(axis=1)
+        return self.scale(1 / totals)
+
+    def interpolate(self, new_energies, log_scale=False, method='Akima1D'):
+        """
+        Interpolate all the spectra to a new set of energies with one interpolant.
+
+        Parameters
+        ----------
+        new_energies : array-like
+            The new energies.
+        log_scale : bool, optional
+            If True, interpolate in log-log scale. Default is False.
+        method : str, optional
+            The interpolation method: 'CubicSpline', 'PchipInterpolator' or 'Akima1D'. Default is 'Akima1D'.
+
+        Returns
+        -------
+        SpectrumSet
+            The interpolated spectra, with the same names and metadata.
+
+        Raises
+        ------
+        ValueError
+            If an invalid interpolation method is provided.
+        """
+        new_energies = np.asarray(new_energies, dtype=np.float64)
+        energies, values, points = self.energy, self.values, new_energies
+        if log_scale:
+            energies, values, points = np.log(energies), np.log(values), np.log(points)
+        if method == 'CubicSpline':
+            interpolator = CubicSpline(energies, values, axis=1)
+        elif method == 'PchipInterpolator':
+            interpolator = PchipInterpolator(energies, values, axis=1)
+        elif method == 'Akima1D':
+            interpolator = Akima1DInterpolator(energies, values, axis=1)
+        else:
+            raise ValueError('Interpolation methods: CubicSpline, PchipInterpolator and Akima1D')
+        new_values = interpolator(points)
+        if log_scale:
+            new_values = np.exp(new_values)
+        return SpectrumSet(new_energies, new_values, self.names, self.metadata)
+
+    def rebin(self, new_energies):
+        """
+        Rebin all the spectra to new energy bins, conserving fluence and kerma (see `spectrometry.rebin`).
+
+        Parameters
+        ----------
+        new_energies : array-like
+            The new bin energies.
+
+        Returns
+        -------
+        SpectrumSet
+            The rebinned spectra.
+        """
+        new_energies = np.asarray(new_energies, dtype=np.float64)
+        kerma = None if self.kerma is None else rebin(self.energy, self.kerma, new_energies)
+        return SpectrumSet(new_energies, rebin(self.energy, self.values, new_energies), self.names, self.metadata,
+                           kerma)
+
+    def kerma_weights(self, mutr_table, method='Akima1D'):
+        """
+        Calculate the air kerma contribution of every spectrum and bin, E·Φ·mutr.
+
+        Parameters
+        ----------
+        mutr_table : str, CoefficientTable or table-like
+            The mutr/rho table of air, see `Spectrum.kerma_weights`.
+        method : str, optional
+            The interpolation method used if a new table has to be fitted. Default is 'Akima1D'.
+
+        Returns
+        -------
+        numpy.ndarray
+            The kerma weights, (spectra, bins).
+        """
+        return self.values * (self.energy * self._evaluate(resolve_table(mutr_table, 'mu_tr', method)))
+
+    def summary(self, mutr_table=None, quantiles=(0.1, 0.5, 0.9), method='Akima1D'):
+        """
+        Calculate the summary quantities of all the spectra in one fused pass (see `spectrometry.summarize`).
+
+        The air kerma comes from the kerma values of the set, if any, or else from E·Φ·mutr with `mutr_table`.
+
+        Returns
+        -------
+        SpectrumSummary
+            The summary quantities, with one entry per spectrum.
+        """
+        kerma = self.kerma
+        if kerma is None and mutr_table is not None:
+            kerma = self.kerma_weights(mutr_table, method)
+        return summarize(self.energy, self.values, kerma, quantiles)
+
+    def calculate_hvl(self, mu_table, mutr_table, density=None, ratio=0.5, method='Akima1D'):
+        """
+        Calculate the half-value layer of every spectrum, solved by one batched Newton iteration.
+
+        Parameters are those of `Spectrum.calculate_hvl`.
+
+        Returns
+        -------
+        pandas.Series
+            The HVL of every spectrum, indexed by name.
+        """
+        mu = self._evaluate(resolve_table(mu_table, 'mu', method)) * resolve_density(mu_table, density)
+        mu_tr = self._evaluate(resolve_table(mutr_table, 'mu_tr', method))
+        return pd.Series(half_value_layer(self.energy, self.values, mu, mu_tr, ratio=ratio), index=self.names)
+
+    def conversion_coefficients(self, hk_table, mutr_table, method='Akima1D'):
+        """
+        Calculate the spectrum-averaged conversion coefficient of every spectrum with one matrix product.
+
+        Parameters
+        ----------
+        hk_table : CoefficientTable or table-like
+            The monoenergetic conversion coefficients, with one column per angle if two-dimensional.
+        mutr_table : str, CoefficientTable or table-like
+            The mutr/rho table of air, see `Spectrum.kerma_weights`.
+        method : str, optional
+            The interpolation method used if a new table has to be fitted. Default is 'Akima1D'.
+
+        Returns
+        -------
+        pandas.Series or pandas.DataFrame
+            The conversion coefficient of every spectrum, indexed by name, with one column per angle for a
+            two-dimensional table.
+        """
+        hk_table = as_table(hk_table, method)
+        mu_tr = self._evaluate(resolve_table(mutr_table, 'mu_tr', method))
+        coefficients = conversion_coefficient(self.energy, self.values, mu_tr, 1.0, self._evaluate(hk_table))
+        if coefficients.ndim == 1:
+            return pd.Series(coefficients, index=self.names)
+        labels = hk_table.labels if hk_table.labels is not None else range(coefficients.shape[1])
+        return pd.DataFrame(coefficients, index=self.names, columns=labels)
+
+    def _spectrum(self, row):
+        """Returns one spectrum of the set as a Spectrum."""
+        return Spectrum(self.energy, self.values[row], None if self.kerma is None else self.kerma[row])
+
+    def _take(self, rows):
+        """Returns the spectra at the given positions as a SpectrumSet."""
+        kerma = None if self.kerma is None else self.kerma[rows]
+        return SpectrumSet(self.energy, self.values[rows], self.names[rows], self.metadata.iloc[rows], kerma)
+
+    def _evaluate(self, table):
+        """Evaluates a fitted table on the energy axis, reusing the values cached for this axis, if any."""
+        return grid_cache.get(table, self.energy)
+
+
+def read_spectra(file_paths, energy=None):
+    """
+    Read spectra from CSV or Excel files into a SpectrumSet named after the files.
+
+    Parameters
+    ----------
+    file_paths : iterable of str
+        The paths to the files, in the format of `spectrometry.read_spectrum`.
+    energy : array-like, optional
+        The common energy axis, see `SpectrumSet.from_spectra`. Default is None.
+
+    Returns
+    -------
+    SpectrumSet
+        The spectra, named after the files without their extensions.
+
+    Raises
+    ------
+    ValueError
+        If there is an error reading a file, or if the spectra cannot share an energy axis.
+    """
+    file_paths = [str(file_path) for file_path in file_paths]
+    names = [splitext(basename(file_path))[0] for file_path in file_paths]
+    return SpectrumSet.from_spectra([read_spectrum(file_path) for file_path in file_paths], names, energy=energy)
@@ -0,0 +1,238 @@
+import os
+import sqlite3
+from math import isnan
+from os.path import join
+from time import time
+
+import pandas as pd
+
+from .incremental import task_key
+
+COLUMNS = ['campaign', 'spectrum', 'quantity', 'table', 'angle', 'mean', 'sd', 'cv', 'parameters']
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS campaigns (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    created REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS results (
+    campaign INTEGER NOT NULL REFERENCES campaigns (id),
+    spectrum TEXT NOT NULL,
+    quantity TEXT NOT NULL,
+    table_name TEXT NOT NULL,
+    angle TEXT NOT NULL,
+    mean REAL,
+    sd REAL,
+    cv REAL,
+    parameters TEXT NOT NULL,
+    UNIQUE (campaign, spectrum, quantity, table_name, angle, parameters)
+);
+CREATE INDEX IF NOT EXISTS results_lookup ON results (spectrum, table_name, angle);
+CREATE INDEX IF NOT EXISTS results_table ON results (table_name, angle);
+"""
+
+
+class ResultStore:
+    """
+    SQLite database of batch results, across calibration campaigns.
+
+    Every result is stored as one row (campaign, spectrum, quantity, table, angle, mean, sd, cv, parameters), where
+    `cv` is the coefficient of variation in percent (the V_HPK of the reference script) and `parameters` is a hash
+    of the calculation parameters (see `parameters_hash`). Rows are indexed by spectrum, table and angle, so that
+    the history of one result across campaigns is a single indexed query, and they are inserted in bulk, in one
+    transaction per call. Storing a result again for the same campaign and parameters replaces it.
+
+    Parameters
+    ----------
+    path : str or path-like, optional
+        The path of the database file, created if it does not exist. Default is ':memory:' (a temporary database).
+
+    Attributes
+    ----------
+    path : str
+        The path of the database file.
+    """
+
+    def __init__(self, path=':memory:'):
+        self.path = str(path)
+        try:
+            self._connection = sqlite3.connect(self.path)
+            self._connection.executescript(_SCHEMA)
+        except sqlite3.Error as e:
+            raise ValueError(f"Error opening the result store: {e}")
+
+    def __repr__(self):
+        """
+        Return a string representation of the ResultStore object.
+
+        Returns
+        -------
+        str
+            A string representation of the ResultStore object.
+        """
+        return f"ResultStore(path='{self.path}')"
+
+    def __enter__(self):
+        """
+        Return the store, which is closed when the context exits.
+        """
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Close the store.
+        """
+        self.close()
+
+    def __len__(self):
+        """
+        Return the number of stored results.
+        """
+        return self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def close(self):
+        """
+        Close the database.
+        """
+        self._connection.close()
+
+    def campaigns(self):
+        """
+        Return the names of the campaigns, from the oldest to the newest.
+
+        Returns
+        -------
+        list of str
+            The names of the campaigns.
+        """
+        return [name for name, in self._connection.execute("SELECT name FROM campaigns ORDER BY id")]
+
+    def insert(self, campaign, results, parameters=''):
+        """
+        Store the results of a campaign, in one transaction.
+
+        Parameters
+        ----------
+        campaign : str
+            The name of the campaign. It is created if it does not exist.
+        results : iterable of BatchResult or sequence
+            The results, as (spectrum, quantity, table, angle, value, uncertainty) rows. NaN uncertainties (not
+            calculated) are stored as NULL.
+        parameters : str, optional
+            The hash of the calculation parameters, see `parameters_hash`. Default is ''.
+
+        Returns
+        -------
+        int
+            The number of stored results.
+        """
+        rows = []
+        for spectrum, quantity, table, angle, value, uncertainty in results:
+            value, uncertainty = _number(value), _number(uncertainty)
+            cv = 100 * uncertainty / value if uncertainty is not None and value else None
+            rows.append((spectrum, quantity, table, str(angle), value, uncertainty, cv, parameters))
+        with self._connection:
+            self._connection.execute("INSERT OR IGNORE INTO campaigns (name, created) VALUES (?, ?)",
+                                     (campaign, time()))
+            campaign_id = self._connection.execute("SELECT id FROM campaigns WHERE name = ?",
+                                                   (campaign,)).fetchone()[0]
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO results (campaign, spectrum, quantity, table_name, angle, mean, sd, cv, "
+                "parameters) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", [(campaign_id,) + row for row in rows])
+        return len(rows)
+
+    def query(self, spectrum=None, table=None, angle=None, quantity=None, campaign=None, last=None):
+        """
+        Return the stored results that match all the given criteria.
+
+        Parameters
+        ----------
+        spectrum, table, angle, quantity, campaign : str, optional
+            The values to match. Default is None (any).
+        last : int, optional
+            Only return results of the `last` newest campaigns. Default is None (all campaigns).
+
+        Returns
+        -------
+        pandas.DataFrame
+            The results, with the `COLUMNS` columns, ordered by campaign and then in insertion order.
+        """
+        conditions, arguments = [], []
+        for column, value in (('r.spectrum', spectrum), ('r.table_name', table), ('r.angle', angle),
+                              ('r.quantity', quantity), ('c.name', campaign)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                arguments.append(str(value))
+        if last is not None:
+            conditions.append("c.id IN (SELECT id FROM campaigns ORDER BY id DESC LIMIT ?)")
+            arguments.append(int(last))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._connection.execute(
+            "SELECT c.name, r.spectrum, r.quantity, r.table_name, r.angle, r.mean, r.sd, r.cv, r.parameters "
+            f"FROM results r JOIN campaigns c ON c.id = r.campaign {where} ORDER BY c.id, r.rowid",
+            arguments).fetchall()
+        return pd.DataFrame(rows, columns=COLUMNS).astype({'mean': float, 'sd': float, 'cv': float})
+
+    def export_text(self, directory, campaign=None):
+        """
+        Write the conversion coefficients in the text layout of the reference script (`guardar_txt`).
+
+        Every table gets a '<TABLE>.txt' file, for one-column tables, or one '<TABLE>_<angle>.txt' file per angle,
+        with the '_Nombre', '_Media_Espectro_<angle>' (or '__Media_Espectro__'), '______Desviación______' and
+        '_______V_HPK_______' columns. As in the reference script, rows are appended to existing files, and the
+        header is only written to empty files. HVL results have no text layout and are not exported.
+
+        Parameters
+        ----------
+        directory : str or path-like
+            The output directory. It is created if it does not exist.
+        campaign : str, optional
+            The campaign to export. Default is None (all campaigns).
+
+        Returns
+        -------
+        list of str
+            The paths of the written files.
+        """
+        os.makedirs(directory, exist_ok=True)
+        results = self.query(quantity='hk', campaign=campaign)
+        paths = []
+        for (table, angle), group in results.groupby(['table', 'angle'], sort=False):
+            name, mean = (table.upper(), '__Media_Espectro__') if angle == '' else \
+                (f"{table.upper()}_{angle}", f"_Media_Espectro_{angle}")
+            path = join(directory, f"{name}.txt")
+            text = pd.DataFrame({'_Nombre': group['spectrum'].values, mean: group['mean'].values,
+                                 '______Desviación______': group['sd'].values,
+                                 '_______V_HPK_______': group['cv'].values})
+            text.to_csv(path, header=not (os.path.isfile(path) and os.stat(path).st_size != 0), index=False, mode='a',
+                        sep=',')
+            paths.append(path)
+        return paths
+
+
+def parameters_hash(**parameters):
+    """
+    Return the hash that identifies the calculation parameters of stored results.
+
+    Parameters
+    ----------
+    **parameters : dict
+        The parameters of the calculation, e.g. interpolation method, uncertainty mode, trials and seed.
+
+    Returns
+    -------
+    str
+        The hexadecimal hash, as in `incremental.task_key`.
+    """
+    return task_key(**parameters)
+
+
+def _number(value):
+    """
+    Return a float, or None for missing values.
+    """
+    if value is None:
+        return None
+    value = float(value)
+    return None if isnan(value) else value
@@ -0,0 +1,234 @@
+import numpy as np
+import pandas as pd
+
+from .cache import fingerprint
+from .interpolator import Interpolator, clean_arrays, make_interpolant
+
+
+class CoefficientTable:
+    """
+    Tabulated coefficients versus energy, fitted once in log-log scale.
+
+    Monoenergetic conversion coefficients (hK) and mass energy-transfer or attenuation coefficients (mutr/rho,
+    mu/rho) are interpolated in log-log scale. This class fits the interpolant once, when the table is created,
+    and evaluates it on whole energy grids in a single vectorized call. Two-dimensional tables, such as
+    angle-resolved conversion coefficients, are fitted with a single multi-column interpolant.
+
+    Zero (or otherwise non-positive) entries have no logarithm. In one-dimensional tables they are removed, as in
+    `Interpolator.interpolate`. In two-dimensional tables they are masked: their logarithms are filled from the
+    valid entries of the same column so that the fit is defined, and the interpolated coefficient is zero at any
+    energy that is not bracketed by two valid entries.
+
+    Parameters
+    ----------
+    energy : array-like
+        The energies of the tabulated coefficients.
+    values : array-like
+        The tabulated coefficients. One-dimensional for a single coefficient, or two-dimensional with one
+        column per coefficient (e.g. per angle of incidence) and one row per energy.
+    labels : list, optional
+        The labels of the columns of `values`. Default is None.
+    method : str, optional
+        The interpolation method. Can be one of:
+        'PiecewiseLinear', 'CubicSpline', 'Pchip', 'Akima1D', 'B-splines'. Default is 'Akima1D'.
+    **kwargs : dict, optional
+        Additional keyword arguments to pass to the interpolation method.
+
+    Attributes
+    ----------
+    energy : numpy.ndarray
+        The energies of the tabulated coefficients.
+    values : numpy.ndarray
+        The tabulated coefficients.
+    labels : list or None
+        The labels of the columns of `values`.
+    method : str
+        The interpolation method.
+    mask : numpy.ndarray or None
+        Boolean array, True where `values` are valid. None if all values are valid.
+    fingerprint : bytes
+        A content hash of the table and its interpolation method, used as its identity by `cache.GridCache`.
+
+    Raises
+    ------
+    ValueError
+        If `energy` and `values` do not have the same number of rows.
+        If an invalid interpolation method is provided.
+    """
+
+    def __init__(self, energy, values, labels=None, method='Akima1D', **kwargs):
+        energy = np.asarray(energy, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64)
+        if values.shape[0] != energy.shape[0]:
+            raise ValueError("CoefficientTable constructor failed. Energy and values must have the same number of "
+                             "rows.")
+        if values.ndim == 1:
+            energy, values = clean_arrays(energy, values)
+        self.energy, self.values = energy, values
+        self.labels = labels
+        self.method = method
+        self.log_energy = np.log(energy)
+        self.mask = None
+        if values.ndim == 1:
+            log_values = np.log(values)
+        else:
+            log_values = self._masked_log_values()
+        self._interpolant = make_interpolant(self.log_energy, log_values, method, axis=0, **kwargs)
+        self.fingerprint = fingerprint(energy, values, np.array(repr((method, sorted(kwargs.items())))))
+
+    def __repr__(self):
+        """
+        Return a string representation of the CoefficientTable object.
+
+        Returns
+        -------
+        str
+            A string representation of the CoefficientTable object.
+        """
+        return f"CoefficientTable(rows={self.values.shape[0]}, labels={self.labels}, method='{self.method}')"
+
+    def __call__(self, energy):
+        """
+        Evaluate the coefficients at the given energies.
+
+        Parameters
+        ----------
+        energy : array-like
+            The energies at which to evaluate the coefficients.
+
+        Returns
+        -------
+        numpy.ndarray
+            The interpolated coefficients, with one row per energy and, for two-dimensional tables, one column per
+            coefficient.
+        """
+        log_energy = np.log(energy)
+        new_values = np.exp(self._interpolant(log_energy))
+        if self.mask is not None:
+            new_values[~self._valid_at(log_energy)] = 0.0
+        return new_values
+
+    def _masked_log_values(self):
+        """
+        Return the logarithm of a two-dimensional table, with invalid entries filled from the valid ones.
+
+        This method sets the `mask` attribute if any entry is zero, negative, NaN or infinite. Each invalid entry is
+        replaced by the linear interpolation (in log-log scale) of the valid entries of its column.
+
+        Returns
+        -------
+        numpy.ndarray
+            The logarithm of the tabulated coefficients.
+
+        Raises
+        ------
+        ValueError
+            If a column has no valid entries.
+        """
+        valid = np.isfinite(self.values) & (self.values > 0)
+        log_values = np.log(np.where(valid, self.values, 1.0))
+        if valid.all():
+            return log_values
+        if not valid.any(axis=0).all():
+            raise ValueError("CoefficientTable constructor failed. Every column must have at least one valid value.")
+        self.mask = valid
+        for column in np.flatnonzero(~valid.all(axis=0)):
+            rows = valid[:, column]
+            log_values[~rows, column] = np.interp(self.log_energy[~rows], self.log_energy[rows],
+                                                  log_values[rows, column])
+        return log_values
+
+    def _valid_at(self, log_energy):
+        """
+        Return whether the interpolated coefficients are valid at the given energies.
+
+        Parameters
+        ----------
+        log_energy : numpy.ndarray
+            The logarithm of the energies at which the coefficients are evaluated.
+
+        Returns
+        -------
+        numpy.ndarray
+            Boolean array with one row per energy and one column per coefficient. True if the energy lies between
+            two valid tabulated entries (or on a valid entry at the edges of the table).
+        """
+        upper = np.clip(np.searchsorted(self.log_energy, log_energy), 0, len(self.log_energy) - 1)
+        lower = np.clip(upper - 1, 0, None)
+        lower = np.where(self.log_energy[upper] == log_energy, upper, lower)
+        return self.mask[lower] & self.mask[upper]
+
+
+def read_table(file_path, method='Akima1D', **kwargs):
+    """
+    Read a coefficient table from a text or CSV file.
+
+    The column separator (comma, semicolon, tab or whitespace) is detected automatically. The first row is used as
+    the header if it is not numeric. The first column holds the energies and the remaining columns hold the
+    coefficients, e.g. one column per angle of incidence.
+
+    Parameters
+    ----------
+    file_path : str
+        The path to the file.
+    method : str, optional
+        The interpolation method. Default is 'Akima1D'.
+    **kwargs : dict, optional
+        Additional keyword arguments to pass to the interpolation method.
+
+    Returns
+    -------
+    CoefficientTable
+        The fitted coefficient table.
+
+    Raises
+    ------
+    ValueError
+        If there is an error reading the file.
+    """
+    try:
+        df = pd.read_csv(file_path, sep=None, engine='python', header=None, dtype=str, encoding='ISO-8859-1')
+        if df.iloc[0].apply(pd.to_numeric, errors='coerce').isna().any():
+            df = df.iloc[1:].set_axis(df.iloc[0].str.strip(), axis=1).reset_index(drop=True)
+        else:
+            df.columns = [str(column) for column in df.columns]
+        df = df.apply(pd.to_numeric)
+    except Exception as e:
+        raise ValueError(f"Error reading file: {e}")
+    return as_table(df, method, **kwargs)
+
+
+def as_table(table, method='Akima1D', **kwargs):
+    """
+    Convert the input to a CoefficientTable.
+
+    Parameters
+    ----------
+    table : CoefficientTable, Interpolator, dict, pandas.DataFrame or array-like
+        The coefficient table. A CoefficientTable is returned unchanged. An Interpolator provides its x and y
+        attributes. A dict must have 'x' and 'y' keys. For a DataFrame or a two-dimensional array, the first column
+        holds the energies and the remaining columns hold the coefficients.
+    method : str, optional
+        The interpolation method used if a new table has to be fitted. Default is 'Akima1D'.
+    **kwargs : dict, optional
+        Additional keyword arguments to pass to the interpolation method.
+
+    Returns
+    -------
+    CoefficientTable
+        The fitted coefficient table.
+    """
+    if isinstance(table, CoefficientTable):
+        return table
+    if isinstance(table, Interpolator):
+        return CoefficientTable(table.x, table.y, method=method, **kwargs)
+    if isinstance(table, dict):
+        return CoefficientTable(table['x'], table['y'], method=method, **kwargs)
+    if isinstance(table, pd.DataFrame):
+        energy, values, labels = table.iloc[:, 0].values, table.iloc[:, 1:].values, list(table.columns[1:])
+    else:
+        table = np.asarray(table, dtype=np.float64)
+        energy, values, labels = table[:, 0], table[:, 1:], None
+    if values.shape[1] == 1:
+        values = values[:, 0]
+    return CoefficientTable(energy, values, labels=labels, method=method, **kwargs)
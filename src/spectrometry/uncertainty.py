@@ -0,0 +1,694 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+from scipy.stats import norm, qmc
+
+from . import _kernels
+
+
+class MonteCarloResult(namedtuple('MonteCarloResult', ['mean', 'std', 'cv', 'trials', 'samples', 'quantiles'],
+                                  defaults=(None,))):
+    """
+    Summary statistics of a Monte Carlo uncertainty propagation.
+
+    Attributes
+    ----------
+    mean : float or numpy.ndarray
+        The mean of the quantity over all trials. An array if the quantity has several components (e.g. angles).
+    std : float or numpy.ndarray
+        The standard deviation of the quantity over all trials (population standard deviation, as
+        `statistics.pstdev`).
+    cv : float or numpy.ndarray
+        The coefficient of variation, in percent.
+    trials : int
+        The number of trials.
+    samples : numpy.ndarray or None
+        The value of the quantity for every trial, with one row per trial. None unless samples were requested.
+    quantiles : numpy.ndarray or None
+        The requested quantiles of the quantity, with one row per probability. None unless quantiles were requested.
+    """
+    __slots__ = ()
+
+
+class GUMResult(namedtuple('GUMResult', ['value', 'uncertainty', 'cv', 'budget', 'monte_carlo'], defaults=(None,))):
+    """
+    First-order (GUM) propagation of uncertainty of a spectral quantity.
+
+    Attributes
+    ----------
+    value : float or numpy.ndarray
+        The value of the quantity for the nominal inputs.
+    uncertainty : float or numpy.ndarray
+        The combined standard uncertainty of the quantity.
+    cv : float or numpy.ndarray
+        The relative combined standard uncertainty, in percent.
+    budget : dict
+        The contribution of every input to the combined standard uncertainty, |c|·u, in the units of the quantity.
+        The combined uncertainty is the root sum of squares of the contributions.
+    monte_carlo : MonteCarloResult or None
+        The Monte Carlo result of the same propagation, if a cross-check was requested.
+    """
+    __slots__ = ()
+
+
+class RunningStatistics:
+    """
+    Streaming mean, variance and histogram of a Monte Carlo quantity.
+
+    Samples are accumulated chunk by chunk, so memory does not depend on the number of trials. The mean and
+    variance of each chunk are computed with NumPy's pairwise summation and merged with the running values using
+    the parallel form of Welford's algorithm (Chan et al.), which is exact up to rounding and does not depend on the
+    chunk size. Quantiles are estimated from a fixed-bin histogram whose range is set by the first chunk.
+
+    Parameters
+    ----------
+    quantiles : array-like, optional
+        The probabilities of the quantiles to estimate, e.g. (0.025, 0.975). Default is None (no histogram).
+    histogram_bins : int, optional
+        The number of bins of the histogram used to estimate the quantiles. Default is 2000.
+
+    Attributes
+    ----------
+    count : int
+        The number of accumulated samples.
+    mean : numpy.ndarray or None
+        The running mean.
+    m2 : numpy.ndarray or None
+        The running sum of squared deviations from the mean.
+    edges : numpy.ndarray or None
+        The edges of the histogram bins, one column per component of the quantity.
+    histogram : numpy.ndarray or None
+        The histogram counts, one column per component of the quantity. Samples outside the range are counted in
+        the first or last bin.
+    """
+
+    def __init__(self, quantiles=None, histogram_bins=2000):
+        self.quantiles = None if quantiles is None else np.asarray(quantiles, dtype=np.float64)
+        self.histogram_bins = histogram_bins
+        self.count = 0
+        self.mean, self.m2 = None, None
+        self.edges, self.histogram = None, None
+
+    def update(self, samples):
+        """
+        Accumulate a chunk of samples.
+
+        Parameters
+        ----------
+        samples : numpy.ndarray
+            The value of the quantity for every trial of the chunk, with one row per trial.
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        mean = samples.mean(axis=0)
+        chunk = RunningStatistics(self.quantiles, self.histogram_bins)
+        chunk.count, chunk.mean, chunk.m2 = samples.shape[0], mean, ((samples - mean) ** 2).sum(axis=0)
+        if self.quantiles is not None:
+            if self.edges is None:
+                self.edges = _histogram_edges(samples, self.histogram_bins)
+            chunk.edges = self.edges
+            chunk.histogram = _histogram(samples, self.edges)
+        self.merge(chunk)
+
+    def merge(self, other):
+        """
+        Merge the statistics accumulated by another RunningStatistics object.
+
+        Parameters
+        ----------
+        other : RunningStatistics
+            The statistics to merge. Histograms must share the same edges.
+        """
+        if other.count == 0:
+            return
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.edges, self.histogram = other.edges, other.histogram
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean = self.mean + delta * (other.count / count)
+        self.m2 = self.m2 + other.m2 + delta ** 2 * (self.count * other.count / count)
+        self.count = count
+        if self.histogram is not None:
+            self.histogram = self.histogram + other.histogram
+
+    def result(self, samples=None):
+        """
+        Return the accumulated statistics.
+
+        Parameters
+        ----------
+        samples : list of numpy.ndarray, optional
+            The chunks of samples to return with the result. Default is None.
+
+        Returns
+        -------
+        MonteCarloResult
+            The mean, standard deviation, coefficient of variation and, if requested, quantiles of the quantity.
+        """
+        std = np.sqrt(self.m2 / self.count)
+        quantiles = None
+        if self.quantiles is not None:
+            quantiles = _histogram_quantiles(self.histogram, self.edges, self.quantiles)
+        samples = np.concatenate(samples) if samples else None
+        return MonteCarloResult(self.mean, std, std * 100 / self.mean, self.count, samples, quantiles)
+
+
+def _histogram_edges(samples, bins):
+    """
+    Return histogram edges that cover the given samples three times over, one column per component.
+    """
+    low, high = samples.min(axis=0), samples.max(axis=0)
+    span = np.where(high > low, high - low, np.abs(high) + 1.0)
+    return np.linspace(low - span, high + span, bins + 1)
+
+
+def _histogram(samples, edges):
+    """
+    Return the histogram counts of the samples, one column per component, clipping samples outside the range.
+    """
+    bins = edges.shape[0] - 1
+    width = edges[1] - edges[0]
+    index = np.clip(((samples - edges[0]) / width).astype(np.int64), 0, bins - 1)
+    flat = index.reshape(index.shape[0], -1)
+    counts = np.stack([np.bincount(flat[:, k], minlength=bins) for k in range(flat.shape[1])], axis=1)
+    return counts.reshape((bins,) + index.shape[1:])
+
+
+def _histogram_quantiles(histogram, edges, probabilities):
+    """
+    Return the quantiles of a histogram by linear interpolation of its cumulative distribution.
+    """
+    cumulative = np.cumsum(histogram, axis=0) / histogram.sum(axis=0)
+    cumulative = np.concatenate([np.zeros((1,) + cumulative.shape[1:]), cumulative])
+    flat_cumulative = cumulative.reshape(cumulative.shape[0], -1)
+    flat_edges = edges.reshape(edges.shape[0], -1)
+    quantiles = np.stack([np.interp(probabilities, flat_cumulative[:, k], flat_edges[:, k])
+                          for k in range(flat_edges.shape[1])], axis=1)
+    return quantiles.reshape((len(probabilities),) + edges.shape[1:])
+
+
+def monte_carlo(quantity, nominal, uncertainties, trials=10 ** 5, seed=None, return_samples=False, chunk_size=None,
+                max_memory=2 ** 28, quantiles=None, histogram_bins=2000, jobs=1, sampling='random', tolerance=None):
+    """
+    Propagate relative uncertainties of spectral inputs to a quantity by Monte Carlo sampling.
+
+    Every input with a non-zero relative uncertainty is perturbed as x·(1 + u·z), with z a standard normal
+    deviate drawn independently for every trial and energy bin. Trials are processed in chunks: the whole
+    (chunk × bins) perturbation block of the inputs is drawn at once, the quantity is evaluated for all trials of
+    the chunk in a single vectorized call, and the statistics are accumulated online (see RunningStatistics).
+    Peak memory is therefore set by the chunk size, not by the number of trials.
+
+    Every chunk draws from its own independent stream, spawned from `seed` with `numpy.random.SeedSequence`, and
+    the chunk statistics are merged in chunk order. Chunks can therefore be computed by a pool of worker processes
+    and the result is bit-for-bit the same for a given seed and chunk size, whatever the number of workers.
+
+    Parameters
+    ----------
+    quantity : callable
+        Function of the inputs, called with one keyword argument per input. Perturbed inputs are passed as
+        (chunk, bins) arrays and unperturbed inputs as their nominal (bins,) arrays. It must return an array with
+        one row per trial.
+    nominal : dict
+        The nominal value of every input, as one-dimensional arrays over the energy bins.
+    uncertainties : dict
+        The relative standard uncertainty of the inputs. Inputs that are missing or have zero uncertainty are not
+        perturbed.
+    trials : int, optional
+        The number of Monte Carlo trials, or the maximum number of trials if `tolerance` is given.
+        Default is 10**5.
+    seed : int, numpy.random.SeedSequence or None, optional
+        The seed of the random number generator. Default is None (non-reproducible).
+    return_samples : bool, optional
+        If True, the value of the quantity for every trial is returned in the `samples` attribute of the result.
+        This stores one row per trial. Default is False.
+    chunk_size : int, optional
+        The number of trials per chunk. Default is None (derived from `max_memory`).
+    max_memory : int, optional
+        The approximate memory budget of a chunk, in bytes. Only used if `chunk_size` is None.
+        Default is 2**28 (256 MiB).
+    quantiles : array-like, optional
+        The probabilities of the quantiles to estimate, e.g. (0.025, 0.975). Default is None.
+    histogram_bins : int, optional
+        The number of bins of the histogram used to estimate the quantiles. Default is 2000.
+    jobs : int or None, optional
+        The number of worker processes. If None, all the CPUs are used. Default is 1 (no worker processes).
+        With several jobs, `quantity` must be picklable (e.g. a module-level function or a `functools.partial`
+        of one).
+    sampling : str, optional
+        The sampling scheme of the deviates. Can be one of:
+        'random' (pseudo-random), 'antithetic' (pseudo-random deviates paired with their opposites within each
+        chunk) or 'sobol' (scrambled Sobol' quasi-random sequence, from `scipy.stats.qmc`, mapped to normal
+        deviates; chunk sizes and trial counts that are powers of two are recommended, and chunk sizes derived
+        from `max_memory` are rounded down to one). Sobol' sampling supports up to 21201 perturbed values per
+        trial (energy bins times perturbed inputs). Default is 'random'.
+    tolerance : float, optional
+        If given, chunks are run until the standard error of the mean, std/sqrt(n), and of the standard deviation,
+        std/sqrt(2(n - 1)), are below `tolerance` for every component of the quantity, or until `trials` is
+        reached. Both are the errors of plain random sampling, so they are conservative for antithetic and Sobol'
+        sampling. Default is None (always run `trials`).
+
+    Returns
+    -------
+    MonteCarloResult
+        The mean, standard deviation and coefficient of variation of the quantity.
+
+    Raises
+    ------
+    ValueError
+        If the number of trials or the chunk size is lower than 1.
+        If an invalid sampling scheme is provided.
+        If Sobol' sampling is requested for more perturbed values per trial than `scipy.stats.qmc.Sobol` supports.
+    """
+    if trials < 1:
+        raise ValueError("Monte Carlo failed. The number of trials must be at least 1.")
+    if sampling not in ('random', 'antithetic', 'sobol'):
+        raise ValueError(f"Invalid sampling scheme: {sampling}. Valid schemes are: random, antithetic, sobol")
+    nominal = {name: np.asarray(value, dtype=np.float64) for name, value in nominal.items()}
+    if sampling == 'sobol' and _dimension(nominal, uncertainties) > qmc.Sobol.MAXDIM:
+        raise ValueError(f"Monte Carlo failed. Sobol' sampling supports up to {qmc.Sobol.MAXDIM} perturbed values "
+                         f"per trial, got {_dimension(nominal, uncertainties)}.")
+    if chunk_size is None:
+        chunk_size = _chunk_size(nominal, uncertainties, max_memory)
+        if sampling == 'sobol':
+            # Sobol' points are balanced in blocks of powers of two
+            chunk_size = 1 << (chunk_size.bit_length() - 1)
+    if chunk_size < 1:
+        raise ValueError("Monte Carlo failed. The chunk size must be at least 1.")
+    seed = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    starts = list(range(0, trials, chunk_size))
+    sizes = [min(chunk_size, trials - start) for start in starts]
+    # Chunks use the streams spawned from the seed, and a Sobol' sequence shares one scrambling over all chunks
+    seeds = seed.spawn(len(sizes))
+    scrambling = seed.generate_state(4) if sampling == 'sobol' else None
+    jobs = os.cpu_count() if jobs is None else jobs
+
+    # The first chunk is always computed here, since it sets the histogram range of all the others
+    statistics, first_samples = _run_chunk(quantity, nominal, uncertainties, sizes[0], seeds[0], starts[0], sampling,
+                                           scrambling, quantiles, histogram_bins, None, return_samples)
+    samples = [first_samples] if return_samples else None
+    if _converged(statistics, tolerance):
+        return statistics.result(samples)
+    run_chunk = partial(_run_chunk, quantity, nominal, uncertainties, sampling=sampling, scrambling=scrambling,
+                        quantiles=quantiles, histogram_bins=histogram_bins, edges=statistics.edges,
+                        return_samples=return_samples)
+    chunks = list(zip(sizes, seeds, starts))[1:]
+    if jobs > 1 and chunks:
+        # Chunks are dispatched in waves, so that adaptive runs do not compute far beyond convergence
+        wave = 2 * jobs
+        with ProcessPoolExecutor(max_workers=min(jobs, len(chunks)),
+                                 mp_context=_kernels.pool_context()) as executor:
+            for first in range(0, len(chunks), wave):
+                results = executor.map(run_chunk, *zip(*chunks[first:first + wave]))
+                if _merge_chunks(statistics, samples, results, tolerance):
+                    break
+    else:
+        _merge_chunks(statistics, samples, (run_chunk(*chunk) for chunk in chunks), tolerance)
+    return statistics.result(samples)
+
+
+def _run_chunk(quantity, nominal, uncertainties, trials, seed, start, sampling, scrambling, quantiles, histogram_bins,
+               edges, return_samples):
+    """
+    Compute the statistics of one chunk of trials drawn from its own random stream.
+
+    Returns
+    -------
+    tuple
+        The RunningStatistics of the chunk and its samples (None unless requested).
+    """
+    deviates = _deviates(trials, _dimension(nominal, uncertainties), np.random.default_rng(seed), start, sampling,
+                         scrambling)
+    samples = _evaluate_chunk(quantity, nominal, uncertainties, trials, deviates)
+    statistics = RunningStatistics(quantiles, histogram_bins)
+    statistics.edges = edges
+    statistics.update(samples)
+    return statistics, np.asarray(samples) if return_samples else None
+
+
+def _merge_chunks(statistics, samples, chunks, tolerance):
+    """
+    Merge the statistics (and samples) of the chunks, in chunk order, until the tolerance is reached.
+
+    Returns
+    -------
+    bool
+        True if the tolerance was reached.
+    """
+    for chunk_statistics, chunk_samples in chunks:
+        statistics.merge(chunk_statistics)
+        if samples is not None:
+            samples.append(chunk_samples)
+        if _converged(statistics, tolerance):
+            return True
+    return False
+
+
+def _converged(statistics, tolerance):
+    """
+    Return whether the standard errors of the mean and of the standard deviation are below the tolerance.
+    """
+    if tolerance is None or statistics.count < 2:
+        return False
+    std = np.sqrt(statistics.m2 / statistics.count)
+    standard_error = np.maximum(std / np.sqrt(statistics.count), std / np.sqrt(2 * (statistics.count - 1)))
+    return bool(np.all(standard_error < tolerance))
+
+
+def _chunk_size(nominal, uncertainties, max_memory):
+    """
+    Return the number of trials per chunk that fits the memory budget.
+
+    Every perturbed input needs a (chunk, bins) array of deviates and another one of perturbed values, and the
+    quantity needs a few more (chunk, bins) temporaries.
+    """
+    bins = max(value.size for value in nominal.values())
+    perturbed = sum(1 for name in nominal if uncertainties.get(name, 0.0))
+    return max(1, int(max_memory // (8 * bins * (2 * perturbed + 3))))
+
+
+def _dimension(nominal, uncertainties):
+    """
+    Return the number of perturbed values per trial.
+    """
+    return sum(value.size for name, value in nominal.items() if uncertainties.get(name, 0.0))
+
+
+def _deviates(trials, dimension, rng, start, sampling, scrambling):
+    """
+    Draw a (trials, dimension) block of standard normal deviates with the given sampling scheme.
+
+    `start` is the index of the first trial of the chunk, used to continue the Sobol' sequence.
+    """
+    if sampling == 'antithetic':
+        half = rng.standard_normal(((trials + 1) // 2, dimension))
+        return np.concatenate([half, -half])[:trials]
+    if sampling == 'sobol':
+        sampler = qmc.Sobol(dimension, scramble=True, seed=np.random.default_rng(scrambling))
+        if start:
+            sampler.fast_forward(start)
+        tiny = np.finfo(np.float64).eps
+        return norm.ppf(np.clip(sampler.random(trials), tiny, 1 - tiny))
+    return rng.standard_normal((trials, dimension))
+
+
+def _evaluate_chunk(quantity, nominal, uncertainties, trials, deviates):
+    """
+    Perturb the inputs of a chunk of trials with the given deviates and evaluate the quantity.
+    """
+    inputs, column = {}, 0
+    for name, value in nominal.items():
+        u = uncertainties.get(name, 0.0)
+        if u:
+            value = value * (1.0 + u * deviates[:, column:column + value.size])
+            column += value.shape[-1]
+        inputs[name] = value
+
+    samples = quantity(**inputs)
+    if column == 0:
+        samples = np.broadcast_to(samples, (trials,) + np.shape(samples))
+    return samples
+
+
+def _rows(value, bins):
+    """
+    Return a value as a contiguous (rows, bins) array for the compiled kernels, with one row if it is shared.
+    """
+    value = np.asarray(value, dtype=np.float64)
+    if value.ndim < 2:
+        value = np.broadcast_to(value, (1, bins))
+    return np.ascontiguousarray(value)
+
+
+def conversion_coefficient(energy, fluence, mu_tr, hk_factor, hk, backend='auto'):
+    """
+    Calculate the kerma-weighted conversion coefficient Σ E·Φ·mutr·hK / Σ E·Φ·mutr for a batch of trials.
+
+    Parameters
+    ----------
+    energy, fluence, mu_tr, hk_factor : numpy.ndarray
+        The energy, fluence, mass energy-transfer coefficient and relative perturbation of the conversion
+        coefficient in every energy bin. Either (bins,) arrays or (trials, bins) arrays.
+    hk : numpy.ndarray
+        The conversion coefficients interpolated on the energy grid, (bins,) or (bins, angles).
+    backend : str, optional
+        'numba' to use the fused compiled kernel, 'numpy', or 'auto' (numba if it is installed). Default is 'auto'.
+
+    Returns
+    -------
+    numpy.ndarray
+        The conversion coefficient of every trial, (trials,) or (trials, angles).
+    """
+    if _kernels.resolve_backend(backend) == 'numba':
+        hk = np.asarray(hk, dtype=np.float64)
+        rows = [_rows(value, hk.shape[0]) for value in (energy, fluence, mu_tr, hk_factor)]
+        result = _kernels.weighted_sums(*rows, np.ascontiguousarray(hk.reshape(hk.shape[0], -1)))
+        shape = np.broadcast_shapes(*[np.shape(value) for value in (energy, fluence, mu_tr, hk_factor)])[:-1]
+        return result.reshape(shape + hk.shape[1:])
+    weights = energy * fluence * mu_tr
+    numerator = (weights * hk_factor) @ hk
+    denominator = weights.sum(axis=-1)
+    return numerator / denominator.reshape(denominator.shape + (1,) * (numerator.ndim - denominator.ndim))
+
+
+def conversion_coefficient_mc(energy, fluence, mu_tr, hk, u_energy=0.01, u_fluence=0.01, u_mu_tr=0.017, u_hk=0.0,
+                              backend='auto', **kwargs):
+    """
+    Monte Carlo uncertainty of the spectrum-averaged conversion coefficient.
+
+    The default relative uncertainties are those of `dev/reference/uhk_experimental.py` (uEr, uflur, umutrr).
+    The reference script declares uhk but does not apply it, so `u_hk` defaults to zero.
+
+    Parameters
+    ----------
+    energy : array-like
+        The energy of every bin of the spectrum.
+    fluence : array-like
+        The fluence (or fluence rate) of every bin of the spectrum.
+    mu_tr : array-like
+        The mass energy-transfer coefficient of air interpolated on the energy grid.
+    hk : array-like
+        The conversion coefficients interpolated on the energy grid, (bins,) or (bins, angles).
+    u_energy, u_fluence, u_mu_tr, u_hk : float, optional
+        The relative standard uncertainties of the energy, fluence, mass energy-transfer coefficient and conversion
+        coefficient. The perturbation of the conversion coefficient is shared by all angles of a bin.
+    backend : str, optional
+        The backend of the reduction of every trial, see `conversion_coefficient`. Default is 'auto'.
+    **kwargs : dict, optional
+        Options of the Monte Carlo engine (`trials`, `seed`, `return_samples`, `chunk_size`, ...). See `monte_carlo`.
+
+    Returns
+    -------
+    MonteCarloResult
+        The mean, standard deviation and coefficient of variation of the conversion coefficient.
+    """
+    energy = np.asarray(energy, dtype=np.float64)
+    nominal = {'energy': energy, 'fluence': fluence, 'mu_tr': mu_tr, 'hk_factor': np.ones_like(energy)}
+    uncertainties = {'energy': u_energy, 'fluence': u_fluence, 'mu_tr': u_mu_tr, 'hk_factor': u_hk}
+    quantity = partial(conversion_coefficient, hk=np.asarray(hk, dtype=np.float64), backend=backend)
+    return monte_carlo(quantity, nominal, uncertainties, **kwargs)
+
+
+def conversion_coefficient_gum(energy, fluence, mu_tr, hk, u_energy=0.01, u_fluence=0.01, u_mu_tr=0.017, u_hk=0.0,
+                               cross_check=False, **kwargs):
+    """
+    First-order GUM uncertainty of the spectrum-averaged conversion coefficient.
+
+    The conversion coefficient hK = Σ w·h / Σ w, with kerma weights w = E·Φ·mutr, is a smooth ratio of sums, so
+    the law of propagation of uncertainty with analytic sensitivity coefficients is exact to first order. With
+    uncorrelated relative uncertainties, the contribution of each input is:
+
+    - energy, fluence and mutr: u · sqrt(Σ (w·(h - hK))²) / Σ w,
+    - conversion coefficient: u · sqrt(Σ (w·h)²) / Σ w.
+
+    This costs O(bins) instead of O(bins × trials). The relative uncertainties have the same meaning, and
+    defaults, as in `conversion_coefficient_mc`.
+
+    Parameters
+    ----------
+    energy : array-like
+        The energy of every bin of the spectrum.
+    fluence : array-like
+        The fluence (or fluence rate) of every bin of the spectrum.
+    mu_tr : array-like
+        The mass energy-transfer coefficient of air interpolated on the energy grid.
+    hk : array-like
+        The conversion coefficients interpolated on the energy grid, (bins,) or (bins, angles).
+    u_energy, u_fluence, u_mu_tr, u_hk : float, optional
+        The relative standard uncertainties of the energy, fluence, mass energy-transfer coefficient and conversion
+        coefficient.
+    cross_check : bool, optional
+        If True, the Monte Carlo propagation is also run and returned in the `monte_carlo` attribute.
+        Default is False.
+    **kwargs : dict, optional
+        Options of the Monte Carlo engine used for the cross-check. See `monte_carlo`.
+
+    Returns
+    -------
+    GUMResult
+        The value, combined standard uncertainty and uncertainty budget of the conversion coefficient.
+    """
+    energy = np.asarray(energy, dtype=np.float64)
+    hk = np.asarray(hk, dtype=np.float64)
+    weights = energy * np.asarray(fluence, dtype=np.float64) * np.asarray(mu_tr, dtype=np.float64)
+    total = weights.sum()
+    value = (weights @ hk) / total
+
+    weights = weights.reshape(weights.shape + (1,) * (hk.ndim - 1))
+    spectral = np.sqrt(((weights * (hk - value)) ** 2).sum(axis=0)) / total
+    coefficient = np.sqrt(((weights * hk) ** 2).sum(axis=0)) / total
+    budget = {'energy': u_energy * spectral, 'fluence': u_fluence * spectral, 'mu_tr': u_mu_tr * spectral,
+              'hk': u_hk * coefficient}
+    uncertainty = np.sqrt(sum(contribution ** 2 for contribution in budget.values()))
+
+    monte_carlo_result = None
+    if cross_check:
+        monte_carlo_result = conversion_coefficient_mc(energy, fluence, mu_tr, hk, u_energy=u_energy,
+                                                       u_fluence=u_fluence, u_mu_tr=u_mu_tr, u_hk=u_hk, **kwargs)
+    return GUMResult(value, uncertainty, uncertainty * 100 / value, budget, monte_carlo_result)
+
+
+def half_value_layer(energy, fluence, mu, mu_tr, ratio=0.5, rtol=1e-12, max_iterations=50, backend='auto'):
+    """
+    Calculate the half-value layer (HVL) of a spectrum, or of a batch of trials, by Newton iteration.
+
+    The HVL is the thickness t for which the air kerma transmission T(t) = Σ w·exp(-mu·t) / Σ w, with kerma weights
+    w = E·Φ·mutr, equals `ratio`. T is convex and decreasing, so Newton's method started from the thickness that
+    attenuates the weighted mean coefficient by `ratio` converges monotonically. All the trials are solved
+    simultaneously, as one vectorized iteration over a (trials,) array of thicknesses.
+
+    Parameters
+    ----------
+    energy, fluence, mu, mu_tr : numpy.ndarray
+        The energy, fluence, linear attenuation coefficient of the absorber and mass energy-transfer coefficient of
+        air in every energy bin. Either (bins,) arrays or (trials, bins) arrays.
+    ratio : float, optional
+        The air kerma transmission that defines the layer. Default is 0.5 (first HVL).
+    rtol : float, optional
+        The relative tolerance on the thickness. Default is 1e-12.
+    max_iterations : int, optional
+        The maximum number of Newton iterations. Default is 50.
+    backend : str, optional
+        'numba' to compute the transmission and its derivative with the fused compiled kernel, 'numpy', or 'auto'
+        (numba if it is installed). Default is 'auto'.
+
+    Returns
+    -------
+    float or numpy.ndarray
+        The HVL (in the inverse units of `mu`) of the spectrum, or of every trial.
+    """
+    weights = energy * fluence * mu_tr
+    weights = weights / weights.sum(axis=-1, keepdims=True)
+    mu = np.broadcast_to(mu, weights.shape)
+    thickness = -np.log(ratio) / (weights * mu).sum(axis=-1)
+    compiled = _kernels.resolve_backend(backend) == 'numba'
+    for _ in range(max_iterations):
+        if compiled:
+            transmission, derivative = _kernels.newton_terms(_rows(weights, weights.shape[-1]),
+                                                             _rows(mu, weights.shape[-1]), np.atleast_1d(thickness))
+            transmission, derivative = transmission.reshape(thickness.shape), derivative.reshape(thickness.shape)
+        else:
+            attenuated = weights * np.exp(-mu * thickness[..., None])
+            transmission = attenuated.sum(axis=-1)
+            derivative = -(attenuated * mu).sum(axis=-1)
+        step = (transmission - ratio) / derivative
+        thickness = thickness - step
+        if np.all(np.abs(step) <= rtol * thickness):
+            break
+    return thickness
+
+
+def hvl_mc(energy, fluence, mu, mu_tr, u_energy=0.01, u_fluence=0.01, u_mu=0.01, u_mu_tr=0.017, ratio=0.5,
+           backend='auto', **kwargs):
+    """
+    Monte Carlo uncertainty of the half-value layer (HVL) of a spectrum.
+
+    Energy, fluence, attenuation coefficient and mass energy-transfer coefficient are perturbed per trial and
+    energy bin, and the HVL roots of all the trials of a chunk are solved simultaneously (see
+    `half_value_layer`). Trials are processed in memory-bounded chunks by `monte_carlo`.
+
+    Parameters
+    ----------
+    energy : array-like
+        The energy of every bin of the spectrum.
+    fluence : array-like
+        The fluence (or fluence rate) of every bin of the spectrum.
+    mu : array-like
+        The linear attenuation coefficient of the absorber interpolated on the energy grid.
+    mu_tr : array-like
+        The mass energy-transfer coefficient of air interpolated on the energy grid.
+    u_energy, u_fluence, u_mu, u_mu_tr : float, optional
+        The relative standard uncertainties of the energy, fluence, attenuation coefficient and mass
+        energy-transfer coefficient. `u_energy`, `u_fluence` and `u_mu_tr` default to the values of
+        `dev/reference/uhk_experimental.py`; `u_mu` defaults to 0.01.
+    ratio : float, optional
+        The air kerma transmission that defines the layer. Default is 0.5 (first HVL).
+    backend : str, optional
+        The backend of the Newton iteration, see `half_value_layer`. Default is 'auto'.
+    **kwargs : dict, optional
+        Options of the Monte Carlo engine (`trials`, `seed`, `chunk_size`, `jobs`, ...). See `monte_carlo`.
+
+    Returns
+    -------
+    MonteCarloResult
+        The mean, standard deviation and coefficient of variation of the HVL.
+    """
+    nominal = {'energy': energy, 'fluence': fluence, 'mu': mu, 'mu_tr': mu_tr}
+    uncertainties = {'energy': u_energy, 'fluence': u_fluence, 'mu': u_mu, 'mu_tr': u_mu_tr}
+    quantity = partial(half_value_layer, ratio=ratio, backend=backend)
+    return monte_carlo(quantity, nominal, uncertainties, **kwargs)
+
+
+def hvl_gum(energy, fluence, mu, mu_tr, u_energy=0.01, u_fluence=0.01, u_mu=0.01, u_mu_tr=0.017, ratio=0.5,
+            cross_check=False, **kwargs):
+    """
+    First-order GUM uncertainty of the half-value layer (HVL) of a spectrum.
+
+    The HVL t is the root of F(t) = Σ w·exp(-mu·t) / Σ w - ratio, with kerma weights w = E·Φ·mutr. Its sensitivity
+    coefficients follow from the implicit function theorem, dt/dx = -(∂F/∂x) / (∂F/∂t), with
+    A = -∂F/∂t = Σ w·mu·exp(-mu·t) / Σ w. With uncorrelated relative uncertainties, the contribution of each
+    input is:
+
+    - energy, fluence and mutr: u · sqrt(Σ (w·(exp(-mu·t) - ratio))²) / (A·Σ w),
+    - attenuation coefficient: u · sqrt(Σ (w·mu·t·exp(-mu·t))²) / (A·Σ w).
+
+    Parameters
+    ----------
+    energy, fluence, mu, mu_tr : array-like
+        The energy, fluence, linear attenuation coefficient of the absorber and mass energy-transfer coefficient of
+        air in every energy bin.
+    u_energy, u_fluence, u_mu, u_mu_tr : float, optional
+        The relative standard uncertainties of the inputs, as in `hvl_mc`.
+    ratio : float, optional
+        The air kerma transmission that defines the layer. Default is 0.5 (first HVL).
+    cross_check : bool, optional
+        If True, the Monte Carlo propagation is also run and returned in the `monte_carlo` attribute.
+        Default is False.
+    **kwargs : dict, optional
+        Options of the Monte Carlo engine used for the cross-check. See `monte_carlo`.
+
+    Returns
+    -------
+    GUMResult
+        The value, combined standard uncertainty and uncertainty budget of the HVL.
+    """
+    energy, fluence, mu, mu_tr = (np.asarray(x, dtype=np.float64) for x in (energy, fluence, mu, mu_tr))
+    value = half_value_layer(energy, fluence, mu, mu_tr, ratio=ratio)
+    weights = energy * fluence * mu_tr
+    attenuation = np.exp(-mu * value)
+    scale = (weights * mu * attenuation).sum()
+
+    spectral = np.sqrt(((weights * (attenuation - ratio)) ** 2).sum()) / scale
+    coefficient = np.sqrt(((weights * mu * value * attenuation) ** 2).sum()) / scale
+    budget = {'energy': u_energy * spectral, 'fluence': u_fluence * spectral, 'mu': u_mu * coefficient,
+              'mu_tr': u_mu_tr * spectral}
+    uncertainty = np.sqrt(sum(contribution ** 2 for contribution in budget.values()))
+
+    monte_carlo_result = None
+    if cross_check:
+        monte_carlo_result = hvl_mc(energy, fluence, mu, mu_tr, u_energy=u_energy, u_fluence=u_fluence, u_mu=u_mu,
+                                    u_mu_tr=u_mu_tr, ratio=ratio, **kwargs)
+    return GUMResult(value, uncertainty, uncertainty * 100 / value, budget, monte_carlo_result)
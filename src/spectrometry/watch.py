@@ -0,0 +1,263 @@
+"""
+Watch-folder ingestion of new spectrum files.
+
+The inotify backend requires the optional inotify_simple package (Linux only). Without it, the 'auto' backend polls
+the directory.
+"""
+import os
+import stat
+from collections import namedtuple
+from os.path import join, splitext
+from time import monotonic, sleep
+
+import numpy as np
+
+from .batch import file_name, initialize, plan, prepare, run_chunk
+from .spectrometry import Spectrum, read_spectrum
+
+try:
+    from inotify_simple import INotify, flags
+    INOTIFY_AVAILABLE = True
+except ImportError:
+    INOTIFY_AVAILABLE = False
+
+SPECTRUM_EXTENSIONS = ('.csv', '.xls', '.xlsx')
+BACKENDS = ('auto', 'poll', 'inotify')
+
+
+class Ingested(namedtuple('Ingested', ['path', 'results', 'error'])):
+    """
+    The outcome of processing one new or modified spectrum file.
+
+    Attributes
+    ----------
+    path : str
+        The path of the file.
+    results : list of BatchResult
+        The HVL and conversion coefficient results of the spectrum, empty if it could not be processed.
+    error : str or None
+        The error message if the file could not be processed, None otherwise.
+    """
+    __slots__ = ()
+
+
+class FolderWatcher:
+    """
+    Detector of new and modified files in a directory.
+
+    Files are identified by their path, and a file is reported again when its size or modification time change.
+    With the 'inotify' backend, files are reported as soon as they are closed after writing or moved into the
+    directory. With the 'poll' backend, the directory is listed every `interval` seconds, and a file is reported
+    once its size and modification time are the same in two consecutive listings, so that files that are still
+    being written are not reported.
+
+    Parameters
+    ----------
+    directory : str or path-like
+        The directory to watch.
+    extensions : tuple of str, optional
+        The lower case extensions of the files to report. Default is `SPECTRUM_EXTENSIONS`.
+    interval : float, optional
+        The polling interval, in seconds. Default is 0.2.
+    existing : bool, optional
+        If True, the files already in the directory are reported as new. Default is False.
+    backend : str, optional
+        'inotify', 'poll', or 'auto' (inotify if it is available). Default is 'auto'.
+
+    Raises
+    ------
+    ValueError
+        If the directory does not exist, or if the backend is invalid or not available.
+    """
+
+    def __init__(self, directory, extensions=SPECTRUM_EXTENSIONS, interval=0.2, existing=False, backend='auto'):
+        if backend not in BACKENDS:
+            raise ValueError(f"Invalid backend: {backend}. Valid backends are: auto, poll, inotify")
+        if backend == 'inotify' and not INOTIFY_AVAILABLE:
+            raise ValueError("The inotify backend requires inotify_simple, which is not installed.")
+        if not os.path.isdir(directory):
+            raise ValueError(f"Watch failed. Not a directory: {directory}")
+        self.directory = str(directory)
+        self.extensions = extensions
+        self.interval = interval
+        if backend == 'auto':
+            backend = 'inotify' if INOTIFY_AVAILABLE else 'poll'
+        self.backend = backend
+        self._inotify = None
+        if self.backend == 'inotify':
+            self._inotify = INotify()
+            self._inotify.add_watch(self.directory, flags.CLOSE_WRITE | flags.MOVED_TO)
+        self._listing = self._scan()
+        self._reported = {} if existing else dict(self._listing)
+        self._existing = list(self._listing) if existing else []
+
+    def __repr__(self):
+        """
+        Return a string representation of the FolderWatcher object.
+
+        Returns
+        -------
+        str
+            A string representation of the FolderWatcher object.
+        """
+        return f"FolderWatcher(directory='{self.directory}', backend='{self.backend}')"
+
+    def __enter__(self):
+        """
+        Return the watcher, which is closed when the context exits.
+        """
+        return self
+
+    def __exit__(self, *exc_info):
+        """
+        Close the watcher.
+        """
+        self.close()
+
+    def close(self):
+        """
+        Stop watching the directory.
+        """
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def changes(self, timeout=None):
+        """
+        Wait for new or modified files.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The maximum time to wait, in seconds. Default is None (wait until a file is reported).
+
+        Returns
+        -------
+        list of str
+            The paths of the new or modified files, in name order. Empty if the timeout expired.
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            if self._existing:
+                paths, self._existing = self._existing, []
+                return self._report(paths)
+            if self._inotify is not None:
+                remaining = None if deadline is None else max(0.0, deadline - monotonic())
+                events = self._inotify.read(timeout=None if remaining is None else int(remaining * 1000))
+                paths = self._report(sorted({join(self.directory, event.name) for event in events
+                                             if self._matches(event.name)}))
+            else:
+                listing = self._scan()
+                stable = [path for path, signature in listing.items() if self._listing.get(path) == signature]
+                self._listing = listing
+                paths = self._report(stable)
+            if paths or (deadline is not None and monotonic() >= deadline):
+                return paths
+            if self._inotify is None:
+                sleep(self.interval if deadline is None else max(0.0, min(self.interval, deadline - monotonic())))
+
+    def _report(self, paths):
+        """
+        Return the paths whose files changed since they were last reported, and record them as reported.
+        """
+        changed = []
+        for path in paths:
+            signature = _signature(path)
+            if signature is not None and self._reported.get(path) != signature:
+                self._reported[path] = signature
+                changed.append(path)
+        return changed
+
+    def _scan(self):
+        """
+        Return the size and modification time of every watched file in the directory, by path.
+        """
+        listing = {}
+        for name in sorted(os.listdir(self.directory)):
+            if self._matches(name):
+                path = join(self.directory, name)
+                signature = _signature(path)
+                if signature is not None:
+                    listing[path] = signature
+        return listing
+
+    def _matches(self, name):
+        """
+        Return whether a file name has one of the watched extensions.
+        """
+        return splitext(name)[1].lower() in self.extensions
+
+
+def _signature(path):
+    """
+    Return the size and modification time of a file, or None if it is not a regular file.
+    """
+    try:
+        status = os.stat(path)
+    except OSError:
+        return None
+    return (status.st_size, status.st_mtime_ns) if stat.S_ISREG(status.st_mode) else None
+
+
+def watch(directory, hk_tables=None, mutr_table=None, mu_table=None, density=None, method='Akima1D',
+          uncertainty='none', trials=10 ** 5, seed=None, interval=0.2, existing=False, backend='auto', stop=None,
+          relative_uncertainties=None):
+    """
+    Process new and modified spectrum files of a directory as they arrive.
+
+    The tables are read and fitted once, and the calculations are run once on a flat spectrum so that the compiled
+    kernels (if numba is installed) are ready, before watching starts. Then every new or modified file is read and
+    processed through the HVL and conversion coefficient tasks of `batch.run_batch`, in this process, as soon as
+    `FolderWatcher` reports it.
+
+    Parameters
+    ----------
+    directory : str or path-like
+        The directory to watch.
+    hk_tables, mutr_table, mu_table, density, method, uncertainty, trials, seed
+        As in `batch.run_batch`.
+    interval : float, optional
+        The polling interval, and the interval at which `stop` is checked, in seconds. Default is 0.2.
+    existing : bool, optional
+        If True, the files already in the directory are processed first. Default is False.
+    backend : str, optional
+        The backend of the `FolderWatcher`. Default is 'auto'.
+    stop : threading.Event, optional
+        Watching stops when it is set. Default is None (watch until the generator is closed).
+    relative_uncertainties : dict, optional
+        As in `batch.run_batch`.
+
+    Yields
+    ------
+    Ingested
+        The results of every processed file, or the error that prevented processing it.
+
+    Raises
+    ------
+    ValueError
+        If a table cannot be read, if `mutr_table` is missing or if the options are invalid.
+    """
+    hk_tables, sources, options = prepare(hk_tables, mutr_table, mu_table, density, method, uncertainty, trials,
+                                          seed, relative_uncertainties)
+    context = initialize(hk_tables, sources, options)
+    tables = [table for _, table in plan([''], hk_tables, hvl=mu_table is not None)]
+    with FolderWatcher(directory, interval=interval, existing=existing, backend=backend) as watcher:
+        _warm_up(context, tables)
+        while stop is None or not stop.is_set():
+            for path in watcher.changes(timeout=interval):
+                try:
+                    spectrum = read_spectrum(path)
+                    yield Ingested(path, run_chunk([(file_name(path), spectrum, tables)], context), None)
+                except ValueError as e:
+                    yield Ingested(path, [], str(e))
+
+
+def _warm_up(context, tables):
+    """
+    Run the tasks of every file once on a flat spectrum on the energies of the mutr/rho table of air.
+    """
+    energy = context.mu_tr.energy
+    try:
+        run_chunk([('', Spectrum(energy, np.ones_like(energy)), tables)], context)
+    except ValueError:
+        pass
@@ -0,0 +1,53 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.spectrometry._kernels import select_threading_layer
+from src.spectrometry.tables import CoefficientTable
+
+# Some tests fork their own worker pools after the compiled kernels have run. The pools of the package do not need
+# this selection, see test_kernels.TestProcessPools
+select_threading_layer()
+
+# Synthetic coefficients: mutr/rho of air, mu/rho of aluminium, and the conversion coefficients of an H10 table
+# (angles 0 and 90) and of a Ka table, as functions of the energy, as tables and as table files
+Coefficients = namedtuple('Coefficients', ['mu_tr', 'mu', 'h10', 'ka'])
+Tables = namedtuple('Tables', ['hk', 'mutr', 'mu'])
+
+
+@pytest.fixture(scope='session')
+def coefficients():
+    return Coefficients(mu_tr=lambda energy: 3e3 * energy ** -2.8 + 0.02,
+                        mu=lambda energy: 5e3 * energy ** -2.9 + 0.15,
+                        h10=lambda energy: np.column_stack([1.5 * np.exp(-np.log(energy / 60) ** 2),
+                                                            0.5 + energy / 400]),
+                        ka=lambda energy: 1 + 0 * energy)
+
+
+@pytest.fixture(scope='session')
+def table_energy():
+    return np.geomspace(5, 400, 40)
+
+
+@pytest.fixture(scope='session')
+def tables(coefficients, table_energy):
+    energy = table_energy
+    hk = {'H10': CoefficientTable(energy, coefficients.h10(energy), labels=['0', '90']),
+          'Ka': CoefficientTable(energy, coefficients.ka(energy))}
+    return Tables(hk, CoefficientTable(energy, coefficients.mu_tr(energy)),
+                  CoefficientTable(energy, coefficients.mu(energy)))
+
+
+@pytest.fixture
+def table_files(tmp_path, coefficients, table_energy):
+    # mutr.txt, mu_Al.txt, hk_H10.txt and hk_Ka.txt in a temporary directory
+    energy = table_energy
+    np.savetxt(tmp_path / 'mutr.txt', np.column_stack([energy, coefficients.mu_tr(energy)]), delimiter='\t')
+    np.savetxt(tmp_path / 'mu_Al.txt', np.column_stack([energy, coefficients.mu(energy)]), delimiter='\t')
+    hk = pd.DataFrame(coefficients.h10(energy), columns=['0', '90'])
+    hk.insert(0, 'E', energy)
+    hk.to_csv(tmp_path / 'hk_H10.txt', sep='\t', index=False)
+    np.savetxt(tmp_path / 'hk_Ka.txt', np.column_stack([energy, coefficients.ka(energy)]), delimiter='\t')
+    return tmp_path
@@ -0,0 +1,99 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.spectrometry import attenuation
+from src.spectrometry.attenuation import AttenuationRegistry, get_registry, initialize_worker
+from src.spectrometry.spectrometry import Spectrum
+from src.spectrometry.tables import CoefficientTable
+
+
+def write_table(file_path, exponent):
+    energy = np.geomspace(5, 400, 20)
+    np.savetxt(file_path, np.column_stack([energy, 100 * energy ** exponent]), delimiter='\t')
+
+
+def registered_tables(name):
+    return list(get_registry().table(name, 'mu').energy[:2])
+
+
+class TestAttenuationRegistry:
+    def setup_method(self):
+        self.registry = AttenuationRegistry(max_materials=2)
+        self.energy = np.geomspace(5, 400, 20)
+        self.table = CoefficientTable(self.energy, 100 * self.energy ** -2)
+
+    def test_table_is_fitted_once(self, tmp_path):
+        write_table(tmp_path / 'mu_Al.txt', -2.5)
+        self.registry.register('Al', mu=tmp_path / 'mu_Al.txt', density=2.699)
+        assert self.registry.table('Al', 'mu') is self.registry.table('Al', 'mu')
+
+    def test_density_is_applied_on_evaluation(self):
+        self.registry.register('Al', mu=self.table, density=2.699)
+        energy = np.array([10., 50.])
+        assert np.allclose(self.registry.mu('Al', energy), 2.699 * 100 * energy ** -2)
+        assert np.allclose(self.registry.mu('Al', energy, density=1.0), 100 * energy ** -2)
+        assert np.allclose(self.registry.table('Al', 'mu')(energy), 100 * energy ** -2)
+
+    def test_registered_density_of_mu_tr(self):
+        self.registry.register('water', mu_tr=self.table, density=0.998)
+        energy = np.array([10., 50.])
+        assert np.allclose(self.registry.mu_tr('water', energy), 0.998 * 100 * energy ** -2)
+        assert np.allclose(self.registry.mu_tr('water', energy, density=1.0), 100 * energy ** -2)
+
+    def test_read_error_is_raised_again(self, tmp_path):
+        self.registry.register('Al', mu=tmp_path / 'missing.txt')
+        for _ in range(2):
+            with pytest.raises(ValueError, match="Error reading file"):
+                self.registry.table('Al', 'mu')
+        assert 'Al' not in repr(self.registry).split('loaded=')[1]
+
+    def test_least_recently_used_material_is_dropped(self):
+        for name in ('Al', 'Cu', 'Sn'):
+            self.registry.register(name, mu=np.column_stack([self.energy, self.table.values]))
+        first = self.registry.table('Al', 'mu')
+        self.registry.table('Cu', 'mu')
+        self.registry.table('Sn', 'mu')
+        assert 'Al' not in repr(self.registry).split('loaded=')[1]
+        # Dropped materials are reloaded from their source
+        assert self.registry.table('Al', 'mu') is not first
+
+    def test_unregistered_material(self):
+        with pytest.raises(ValueError, match="Material not registered"):
+            self.registry.table('Pb', 'mu')
+
+    def test_missing_table(self):
+        self.registry.register('Al', mu=self.table)
+        with pytest.raises(ValueError, match="has no mu_tr table"):
+            self.registry.table('Al', 'mu_tr')
+
+    def test_invalid_quantity(self):
+        with pytest.raises(ValueError, match="Invalid coefficient"):
+            self.registry.table('Al', 'mu_en')
+
+
+class TestProcessWideRegistry:
+    def setup_method(self):
+        self.saved = attenuation.registry
+        attenuation.registry = AttenuationRegistry()
+
+    def teardown_method(self):
+        attenuation.registry = self.saved
+
+    def test_spectrum_uses_material_names(self):
+        energy = np.geomspace(5, 400, 20)
+        get_registry().register('Al', mu=CoefficientTable(energy, 50 * energy ** -2.8 + 0.2), density=2.699)
+        get_registry().register('air', mu_tr=CoefficientTable(energy, 30 * energy ** -3 + 0.02))
+        spectrum = Spectrum(np.linspace(20, 60, 100), np.ones(100))
+        by_name = spectrum.calculate_hvl('Al', 'air')
+        by_table = spectrum.calculate_hvl(get_registry().table('Al', 'mu'), get_registry().table('air', 'mu_tr'),
+                                          density=2.699)
+        assert by_name == pytest.approx(by_table)
+
+    def test_worker_preload(self, tmp_path):
+        write_table(tmp_path / 'mu_Al.txt', -2.5)
+        get_registry().register('Al', mu=str(tmp_path / 'mu_Al.txt'), density=2.699)
+        with ProcessPoolExecutor(max_workers=1, initializer=initialize_worker,
+                                 initargs=(get_registry().sources,)) as executor:
+            assert executor.submit(registered_tables, 'Al').result() == pytest.approx([5, 5 * 80 ** (1 / 19)])
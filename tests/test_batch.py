@@ -0,0 +1,79 @@
+from shutil import copyfile
+
+import pytest
+
+from src.spectrometry.attenuation import get_registry
+from src.spectrometry.batch import HVL, BatchResult, plan, run_batch
+from src.spectrometry.spectrometry import read_spectrum
+from src.spectrometry.tables import CoefficientTable
+
+SPECTRA = ['dev/reference/N15.csv', 'dev/reference/N40.csv', 'dev/reference/N60.csv', 'dev/reference/N250.csv']
+
+
+def run(tables, **kwargs):
+    return list(run_batch(SPECTRA, tables.hk, tables.mutr, tables.mu, density=2.699, **kwargs))
+
+
+class TestPlan:
+    def test_tasks_are_grouped_by_spectrum(self):
+        assert plan(['a', 'b'], ['H10', 'Ka']) == [('a', HVL), ('a', 'H10'), ('a', 'Ka'),
+                                                   ('b', HVL), ('b', 'H10'), ('b', 'Ka')]
+
+    def test_without_hvl(self):
+        assert plan(['a'], ['H10'], hvl=False) == [('a', 'H10')]
+
+
+class TestRunBatch:
+    def test_results(self, tables):
+        results = run(tables)
+        assert all(isinstance(result, BatchResult) for result in results)
+        # One HVL, two H10 angles and one Ka coefficient per spectrum
+        assert len(results) == 4 * 4
+        hvl = read_spectrum(SPECTRA[2]).calculate_hvl(tables.mu, tables.mutr, density=2.699)
+        assert next(result.value for result in results if result[:2] == ('N60', 'hvl')) == pytest.approx(hvl)
+
+    def test_result_does_not_depend_on_scheduling(self, tables):
+        kwargs = {'uncertainty': 'MonteCarlo', 'trials': 2000, 'seed': 3}
+        serial = sorted(run(tables, jobs=1, **kwargs))
+        parallel = sorted(run(tables, jobs=2, chunk_size=1, **kwargs))
+        assert serial == parallel
+
+    def test_progress(self, tables):
+        reports = []
+        run(tables, jobs=2, chunk_size=3, progress=reports.append)
+        assert [report.done for report in reports] == sorted(report.done for report in reports)
+        assert reports[-1].done == reports[-1].total == 4 * 3
+        assert reports[-1].eta == 0
+
+    def test_results_are_streamed(self, tables):
+        reports = []
+        results = run_batch(SPECTRA, tables.hk, tables.mutr, tables.mu, chunk_size=3, progress=reports.append)
+        next(results)
+        assert len(reports) == 1
+
+    def test_missing_mutr_table(self):
+        with pytest.raises(ValueError, match="mutr/rho table of air is required"):
+            list(run_batch(SPECTRA))
+
+    def test_registry_is_not_modified(self, tables, table_energy):
+        air = CoefficientTable(table_energy, 1 + 0 * table_energy)
+        get_registry().register('air', mu_tr=air)
+        run(tables)
+        assert get_registry().table('air', 'mu_tr') is air
+        assert 'absorber' not in get_registry()
+
+    def test_duplicate_file_names(self, tmp_path, tables):
+        hk, mutr, mu = tables
+        for directory in ('a', 'b'):
+            (tmp_path / directory).mkdir()
+            copyfile('dev/reference/N60.csv', tmp_path / directory / 'N60.csv')
+        with pytest.raises(ValueError, match="Duplicate spectrum name: N60"):
+            list(run_batch([tmp_path / 'a' / 'N60.csv', tmp_path / 'b' / 'N60.csv'], hk, mutr, mu))
+        with pytest.raises(ValueError, match="Duplicate table name: N60"):
+            list(run_batch(SPECTRA, [tmp_path / 'a' / 'N60.csv', tmp_path / 'b' / 'N60.csv'], mutr, mu))
+
+    def test_malformed_table_with_workers(self, tmp_path, tables):
+        _, mutr, mu = tables
+        (tmp_path / 'hk.txt').write_text('not\ta\ttable\n')
+        with pytest.raises(ValueError):
+            list(run_batch(SPECTRA, {'hk': tmp_path / 'hk.txt'}, mutr, mu, jobs=2, chunk_size=1))
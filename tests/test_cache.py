@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from src.spectrometry import spectrometry
+from src.spectrometry.cache import GridCache, fingerprint
+from src.spectrometry.spectrometry import Spectrum
+from src.spectrometry.tables import CoefficientTable
+
+
+class CountingTable(CoefficientTable):
+    calls = 0
+
+    def __call__(self, energy):
+        CountingTable.calls += 1
+        return super().__call__(energy)
+
+
+class TestFingerprint:
+    def test_equal_content(self):
+        assert fingerprint(np.linspace(1, 2, 5)) == fingerprint(np.linspace(1, 2, 5))
+
+    def test_different_content(self):
+        assert fingerprint(np.linspace(1, 2, 5)) != fingerprint(np.linspace(1, 2.0001, 5))
+
+    def test_shape_is_hashed(self):
+        values = np.arange(6.)
+        assert fingerprint(values) != fingerprint(values.reshape(2, 3))
+
+    def test_table_identity(self):
+        energy = np.geomspace(5, 400, 20)
+        assert CoefficientTable(energy, energy ** -2).fingerprint == CoefficientTable(energy, energy ** -2).fingerprint
+        assert (CoefficientTable(energy, energy ** -2).fingerprint !=
+                CoefficientTable(energy, energy ** -2, method='Pchip').fingerprint)
+
+
+class TestGridCache:
+    def setup_method(self):
+        self.energy = np.geomspace(5, 400, 20)
+        self.table = CountingTable(self.energy, 30 * self.energy ** -3 + 0.02)
+        CountingTable.calls = 0
+
+    def test_second_lookup_skips_interpolation(self):
+        grid_cache = GridCache()
+        grid = np.linspace(20, 60, 100)
+        first = grid_cache.get(self.table, grid)
+        second = grid_cache.get(self.table, grid.copy())
+        assert second is first
+        assert CountingTable.calls == 1
+        assert (grid_cache.hits, grid_cache.misses) == (1, 1)
+        assert np.array_equal(first, self.table(grid))
+
+    def test_cached_values_are_read_only(self):
+        values = GridCache().get(self.table, np.linspace(20, 60, 100))
+        with pytest.raises(ValueError):
+            values[0] = 0.0
+
+    def test_size_limit(self):
+        grid_cache = GridCache(max_bytes=250 * 8)
+        for stop in (60, 70, 80):
+            grid_cache.get(self.table, np.linspace(20, stop, 100))
+        assert len(grid_cache) == 2
+        assert grid_cache.nbytes == 200 * 8
+        grid_cache.get(self.table, np.linspace(20, 60, 100))
+        assert grid_cache.misses == 4
+
+    def test_disabled(self):
+        grid_cache = GridCache(max_bytes=0)
+        grid = np.linspace(20, 60, 100)
+        grid_cache.get(self.table, grid)
+        grid_cache.get(self.table, grid)
+        assert CountingTable.calls == 2
+        assert len(grid_cache) == 0
+
+    def test_clear(self):
+        grid_cache = GridCache()
+        grid_cache.get(self.table, np.linspace(20, 60, 100))
+        grid_cache.clear()
+        assert (len(grid_cache), grid_cache.nbytes) == (0, 0)
+
+
+class TestSpectrumCache:
+    def test_spectra_on_a_known_grid_skip_interpolation(self, monkeypatch):
+        monkeypatch.setattr(spectrometry, 'grid_cache', GridCache())
+        energy = np.geomspace(5, 400, 20)
+        mutr = CountingTable(energy, 30 * energy ** -3 + 0.02)
+        hk = CountingTable(energy, 1 + 0.5 * np.exp(-((energy - 60) / 40) ** 2))
+        CountingTable.calls = 0
+        grid = np.linspace(20, 60, 100)
+        results = [Spectrum(grid, np.exp(-(grid - center) ** 2 / 50)).conversion_coefficient(hk, mutr)
+                   for center in (30, 40, 50)]
+        assert CountingTable.calls == 2
+        weights = grid * np.exp(-(grid - 50) ** 2 / 50) * mutr(grid)
+        assert results[-1] == pytest.approx(np.dot(weights, hk(grid)) / weights.sum())
@@ -0,0 +1,84 @@
+from shutil import copyfile
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.spectrometry.cli import COLUMNS, expand_paths, main
+from src.spectrometry.store import ResultStore
+
+SPECTRA = ['dev/reference/N40.csv', 'dev/reference/N60.csv', 'dev/reference/N250.csv']
+
+
+def run(directory, *args):
+    output = directory / 'results.csv'
+    status = main([*SPECTRA, '--hk', str(directory / 'hk_*.txt'), '--mutr', str(directory / 'mutr.txt'),
+                   '--mu', str(directory / 'mu_Al.txt'), '--density', '2.699', '-o', str(output), *args])
+    return status, pd.read_csv(output, keep_default_na=False) if status == 0 else None
+
+
+class TestMain:
+    def test_consolidated_results(self, table_files):
+        status, results = run(table_files)
+        assert status == 0
+        assert list(results.columns) == COLUMNS
+        # One HVL, two H10 angles and one Ka coefficient per spectrum
+        assert len(results) == 3 * 4
+        assert list(results.loc[results['table'] == 'hk_H10', 'angle'].unique()) == ['0', '90']
+        assert np.allclose(results.loc[results['table'] == 'hk_Ka', 'value'].astype(float), 1)
+
+    def test_result_does_not_depend_on_jobs(self, table_files):
+        args = ('--uncertainty', 'MonteCarlo', '--trials', '2000', '--seed', '4')
+        _, serial = run(table_files, '--jobs', '1', *args)
+        _, parallel = run(table_files, '--jobs', '2', *args)
+        pd.testing.assert_frame_equal(serial, parallel)
+
+    def test_gum_uncertainty(self, table_files):
+        _, results = run(table_files, '--uncertainty', 'GUM')
+        assert (results['uncertainty'].astype(float) >= 0).all()
+
+    def test_missing_file(self, table_files, capsys):
+        assert main(['missing.csv', '--mutr', str(table_files / 'mutr.txt'),
+                     '--mu', str(table_files / 'mu_Al.txt')]) == 1
+        assert "Error reading file" in capsys.readouterr().err
+
+    def test_duplicate_spectrum_names(self, table_files, capsys):
+        for directory in ('a', 'b'):
+            (table_files / directory).mkdir()
+            copyfile('dev/reference/N60.csv', table_files / directory / 'N60.csv')
+        spectra = [str(table_files / 'a' / 'N60.csv'), str(table_files / 'b' / 'N60.csv')]
+        assert main([*spectra, '--mutr', str(table_files / 'mutr.txt'),
+                     '-o', str(table_files / 'results.csv')]) == 1
+        assert "Duplicate spectrum name: N60" in capsys.readouterr().err
+
+    @pytest.mark.parametrize('jobs', ['1', '2'])
+    def test_malformed_table(self, table_files, capsys, jobs):
+        (table_files / 'hk_H10.txt').write_text('not\ta\ttable\n')
+        status, _ = run(table_files, '--jobs', jobs)
+        assert status == 1
+        assert "spectrometry: " in capsys.readouterr().err
+
+    def test_cache(self, table_files):
+        _, first = run(table_files, '--cache', str(table_files / 'cache'))
+        _, second = run(table_files, '--cache', str(table_files / 'cache'))
+        pd.testing.assert_frame_equal(first, second)
+
+    def test_watch_requires_one_directory(self, table_files, capsys):
+        assert main(['a', 'b', '--watch', '--mutr', str(table_files / 'mutr.txt')]) == 1
+        assert "--watch requires one directory" in capsys.readouterr().err
+
+    def test_store(self, table_files):
+        store = table_files / 'results.db'
+        run(table_files, '--store', str(store), '--campaign', '2024-05')
+        run(table_files, '--store', str(store), '--campaign', '2024-06')
+        with ResultStore(store) as results:
+            assert results.campaigns() == ['2024-05', '2024-06']
+            assert len(results.query(spectrum='N60', table='hk_H10', angle='90')) == 2
+
+
+class TestExpandPaths:
+    def test_directory_and_glob(self):
+        paths = expand_paths(['dev/reference', 'dev/reference/N6*.csv'], ('.csv',))
+        assert 'dev/reference/N60.csv' in paths
+        assert len(paths) == len(set(paths))
+        assert not any(path.endswith('.py') for path in paths)
@@ -0,0 +1,97 @@
+from shutil import copyfile
+
+import numpy as np
+import pytest
+
+from src.spectrometry import batch
+from src.spectrometry.batch import run_batch
+from src.spectrometry.incremental import ResultCache, digest, task_key
+from src.spectrometry.spectrometry import Spectrum
+
+
+@pytest.fixture
+def inputs(table_files):
+    for name in ('N40', 'N60'):
+        copyfile(f'dev/reference/{name}.csv', table_files / f'{name}.csv')
+    return table_files
+
+
+class TestDigest:
+    def test_file_content(self, tmp_path):
+        (tmp_path / 'a.txt').write_text('1\t2\n')
+        (tmp_path / 'b.txt').write_text('1\t2\n')
+        assert digest(tmp_path / 'a.txt') == digest(str(tmp_path / 'b.txt'))
+        (tmp_path / 'b.txt').write_text('1\t3\n')
+        assert digest(tmp_path / 'a.txt') != digest(tmp_path / 'b.txt')
+
+    def test_spectrum(self):
+        assert digest(Spectrum([1, 2], [3, 4])) == digest(Spectrum([1, 2], [3, 4]))
+        assert digest(Spectrum([1, 2], [3, 4])) != digest(Spectrum([1, 2], [3, 4], kerma=[1, 1]))
+
+    def test_missing_file(self):
+        with pytest.raises(ValueError, match="Error reading file"):
+            digest('missing.txt')
+
+    def test_parameters_change_the_key(self):
+        assert task_key('a', 'b', trials=10) != task_key('a', 'b', trials=20)
+        assert task_key('a', 'b', trials=10, seed=1) == task_key('a', 'b', seed=1, trials=10)
+
+
+class TestResultCache:
+    def test_round_trip(self, tmp_path):
+        cache = ResultCache(tmp_path / 'results')
+        assert 'abc' not in cache and cache.get('abc') is None
+        cache.put('abc', [('N60', 'hk', 'H10', '', 1.5, float('nan'))])
+        row = cache.get('abc')[0]
+        assert 'abc' in cache
+        assert row[:5] == ['N60', 'hk', 'H10', '', 1.5] and np.isnan(row[5])
+
+
+class TestIncrementalBatch:
+    def run(self, directory, **kwargs):
+        return sorted(run_batch([directory / 'N40.csv', directory / 'N60.csv'],
+                                [directory / 'hk_H10.txt', directory / 'hk_Ka.txt'], directory / 'mutr.txt',
+                                directory / 'mu_Al.txt', density=2.699, cache=directory / 'cache', **kwargs))
+
+    def count_tasks(self, monkeypatch):
+        computed = []
+        run_task = batch._run_task
+        monkeypatch.setattr(batch, '_run_task', lambda *args: computed.append(args[1::2]) or run_task(*args))
+        return computed
+
+    def test_rerun_recomputes_nothing(self, inputs, monkeypatch):
+        first = self.run(inputs, uncertainty='GUM')
+        computed = self.count_tasks(monkeypatch)
+        assert self.run(inputs, uncertainty='GUM') == first
+        assert computed == []
+
+    def test_changed_table(self, inputs, monkeypatch):
+        self.run(inputs)
+        ka = np.loadtxt(inputs / 'hk_Ka.txt')
+        np.savetxt(inputs / 'hk_Ka.txt', ka * [1, 2], delimiter='\t')
+        computed = self.count_tasks(monkeypatch)
+        results = self.run(inputs)
+        assert sorted(computed) == [('N40', 'hk_Ka'), ('N60', 'hk_Ka')]
+        assert all(result.value == pytest.approx(2) for result in results if result.table == 'hk_Ka')
+
+    def test_changed_spectrum_and_parameters(self, inputs, monkeypatch):
+        self.run(inputs)
+        with open(inputs / 'N40.csv', 'a') as file:
+            file.write('301,0.1,1\n')
+        computed = self.count_tasks(monkeypatch)
+        self.run(inputs)
+        assert sorted(computed) == [('N40', 'hk_H10'), ('N40', 'hk_Ka'), ('N40', 'hvl')]
+        computed.clear()
+        self.run(inputs, method='Pchip')
+        assert len(computed) == 6
+
+    def test_changed_relative_uncertainties(self, inputs, monkeypatch):
+        first = self.run(inputs, uncertainty='GUM')
+        computed = self.count_tasks(monkeypatch)
+        second = self.run(inputs, uncertainty='GUM', relative_uncertainties={'u_mu_tr': 0.05})
+        assert len(computed) == 6
+        assert [result.uncertainty for result in second] != [result.uncertainty for result in first]
+
+    def test_invalid_relative_uncertainty(self, inputs):
+        with pytest.raises(ValueError, match="Invalid relative uncertainties: u_density"):
+            self.run(inputs, relative_uncertainties={'u_density': 0.01})
@@ -1,4 +1,6 @@
+import json
 import os
+import pickle
 from io import StringIO
 from tempfile import NamedTemporaryFile
 
@@ -7,7 +9,8 @@ import pandas as pd
 import pytest
 from scipy.interpolate import CubicSpline, PchipInterpolator, Akima1DInterpolator, make_interp_spline
 
-from src.spectrometry.interpolator import Interpolator, read_file, interpolate, clean_arrays, is_1d_numeric_array
+from src.spectrometry.interpolator import (Interpolator, read_file, interpolate, clean_arrays, is_1d_numeric_array,
+                                          load, FORMAT_VERSION)
 
 
 class TestInterpolator:
@@ -240,6 +243,103 @@ class TestInterpolator:
             new_y = self.interpolator.interpolate(1.5, 'PiecewiseLinear')
             assert new_y[0]==3
 
+        def test_interpolate_reuses_fitted_interpolants(self):
+            self.interpolator.interpolate(self.new_x, 'CubicSpline')
+            interpolant = self.interpolator.interpolants['CubicSpline']
+            self.interpolator.interpolate([2.2], 'CubicSpline')
+            assert self.interpolator.interpolants['CubicSpline'] is interpolant
+            self.interpolator.interpolate([2.2], 'CubicSpline', log=True)
+            assert self.interpolator.interpolants['CubicSpline'] is not interpolant
+
+    class TestSaveLoad:
+        METHODS = ['PiecewiseLinear', 'CubicSpline', 'Pchip', 'Akima1D', 'B-splines']
+
+        def setup_method(self):
+            self.x = np.geomspace(1, 100, 12)
+            self.y = 3 * self.x ** -1.5 + 0.1
+            self.new_x = np.geomspace(0.5, 150, 50)
+
+        @pytest.mark.parametrize('log', [False, True])
+        def test_round_trip(self, tmp_path, log):
+            interpolator = Interpolator(x=self.x, y=self.y)
+            expected = interpolator.interpolate(self.new_x, self.METHODS, log=log)
+            interpolator.save(tmp_path / 'fitted.npz')
+            loaded = load(tmp_path / 'fitted.npz')
+            assert np.array_equal(loaded.x, self.x) and np.array_equal(loaded.y, self.y)
+            interpolants = dict(loaded.interpolants)
+            new_y = loaded.interpolate(self.new_x, self.METHODS, log=log)
+            pd.testing.assert_frame_equal(new_y, expected)
+            # The loaded interpolants were evaluated, not refitted
+            assert all(loaded.interpolants[method] is interpolants[method] for method in self.METHODS)
+
+        def test_keyword_arguments_are_kept(self, tmp_path):
+            interpolator = Interpolator(x=self.x, y=self.y)
+            expected = interpolator.interpolate(self.new_x, 'Akima1D', extrapolate=True)
+            interpolator.save(tmp_path / 'fitted')
+            loaded = load(tmp_path / 'fitted.npz')
+            assert np.array_equal(loaded.interpolate(self.new_x, 'Akima1D', extrapolate=True), expected)
+
+        def test_save_without_interpolants(self, tmp_path):
+            with pytest.raises(ValueError, match="No fitted interpolants to save"):
+                Interpolator(x=self.x, y=self.y).save(tmp_path / 'fitted.npz')
+
+        def test_load_incomplete_metadata(self, tmp_path):
+            np.savez(tmp_path / 'foreign.npz', x=self.x, y=self.y,
+                     metadata=json.dumps({'version': FORMAT_VERSION, 'methods': {}}))
+            with pytest.raises(ValueError, match="Error reading file: missing entry 'log'"):
+                load(tmp_path / 'foreign.npz')
+
+        def test_load_invalid_file(self, tmp_path):
+            (tmp_path / 'invalid.npz').write_text('not a npz file')
+            with pytest.raises(ValueError, match="Error reading file"):
+                load(tmp_path / 'invalid.npz')
+
+    class TestPickle:
+        def test_raw_data_is_not_pickled(self):
+            data = pd.DataFrame({'x': np.arange(1.0, 1001.0), 'y': np.arange(1.0, 1001.0) ** 2,
+                                 'notes': ['unused'] * 1000})
+            interpolator = Interpolator(data=data)
+            interpolator.interpolate([1.5, 2.5], 'CubicSpline')
+            restored = pickle.loads(pickle.dumps(interpolator))
+            assert restored._data is None
+            assert np.array_equal(restored._x, interpolator.x)
+            assert np.array_equal(restored.interpolate([1.5, 2.5], 'CubicSpline'), interpolator.new_y)
+            assert 'notes' not in str(pickle.dumps(interpolator))
+
+    class TestChunked:
+        @pytest.mark.parametrize('log', [False, True])
+        def test_same_as_unchunked(self, log):
+            interpolator = Interpolator(np.geomspace(1, 100, 20), np.geomspace(1, 100, 20) ** -2)
+            new_x = np.geomspace(1, 100, 1001)
+            expected = interpolator.interpolate(new_x, ['Akima1D', 'CubicSpline'], log=log)
+            result = interpolator.interpolate(new_x, ['Akima1D', 'CubicSpline'], log=log, chunk_size=64)
+            pd.testing.assert_frame_equal(result, expected)
+            np.testing.assert_array_equal(interpolator.new_x, new_x)
+            result = interpolator.interpolate(new_x, 'Pchip', log=log, chunk_size=100)
+            np.testing.assert_allclose(result, interpolator.interpolate(new_x, 'Pchip', log=log))
+
+        def test_iter_interpolate(self):
+            interpolator = Interpolator([1, 2, 3, 4], [1, 4, 9, 16])
+            new_x = np.linspace(1, 4, 10)
+            chunks = list(interpolator.iter_interpolate(new_x, 'PiecewiseLinear', chunk_size=4))
+            assert [len(x_chunk) for x_chunk, _ in chunks] == [4, 4, 2]
+            np.testing.assert_allclose(np.concatenate([y_chunk for _, y_chunk in chunks]),
+                                       np.interp(new_x, [1, 2, 3, 4], [1, 4, 9, 16]))
+            assert interpolator.new_y is None
+
+        def test_iter_interpolate_multiple_methods(self):
+            interpolator = Interpolator([1, 2, 3, 4], [1, 4, 9, 16])
+            x_chunk, y_chunk = next(interpolator.iter_interpolate([1.5, 2.5], ['PiecewiseLinear', 'CubicSpline']))
+            assert list(y_chunk.columns) == ['PiecewiseLinear', 'CubicSpline']
+            np.testing.assert_allclose(y_chunk['PiecewiseLinear'], [2.5, 6.5])
+
+        @pytest.mark.parametrize('chunk_size', [0, -1, 2.5])
+        def test_invalid_chunk_size(self, chunk_size):
+            interpolator = Interpolator([1, 2, 3, 4], [1, 4, 9, 16])
+            with pytest.raises(ValueError, match="chunk_size must be a positive integer"):
+                interpolator.interpolate([1.5], 'PiecewiseLinear', chunk_size=chunk_size)
+            with pytest.raises(ValueError, match="chunk_size must be a positive integer"):
+                next(interpolator.iter_interpolate([1.5], 'PiecewiseLinear', chunk_size=chunk_size))
 
 
 class TestReadFile:
@@ -0,0 +1,113 @@
+import os
+import subprocess
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.spectrometry import _kernels
+from src.spectrometry._kernels import TOLERANCE, resolve_backend
+from src.spectrometry.spectrometry import filter_transmission
+from src.spectrometry.uncertainty import conversion_coefficient, conversion_coefficient_mc, half_value_layer
+
+BACKENDS = ['numpy', pytest.param('numba', marks=pytest.mark.skipif(not _kernels.NUMBA_AVAILABLE,
+                                                                     reason="numba is not installed"))]
+
+
+def make_inputs(coefficients, trials=50, bins=300):
+    rng = np.random.default_rng(3)
+    energy = np.linspace(20, 150, bins)
+    fluence = np.exp(-(energy - 60) ** 2 / 400)
+    mu_tr, mu, hk = coefficients.mu_tr(energy), 2.699 * coefficients.mu(energy), coefficients.h10(energy)
+    factors = 1 + 0.01 * rng.standard_normal((4, trials, bins))
+    return energy, fluence, mu_tr, mu, hk, factors
+
+
+class TestResolveBackend:
+    def test_auto(self):
+        assert resolve_backend('auto') == ('numba' if _kernels.NUMBA_AVAILABLE else 'numpy')
+
+    def test_invalid_backend(self):
+        with pytest.raises(ValueError, match="Invalid backend"):
+            resolve_backend('cuda')
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+class TestBackendsAgree:
+    def test_conversion_coefficient(self, backend, coefficients):
+        energy, fluence, mu_tr, _, hk, factors = make_inputs(coefficients)
+        inputs = (energy * factors[0], fluence * factors[1], mu_tr * factors[2], factors[3])
+        expected = conversion_coefficient(*inputs, hk, backend='numpy')
+        result = conversion_coefficient(*inputs, hk, backend=backend)
+        assert result.shape == (50, 2)
+        assert np.allclose(result, expected, rtol=TOLERANCE, atol=0)
+        single = conversion_coefficient(energy, fluence, mu_tr, 1.0, hk[:, 0], backend=backend)
+        assert single == pytest.approx(conversion_coefficient(energy, fluence, mu_tr, 1.0, hk[:, 0]), rel=TOLERANCE)
+
+    def test_half_value_layer(self, backend, coefficients):
+        energy, fluence, mu_tr, mu, _, factors = make_inputs(coefficients)
+        inputs = (energy * factors[0], fluence * factors[1], mu * factors[2], mu_tr * factors[3])
+        expected = half_value_layer(*inputs, backend='numpy')
+        assert np.allclose(half_value_layer(*inputs, backend=backend), expected, rtol=TOLERANCE, atol=0)
+        assert float(half_value_layer(energy, fluence, mu, mu_tr, backend=backend)) == pytest.approx(
+            float(half_value_layer(energy, fluence, mu, mu_tr, backend='numpy')), rel=TOLERANCE)
+
+    def test_filter_transmission(self, backend, coefficients):
+        energy, fluence, mu_tr, mu, _, _ = make_inputs(coefficients)
+        thickness = np.stack(np.meshgrid(np.linspace(0, 0.3, 7), np.linspace(0, 0.1, 5), indexing='ij'), axis=-1)
+        layers = np.stack([mu, 3 * mu])
+        weights = energy * fluence * mu_tr
+        expected = filter_transmission(layers, thickness, weights, backend='numpy')
+        result = filter_transmission(layers, thickness, weights, backend=backend)
+        assert result.shape == (7, 5)
+        assert np.allclose(result, expected, rtol=TOLERANCE, atol=0)
+
+    def test_monte_carlo(self, backend, coefficients):
+        energy, fluence, mu_tr, _, hk, _ = make_inputs(coefficients)
+        expected = conversion_coefficient_mc(energy, fluence, mu_tr, hk, trials=1000, seed=2, backend='numpy')
+        result = conversion_coefficient_mc(energy, fluence, mu_tr, hk, trials=1000, seed=2, backend=backend)
+        assert np.allclose(result.mean, expected.mean, rtol=TOLERANCE, atol=0)
+        assert np.allclose(result.std, expected.std, rtol=TOLERANCE, atol=0)
+
+    def test_concurrent_calls(self, backend, coefficients):
+        energy, fluence, mu_tr, _, hk, factors = make_inputs(coefficients)
+        inputs = [(energy * factors[0] * (1 + i / 10), fluence * factors[1], mu_tr * factors[2], factors[3])
+                  for i in range(8)]
+        expected = [conversion_coefficient(*args, hk, backend='numpy') for args in inputs]
+        with ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(lambda args: conversion_coefficient(*args, hk, backend=backend), inputs))
+        for result, values in zip(results, expected):
+            assert np.allclose(result, values, rtol=TOLERANCE, atol=0)
+
+
+# Runs the kernels with numba's default threading layer, without the selection of conftest.py
+POOL_SCRIPT = """
+import numpy as np
+from src.spectrometry.uncertainty import conversion_coefficient_mc
+energy = np.linspace(20, 150, 100)
+fluence = np.exp(-(energy - 60) ** 2 / 400)
+result = conversion_coefficient_mc(energy, fluence, 3e3 * energy ** -2.8 + 0.02, 1 + energy / 300, trials=2000,
+                                   seed=1, chunk_size=250, jobs=2, backend='numba')
+print(result.trials)
+"""
+
+
+@pytest.mark.skipif(not _kernels.NUMBA_AVAILABLE, reason="numba is not installed")
+class TestProcessPools:
+    def test_monte_carlo_jobs_exits(self):
+        env = {name: value for name, value in os.environ.items() if name != 'NUMBA_THREADING_LAYER'}
+        completed = subprocess.run([sys.executable, '-c', POOL_SCRIPT], cwd=Path(__file__).parents[1], env=env,
+                                   capture_output=True, text=True, timeout=120)
+        assert completed.returncode == 0, completed.stderr
+        assert completed.stdout.split() == ['2000']
+
+
+class TestKernelsWithoutNumba:
+    # The kernels are plain Python functions when numba is missing; check their arithmetic on a small input
+    def test_weighted_sums(self, coefficients):
+        energy, fluence, mu_tr, _, hk, _ = make_inputs(coefficients, bins=20)
+        function = getattr(_kernels.weighted_sums.kernel, 'py_func', _kernels.weighted_sums.kernel)
+        result = function(*[row[None] for row in (energy, fluence, mu_tr, np.ones_like(energy))], hk)
+        assert np.allclose(result[0], conversion_coefficient(energy, fluence, mu_tr, 1.0, hk, backend='numpy'))
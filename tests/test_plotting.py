@@ -0,0 +1,140 @@
+import pickle
+
+import matplotlib.pyplot as plt
+import numpy as np
+import pytest
+
+from src.spectrometry.interpolator import Interpolator
+from src.spectrometry.plotting import FigureTemplate, decimate, plot_job, render_many
+
+PNG = b'\x89PNG'
+
+
+def make_interpolator(scale=1.0):
+    interpolator = Interpolator(x=np.arange(1.0, 11.0), y=scale * np.arange(1.0, 11.0) ** 2)
+    interpolator.interpolate(np.linspace(1, 10, 200), ['PiecewiseLinear', 'CubicSpline'])
+    return interpolator
+
+
+class TestPlotJob:
+    def test_series_by_method(self):
+        job = plot_job(make_interpolator(), 'plot.png')
+        assert list(job.series) == ['PiecewiseLinear', 'CubicSpline']
+
+    def test_single_method(self):
+        interpolator = Interpolator(x=[1, 2, 3], y=[1, 4, 9])
+        interpolator.interpolate([1.5, 2.5], 'PiecewiseLinear')
+        assert list(plot_job(interpolator, 'plot.png').series) == ['Interpolated']
+
+    def test_no_interpolation_results(self):
+        with pytest.raises(ValueError, match="No interpolation results to plot"):
+            plot_job(Interpolator(x=[1, 2, 3], y=[1, 4, 9]), 'plot.png')
+
+
+class TestDecimate:
+    def setup_method(self):
+        self.x = np.linspace(0, 10, 1_000_001)
+        # Smooth curve with a one-sample spike, like a spline overshoot at an absorption edge
+        self.y = np.sin(self.x)
+        self.y[600_000] = 5.0
+
+    @pytest.mark.parametrize('method', ['minmax', 'lttb'])
+    def test_budget_and_shape(self, method):
+        x, y = decimate(self.x, self.y, 2000, method)
+        assert len(x) <= 2000
+        assert np.all(np.diff(x) > 0)
+        assert x[0] == self.x[0] and x[-1] == self.x[-1]
+        # Extremes are kept
+        assert y.max() == 5.0 and y.min() == pytest.approx(-1, abs=1e-6)
+        np.testing.assert_allclose(y[y < 5], np.sin(x[y < 5]))
+
+    def test_non_uniform_grid_is_decimated_along_x(self):
+        # A dense grid below x = 1 and a sparse one above, with a spike in the sparse part
+        x = np.concatenate([np.linspace(0, 1, 100_000, endpoint=False), np.linspace(1, 100, 1000)])
+        y = np.sin(x)
+        y[100_500] = 5.0
+        kept, decimated = decimate(x, y, 400)
+        assert len(kept) <= 400
+        assert np.mean(kept > 1) > 0.9
+        assert decimated.max() == 5.0
+
+    def test_small_series_are_unchanged(self):
+        x, y = decimate([1, 2, 3], [4, 5, 6], 100)
+        assert x.tolist() == [1, 2, 3] and y.tolist() == [4, 5, 6]
+        x, y = decimate(self.x, self.y, None)
+        assert len(x) == len(self.x)
+
+    def test_nan_values(self):
+        y = self.y.copy()
+        y[:1000] = np.nan
+        x, decimated = decimate(self.x, y, 1000)
+        assert np.isnan(decimated[0]) and np.isfinite(decimated[-1])
+        assert decimated[np.isfinite(decimated)].max() == 5.0
+
+    def test_invalid_arguments(self):
+        with pytest.raises(ValueError, match="Invalid decimation method"):
+            decimate(self.x, self.y, 100, 'random')
+        with pytest.raises(ValueError, match="at least 4 points"):
+            decimate(self.x, self.y, 3)
+
+
+class TestFigureTemplate:
+    def test_render(self, tmp_path):
+        with FigureTemplate() as template:
+            path = template.render(plot_job(make_interpolator(), tmp_path / 'plot.png'))
+        assert open(path, 'rb').read(4) == PNG
+        # No pyplot figure was created
+        assert plt.get_fignums() == []
+
+    def test_figure_is_reused(self, tmp_path):
+        template = FigureTemplate(yscale='log')
+        for i in range(3):
+            template.render(plot_job(make_interpolator(i + 1), tmp_path / f'plot_{i}.png', title=f'Plot {i}'))
+            assert len(template.figure.axes) == 1
+            assert len(template.axes.lines) == 0
+        assert template.axes.get_yscale() == 'log'
+
+    def test_same_figure_gives_same_image(self, tmp_path):
+        template = FigureTemplate()
+        job = plot_job(make_interpolator(), tmp_path / 'a.png')
+        template.render(job)
+        template.render(job._replace(file_path=str(tmp_path / 'b.png')))
+        assert (tmp_path / 'a.png').read_bytes() == (tmp_path / 'b.png').read_bytes()
+
+    def test_dense_series_are_decimated(self, tmp_path):
+        interpolator = make_interpolator()
+        interpolator.interpolate(np.linspace(1, 10, 200_000), 'CubicSpline')
+        template = FigureTemplate(max_points=500)
+        drawn = []
+        template.figure.savefig = lambda path: drawn.extend(len(line.get_xdata()) for line in template.axes.lines)
+        template.render(plot_job(interpolator, tmp_path / 'plot.png'))
+        assert drawn[0] == 10 and drawn[1] <= 500
+
+    def test_pickle(self):
+        template = pickle.loads(pickle.dumps(FigureTemplate(fig_size=(4, 3), xlabel='E (keV)')))
+        assert template.options['xlabel'] == template.axes.get_xlabel() == 'E (keV)'
+        assert tuple(template.figure.get_size_inches()) == (4, 3)
+
+
+class TestRenderMany:
+    @pytest.mark.parametrize('processes', [1, 2])
+    def test_render_many(self, tmp_path, processes):
+        jobs = [plot_job(make_interpolator(i + 1), tmp_path / f'plot_{i}.svg') for i in range(6)]
+        paths = render_many(jobs, FigureTemplate(fig_size=(4, 3)), processes=processes, chunk_size=2)
+        assert paths == [job.file_path for job in jobs]
+        assert all(open(path).read().lstrip().startswith('<?xml') for path in paths)
+
+    def test_only_the_default_template_is_closed(self, tmp_path, monkeypatch):
+        closed = []
+        monkeypatch.setattr(FigureTemplate, 'close', lambda template: closed.append(template))
+        jobs = [plot_job(make_interpolator(), tmp_path / 'plot.svg')]
+        template = FigureTemplate(fig_size=(4, 3))
+        render_many(jobs, template, processes=1)
+        assert closed == []
+        render_many(jobs, processes=1)
+        assert len(closed) == 1 and closed[0] is not template
+
+
+def test_interpolator_render(tmp_path):
+    path = make_interpolator().render(tmp_path / 'plot.png', title='Test')
+    assert open(path, 'rb').read(4) == PNG
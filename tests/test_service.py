@@ -0,0 +1,187 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from http.client import HTTPConnection
+from threading import Event, Thread
+from time import sleep
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+import numpy as np
+import pytest
+
+from src.spectrometry.service import CalculationService, TableBatcher, main, start_server
+from src.spectrometry.spectrometry import read_spectrum
+
+
+@pytest.fixture(scope='module')
+def server(tables):
+    service = CalculationService(tables.hk, {'air': {'mu_tr': tables.mutr},
+                                             'Al': {'mu': tables.mu, 'density': 2.699}})
+    server = start_server(service)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def call(server, path, content=None):
+    url = f"http://{server.server_address[0]}:{server.server_address[1]}{path}"
+    data = None if content is None else json.dumps(content).encode()
+    with urlopen(Request(url, data, {'Content-Type': 'application/json'}), timeout=10) as response:
+        return json.loads(response.read())
+
+
+def spectrum_request(name='N60'):
+    spectrum = read_spectrum(f'dev/reference/{name}.csv')
+    return spectrum, {'energy': spectrum.energy.tolist(), 'fluence': spectrum.values.tolist()}
+
+
+class TestTableBatcher:
+    def test_single_request(self, tables):
+        batcher = TableBatcher(tables.mu)
+        np.testing.assert_allclose(batcher([10, 20]), tables.mu([10, 20]))
+        assert batcher.evaluations == batcher.requests == 1
+
+    def test_concurrent_requests_are_coalesced(self, tables):
+        batcher = TableBatcher(tables.hk['H10'], window=0.2)
+        grids = [np.linspace(10, 100, 5 + i % 3) for i in range(8)]
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(batcher, grids))
+        for grid, result in zip(grids, results):
+            np.testing.assert_allclose(result, tables.hk['H10'](grid))
+        assert batcher.requests == 8
+        assert batcher.evaluations < 8
+
+    def test_leader_returns_under_continuous_load(self, tables):
+        def table(energy):
+            sleep(0.02)
+            return tables.mu(energy)
+
+        batcher, stop, returned = TableBatcher(table), Event(), []
+
+        def submit():
+            while not stop.is_set():
+                batcher([10, 20])
+
+        # The caller leads the first batch. Two groups of threads, started half an evaluation apart, are evaluated in
+        # alternate batches, so requests are always pending when a batch completes
+        caller = Thread(target=lambda: returned.append(batcher([30, 40])))
+        caller.start()
+        submitters = []
+        for _ in range(2):
+            sleep(0.01)
+            submitters += [Thread(target=submit) for _ in range(2)]
+            for thread in submitters[-2:]:
+                thread.start()
+        caller.join(timeout=2)
+        starved = caller.is_alive()
+        stop.set()
+        for thread in submitters + [caller]:
+            thread.join()
+        assert not starved
+        np.testing.assert_allclose(returned[0], tables.mu([30, 40]))
+
+    def test_errors_reach_every_request(self):
+        def table(energy):
+            raise ValueError("Evaluation failed.")
+
+        batcher = TableBatcher(table, window=0.2)
+        with ThreadPoolExecutor(4) as executor:
+            futures = [executor.submit(batcher, [10, 20]) for _ in range(4)]
+        for future in futures:
+            with pytest.raises(ValueError, match="Evaluation failed"):
+                future.result()
+
+
+class TestHTTP:
+    def test_health_and_tables(self, server):
+        assert call(server, '/health') == {'status': 'ok'}
+        description = call(server, '/tables')
+        assert description['tables'] == {'H10': ['0', '90'], 'Ka': None}
+        assert {'air', 'Al'} <= set(description['materials'])
+
+    def test_hvl(self, server, tables):
+        spectrum, request = spectrum_request()
+        hvl = call(server, '/hvl', dict(request, mu='Al'))['hvl']
+        assert hvl == pytest.approx(spectrum.calculate_hvl(tables.mu, tables.mutr, density=2.699))
+
+    def test_conversion_coefficient(self, server, tables):
+        spectrum, request = spectrum_request()
+        values = call(server, '/conversion-coefficient', dict(request, table='H10'))['values']
+        expected = spectrum.angular_conversion_coefficients(tables.hk['H10'], tables.mutr)
+        assert values == pytest.approx(dict(zip(['0', '90'], expected)))
+        value = call(server, '/conversion-coefficient', dict(request, table='Ka'))['values']
+        assert value == pytest.approx(1.0)
+
+    def test_interpolate_table(self, server, tables):
+        values = call(server, '/interpolate', {'table': 'H10', 'energy': [20, 60]})['values']
+        np.testing.assert_allclose(values, tables.hk['H10']([20, 60]))
+
+    def test_interpolate_data(self, server):
+        request = {'x': [1, 2, 3, 4], 'y': [1, 4, 9, 16], 'new_x': [1.5, 2.5]}
+        values = call(server, '/interpolate', dict(request, algorithm='PiecewiseLinear'))['values']
+        assert values == pytest.approx([2.5, 6.5])
+        values = call(server, '/interpolate', dict(request, algorithm=['PiecewiseLinear', 'CubicSpline']))['values']
+        assert set(values) == {'PiecewiseLinear', 'CubicSpline'}
+
+    def test_concurrent_requests(self, server, tables):
+        spectra = [spectrum_request(name) for name in ('N15', 'N40', 'N60', 'N250')] * 4
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lambda item: call(server, '/hvl', dict(item[1], mu='Al'))['hvl'], spectra))
+        for (spectrum, _), hvl in zip(spectra, results):
+            assert hvl == pytest.approx(spectrum.calculate_hvl(tables.mu, tables.mutr, density=2.699))
+
+    def test_unknown_table(self, server):
+        with pytest.raises(HTTPError) as error:
+            call(server, '/conversion-coefficient', dict(spectrum_request()[1], table='missing'))
+        assert error.value.code == 400
+        assert 'Unknown table: missing' in json.loads(error.value.read())['error']
+
+    def test_invalid_body(self, server):
+        with pytest.raises(HTTPError) as error:
+            call(server, '/hvl', ['not', 'an', 'object'])
+        assert error.value.code == 400
+
+    def test_invalid_field_types(self, server):
+        for path, request in (('/conversion-coefficient', dict(spectrum_request()[1], table=['H10'])),
+                              ('/hvl', dict(spectrum_request()[1], mu='Al', ratio='half')),
+                              ('/interpolate', {'x': [1, 2], 'y': [1, 2], 'new_x': [1.5], 'algorithm': [1]})):
+            with pytest.raises(HTTPError) as error:
+                call(server, path, request)
+            assert error.value.code == 400
+            assert 'Request failed' in json.loads(error.value.read())['error']
+
+    def test_invalid_content_length(self, server):
+        connection = HTTPConnection(*server.server_address, timeout=10)
+        connection.putrequest('POST', '/hvl')
+        connection.putheader('Content-Length', 'many')
+        connection.endheaders()
+        response = connection.getresponse()
+        assert response.status == 400
+        assert 'Content-Length' in json.loads(response.read())['error']
+        connection.close()
+
+    def test_values_out_of_range_are_null(self, server, tables):
+        values = call(server, '/interpolate', {'table': 'H10', 'energy': [60, 1000]})['values']
+        assert values[0] == pytest.approx(tables.hk['H10']([60])[0].tolist())
+        assert values[1] == [None, None]
+
+    def test_internal_error(self, server, monkeypatch):
+        def hvl(request):
+            raise RuntimeError("unexpected")
+
+        monkeypatch.setattr(server.service, 'hvl', hvl)
+        with pytest.raises(HTTPError) as error:
+            call(server, '/hvl', dict(spectrum_request()[1], mu='Al'))
+        assert error.value.code == 500
+        assert 'unexpected' in json.loads(error.value.read())['error']
+
+    def test_unknown_path(self, server):
+        with pytest.raises(HTTPError) as error:
+            call(server, '/missing')
+        assert error.value.code == 404
+
+
+class TestMain:
+    def test_invalid_table_option(self, capsys):
+        assert main(['--mutr', 'mutr.txt', '--table', 'H10']) == 1
+        assert 'Expected NAME=VALUE' in capsys.readouterr().err
@@ -0,0 +1,284 @@
+from math import exp, log
+
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.interpolate import Akima1DInterpolator
+
+from src.spectrometry.spectrometry import Spectrum, bin_edges, read_spectrum, rebin, summarize
+from src.spectrometry.tables import CoefficientTable
+
+REFERENCE_SPECTRUM = 'dev/reference/N60.csv'
+
+
+def read_reference_spectrum():
+    df = pd.read_csv(REFERENCE_SPECTRUM)
+    return Spectrum(df.iloc[:, 0].values, df.iloc[:, 1].values)
+
+
+def first_angle(table):
+    return CoefficientTable(table.energy, table.values[:, 0])
+
+
+class TestSpectrum:
+    class TestInterpolate:
+        def test_log_scale(self):
+            spectrum = Spectrum([1, 2, 3], [10, 20, 30])
+            new_spectrum = spectrum.interpolate([1.5, 2.5], log_scale=True)
+            assert np.allclose(new_spectrum.energy, [1.5, 2.5])
+            assert np.allclose(new_spectrum.values, [15, 25], rtol=1e-2)
+
+        def test_invalid_method(self):
+            with pytest.raises(ValueError, match="Interpolation methods"):
+                Spectrum([1, 2, 3], [10, 20, 30]).interpolate([1.5], method='InvalidMethod')
+
+    class TestConversionCoefficient:
+        @pytest.fixture(autouse=True)
+        def setup(self, tables):
+            self.spectrum = read_reference_spectrum()
+            self.hk_table, self.mutr_table = first_angle(tables.hk['H10']), tables.mutr
+
+        def test_matches_loop_implementation(self):
+            # Per-energy loop as in dev/reference/uhk_experimental.py
+            log_e, log_hk = np.log(self.hk_table.energy), np.log(self.hk_table.values)
+            log_mutr = np.log(self.mutr_table.values)
+            hk_interpolant = Akima1DInterpolator(log_e, log_hk, axis=0)
+            mutr_interpolant = Akima1DInterpolator(log_e, log_mutr, axis=0)
+            numerator = denominator = 0.0
+            for e, f in zip(self.spectrum.energy, self.spectrum.values):
+                mutr = exp(mutr_interpolant(log(e)))
+                hk = exp(hk_interpolant(log(e)))
+                numerator += e * f * mutr * hk
+                denominator += e * f * mutr
+            expected = numerator / denominator
+            assert self.spectrum.conversion_coefficient(self.hk_table, self.mutr_table) == pytest.approx(expected)
+
+        def test_constant_coefficient(self):
+            hk_table = CoefficientTable([1, 100, 1000], [1.2, 1.2, 1.2])
+            assert self.spectrum.conversion_coefficient(hk_table, self.mutr_table) == pytest.approx(1.2)
+
+        def test_raw_tables(self):
+            hk = pd.DataFrame({'E': self.hk_table.energy, 'hk': self.hk_table.values})
+            mutr = np.column_stack([self.mutr_table.energy, self.mutr_table.values])
+            expected = self.spectrum.conversion_coefficient(self.hk_table, self.mutr_table)
+            assert self.spectrum.conversion_coefficient(hk, mutr) == pytest.approx(expected)
+
+    class TestAngularConversionCoefficients:
+        @pytest.fixture(autouse=True)
+        def setup(self, tables):
+            self.spectrum = read_reference_spectrum()
+            self.hk_table, self.mutr_table = first_angle(tables.hk['H10']), tables.mutr
+
+        def test_every_angle_matches_single_column(self):
+            energy, hk = self.hk_table.energy, self.hk_table.values
+            df = pd.DataFrame({'E': energy, '0': hk, '45': 0.8 * hk, '75': 0.5 * hk})
+            result = self.spectrum.angular_conversion_coefficients(df, self.mutr_table)
+            expected = self.spectrum.conversion_coefficient(self.hk_table, self.mutr_table)
+            assert list(result.index) == ['0', '45', '75']
+            assert np.allclose(result.values, [expected, 0.8 * expected, 0.5 * expected])
+
+        def test_zero_entries_do_not_contribute(self):
+            energy, hk = self.hk_table.energy, self.hk_table.values.copy()
+            hk_zero = hk.copy()
+            hk_zero[energy < 30] = 0
+            df = pd.DataFrame({'E': energy, '0': hk, '180': hk_zero})
+            result = self.spectrum.angular_conversion_coefficients(df, self.mutr_table)
+            assert result['180'] < result['0']
+            assert np.isfinite(result['180'])
+
+    class TestConversionCoefficientUncertainty:
+        @pytest.fixture(autouse=True)
+        def setup(self, tables):
+            self.spectrum = read_reference_spectrum()
+            self.hk_table, self.mutr_table = first_angle(tables.hk['H10']), tables.mutr
+
+        def test_mean_close_to_nominal(self):
+            result = self.spectrum.conversion_coefficient_uncertainty(self.hk_table, self.mutr_table, trials=1000,
+                                                                      seed=1)
+            nominal = self.spectrum.conversion_coefficient(self.hk_table, self.mutr_table)
+            assert result.mean == pytest.approx(nominal, rel=1e-3)
+            assert 0 < result.cv < 1
+
+        def test_gum_mode(self):
+            result = self.spectrum.conversion_coefficient_uncertainty(self.hk_table, self.mutr_table, mode='GUM')
+            nominal = self.spectrum.conversion_coefficient(self.hk_table, self.mutr_table)
+            assert result.value == pytest.approx(nominal)
+            assert 0 < result.cv < 1
+
+        def test_invalid_mode(self):
+            with pytest.raises(ValueError, match="Uncertainty modes"):
+                self.spectrum.conversion_coefficient_uncertainty(self.hk_table, self.mutr_table, mode='Invalid')
+
+    class TestCalculateHVL:
+        @pytest.fixture(autouse=True)
+        def setup(self, tables):
+            self.spectrum = read_reference_spectrum()
+            self.mu_table = tables.mu
+            self.mutr_table = tables.mutr
+
+        def test_matches_bisection(self):
+            # Bisection as in dev/reference/hvl.py, with a tighter tolerance
+            mu = self.mu_table(self.spectrum.energy) * 2.699
+            weights = self.spectrum.energy * self.spectrum.values * self.mutr_table(self.spectrum.energy)
+            low, high = 0.0, 20.0
+            for _ in range(100):
+                middle = (low + high) / 2
+                if np.sum(weights * np.exp(-mu * middle)) / np.sum(weights) > 0.5:
+                    low = middle
+                else:
+                    high = middle
+            hvl = self.spectrum.calculate_hvl(self.mu_table, self.mutr_table, density=2.699)
+            assert hvl == pytest.approx(low, rel=1e-9)
+
+        def test_transmission_ratio(self):
+            first = self.spectrum.calculate_hvl(self.mu_table, self.mutr_table)
+            quarter = self.spectrum.calculate_hvl(self.mu_table, self.mutr_table, ratio=0.25)
+            # Beam hardening makes the second HVL thicker than the first one
+            assert quarter > 2 * first
+
+    class TestHVLUncertainty:
+        @pytest.fixture(autouse=True)
+        def setup(self, tables):
+            self.spectrum = read_reference_spectrum()
+            self.mu_table = tables.mu
+            self.mutr_table = tables.mutr
+
+        def test_monte_carlo(self):
+            hvl = self.spectrum.calculate_hvl(self.mu_table, self.mutr_table)
+            result = self.spectrum.hvl_uncertainty(self.mu_table, self.mutr_table, trials=2000, seed=1)
+            assert result.mean == pytest.approx(hvl, rel=1e-3)
+            assert result.std > 0
+
+        def test_gum_agrees_with_monte_carlo(self):
+            result = self.spectrum.hvl_uncertainty(self.mu_table, self.mutr_table, mode='GUM', cross_check=True,
+                                                   trials=4000, seed=1)
+            assert result.value == pytest.approx(self.spectrum.calculate_hvl(self.mu_table, self.mutr_table))
+            assert result.uncertainty == pytest.approx(result.monte_carlo.std, rel=0.05)
+
+    class TestFilter:
+        @pytest.fixture(autouse=True)
+        def setup(self, tables):
+            self.spectrum = read_reference_spectrum()
+            self.mu_table = tables.mu
+            self.cu_table = CoefficientTable(self.mu_table.energy, 2 * self.mu_table.values)
+            self.mutr_table = tables.mutr
+
+        def test_single_stack(self):
+            filtered = self.spectrum.filter([(self.mu_table, 0.1, 2.699), (self.cu_table, 0.01, 8.96)])
+            mu = self.mu_table(self.spectrum.energy)
+            expected = self.spectrum.values * np.exp(-mu * (0.1 * 2.699 + 0.01 * 2 * 8.96))
+            assert isinstance(filtered, Spectrum)
+            assert np.allclose(filtered.values, expected)
+
+        def test_thickness_grid(self):
+            al, cu = np.linspace(0, 0.5, 4), np.linspace(0, 0.05, 3)
+            filtered = self.spectrum.filter([(self.mu_table, al, 2.699), (self.cu_table, cu, 8.96)])
+            assert filtered.shape == (4, 3, self.spectrum.values.size)
+            single = self.spectrum.filter([(self.mu_table, al[2], 2.699), (self.cu_table, cu[1], 8.96)])
+            assert np.allclose(filtered[2, 1], single.values)
+
+        def test_transmission_at_hvl(self):
+            hvl = self.spectrum.calculate_hvl(self.mu_table, self.mutr_table, density=2.699)
+            transmission = self.spectrum.transmission_curve([(self.mu_table, hvl, 2.699)], self.mutr_table)
+            assert transmission == pytest.approx(0.5)
+
+        def test_transmission_surface(self):
+            al, cu = np.linspace(0, 0.5, 20), np.linspace(0, 0.05, 10)
+            layers = [(self.mu_table, al, 2.699), (self.cu_table, cu, 8.96)]
+            surface = self.spectrum.transmission_curve(layers, self.mutr_table, max_memory=8 * 3000)
+            assert surface.shape == (20, 10)
+            assert surface[0, 0] == pytest.approx(1.0)
+            assert np.all(np.diff(surface, axis=0) < 0) and np.all(np.diff(surface, axis=1) < 0)
+            filtered = Spectrum(self.spectrum.energy, self.spectrum.filter(layers)[7, 3])
+            weights = filtered.kerma_weights(self.mutr_table)
+            assert surface[7, 3] == pytest.approx(weights.sum() / self.spectrum.kerma_weights(self.mutr_table).sum())
+
+        def test_no_layers(self):
+            with pytest.raises(ValueError, match="At least one layer"):
+                self.spectrum.filter([])
+
+    class TestRebin:
+        def test_conserves_fluence_and_kerma(self):
+            df = pd.read_csv(REFERENCE_SPECTRUM)
+            spectrum = Spectrum(df.iloc[:, 0].values, df.iloc[:, 1].values, df.iloc[:, 2].values)
+            rebinned = spectrum.rebin(np.arange(19.9, 301, 1.0))
+            assert rebinned.values.sum() == pytest.approx(spectrum.values.sum(), rel=1e-12)
+            assert rebinned.kerma.sum() == pytest.approx(spectrum.kerma.sum(), rel=1e-12)
+            assert rebinned.summary().mean_energy == pytest.approx(spectrum.summary().mean_energy, rel=1e-3)
+
+        def test_same_grid(self):
+            spectrum = read_reference_spectrum()
+            assert np.allclose(spectrum.rebin(spectrum.energy).values, spectrum.values)
+
+    class TestSummary:
+        def setup_method(self):
+            self.spectrum = read_spectrum(REFERENCE_SPECTRUM)
+
+        def test_matches_loop_implementation(self):
+            energy, fluence, kerma = self.spectrum.energy, self.spectrum.values, self.spectrum.kerma
+            total_fluence = sum(fluence)
+            mean_energy = sum(e * f for e, f in zip(energy, fluence)) / total_fluence
+            spread = np.sqrt(sum(f * (e - mean_energy) ** 2 for e, f in zip(energy, fluence)) / total_fluence)
+            kerma_mean_energy = sum(e * k for e, k in zip(energy, kerma)) / sum(kerma)
+            summary = self.spectrum.summary()
+            assert summary.total_fluence == pytest.approx(total_fluence)
+            assert summary.air_kerma == pytest.approx(sum(kerma))
+            assert summary.mean_energy == pytest.approx(mean_energy)
+            assert summary.energy_spread == pytest.approx(spread)
+            assert summary.kerma_mean_energy == pytest.approx(kerma_mean_energy)
+
+        def test_percentiles(self):
+            spectrum = Spectrum([10, 20, 30, 40], [1, 1, 1, 1])
+            summary = spectrum.summary(quantiles=(0.25, 0.5, 0.625))
+            assert np.allclose(summary.percentiles, [10, 20, 25])
+
+        def test_kerma_from_mutr_table(self, tables):
+            mutr_table = tables.mutr
+            spectrum = Spectrum(self.spectrum.energy, self.spectrum.values)
+            assert np.isnan(spectrum.summary().air_kerma)
+            weights = spectrum.kerma_weights(mutr_table)
+            assert spectrum.summary(mutr_table).air_kerma == pytest.approx(weights.sum())
+
+        def test_batch_matches_single_spectra(self):
+            fluence = np.vstack([self.spectrum.values, self.spectrum.values[::-1]])
+            batch = summarize(self.spectrum.energy, fluence)
+            for i, values in enumerate(fluence):
+                single = summarize(self.spectrum.energy, values)
+                assert batch.mean_energy[i] == single.mean_energy
+                assert np.array_equal(batch.percentiles[:, i], single.percentiles)
+
+
+class TestRebin:
+    def test_overlap_fractions(self):
+        # Source edges 0.5, 1.5, 2.5, 3.5; new edges 0.75, 2.25, 3.75
+        assert np.allclose(rebin([1, 2, 3], [1, 1, 1], [1.5, 3]), [1.5, 1.25])
+
+    def test_batch_matches_single_spectra(self):
+        energy = np.linspace(20, 60, 201)
+        values = np.random.default_rng(0).random((5, energy.size))
+        new_energy = np.geomspace(15, 70, 37)
+        assert np.allclose(rebin(energy, values, new_energy), [rebin(energy, row, new_energy) for row in values])
+
+    def test_bin_edges(self):
+        assert np.allclose(bin_edges([1, 2, 4]), [0.5, 1.5, 3, 5])
+
+    def test_decreasing_energies(self):
+        with pytest.raises(ValueError, match="strictly increasing"):
+            rebin([3, 2, 1], [1, 1, 1], [1, 2])
+
+
+class TestReadSpectrum:
+    def test_reference_file(self):
+        spectrum = read_spectrum(REFERENCE_SPECTRUM)
+        assert spectrum.energy[0] == 20
+        assert spectrum.kerma is not None
+        assert len(spectrum.energy) == len(spectrum.values) == len(spectrum.kerma)
+
+    def test_without_kerma(self, tmp_path):
+        file_path = tmp_path / 'spectrum.csv'
+        file_path.write_text("E,F\n10,1\n20,2\n")
+        assert read_spectrum(file_path).kerma is None
+
+    def test_invalid_file_type(self):
+        with pytest.raises(ValueError, match="Unsupported file type"):
+            read_spectrum('spectrum.txt')
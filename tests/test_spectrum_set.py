@@ -0,0 +1,110 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.spectrometry.spectrometry import Spectrum
+from src.spectrometry.spectrum_set import SpectrumSet, read_spectra
+
+REFERENCE_SPECTRA = ['dev/reference/N40.csv', 'dev/reference/N60.csv']
+
+
+def make_set(spectra=6):
+    energy = np.linspace(20, 120, 501)
+    centers = np.linspace(40, 90, spectra)
+    values = np.exp(-(energy - centers[:, None]) ** 2 / 200)
+    metadata = pd.DataFrame({'kvp': np.linspace(50, 100, spectra)})
+    return SpectrumSet(energy, values, [f'S{i}' for i in range(spectra)], metadata)
+
+
+class TestSpectrumSet:
+    class TestConstructor:
+        def test_contiguous_values(self):
+            spectra = make_set()
+            assert spectra.values.flags['C_CONTIGUOUS']
+            assert len(spectra) == 6
+            assert list(spectra.metadata.index) == list(spectra.names)
+
+        def test_shape_mismatch(self):
+            with pytest.raises(ValueError, match="one column per energy"):
+                SpectrumSet([1, 2, 3], np.ones((2, 4)))
+
+        def test_names_mismatch(self):
+            with pytest.raises(ValueError, match="one name per spectrum"):
+                SpectrumSet([1, 2, 3], np.ones((2, 3)), names=['a'])
+
+    class TestFromSpectra:
+        def test_rebins_to_common_energy(self):
+            spectra = SpectrumSet.from_spectra([Spectrum([1, 2, 3], [1, 1, 1]), Spectrum([1, 3], [2, 2])],
+                                               energy=[1, 2, 3])
+            # The second spectrum loses the content outside the new edges, 0.5 and 3.5
+            assert np.allclose(spectra.values, [[1, 1, 1], [1, 1, 1]])
+
+        def test_different_energies(self):
+            with pytest.raises(ValueError, match="different energies"):
+                SpectrumSet.from_spectra([Spectrum([1, 2, 3], [1, 1, 1]), Spectrum([1, 3], [2, 2])])
+
+        def test_read_spectra(self):
+            spectra = read_spectra(REFERENCE_SPECTRA, energy=np.arange(20, 301, 1.0))
+            assert list(spectra.names) == ['N40', 'N60']
+            assert spectra.kerma is not None
+
+    class TestSelection:
+        def test_single_spectrum(self):
+            spectra = make_set()
+            assert isinstance(spectra['S2'], Spectrum)
+            assert np.array_equal(spectra['S2'].values, spectra[2].values)
+
+        def test_subsets(self):
+            spectra = make_set()
+            assert list(spectra[1:3].names) == ['S1', 'S2']
+            assert list(spectra[['S4', 'S0']].names) == ['S4', 'S0']
+            subset = spectra[spectra.metadata['kvp'].values > 75]
+            assert list(subset.metadata['kvp']) == [80, 90, 100]
+
+        def test_unknown_names(self):
+            with pytest.raises(ValueError, match="Unknown names"):
+                make_set()[['S0', 'X']]
+
+    class TestArithmetic:
+        def test_sum_and_add(self):
+            spectra = make_set()
+            assert np.allclose(spectra.sum().values, sum(spectrum.values for spectrum in spectra))
+            assert np.allclose((spectra + spectra).values, 2 * spectra.values)
+
+        def test_scale(self):
+            spectra = make_set()
+            assert np.allclose(spectra.scale(np.arange(6)).values[3], 3 * spectra.values[3])
+
+        def test_normalize(self, tables):
+            mutr = tables.mutr
+            spectra = make_set()
+            assert np.allclose(spectra.normalize().values.sum(axis=1), 1)
+            assert np.allclose(spectra.normalize(mutr).kerma_weights(mutr).sum(axis=1), 1)
+
+    class TestVectorizedOperations:
+        @pytest.fixture(autouse=True)
+        def setup(self, tables):
+            self.spectra = make_set()
+            self.hk, self.ka, self.mutr, self.mu = tables.hk['H10'], tables.hk['Ka'], tables.mutr, tables.mu
+
+        def test_interpolate_matches_spectrum(self):
+            new_energy = np.linspace(25, 115, 77)
+            interpolated = self.spectra.interpolate(new_energy)
+            assert np.allclose(interpolated.values[4], self.spectra[4].interpolate(new_energy).values)
+
+        def test_summary_matches_spectrum(self):
+            summary = self.spectra.summary(self.mutr)
+            single = self.spectra[3].summary(self.mutr)
+            assert summary.air_kerma[3] == pytest.approx(single.air_kerma)
+            assert summary.percentiles[:, 3] == pytest.approx(single.percentiles)
+
+        def test_hvl_matches_spectrum(self):
+            hvl = self.spectra.calculate_hvl(self.mu, self.mutr, density=2.699)
+            assert hvl['S5'] == pytest.approx(self.spectra[5].calculate_hvl(self.mu, self.mutr, density=2.699))
+
+        def test_conversion_coefficients_match_spectrum(self):
+            coefficients = self.spectra.conversion_coefficients(self.hk, self.mutr)
+            assert list(coefficients.columns) == ['0', '90']
+            expected = self.spectra[1].angular_conversion_coefficients(self.hk, self.mutr)
+            assert np.allclose(coefficients.loc['S1'], expected)
+            assert np.allclose(self.spectra.conversion_coefficients(self.ka, self.mutr), 1)
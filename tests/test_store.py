@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.spectrometry.batch import BatchResult
+from src.spectrometry.store import COLUMNS, ResultStore, parameters_hash
+
+RESULTS = [BatchResult('N60', 'hvl', 'absorber', '', 2.5, 0.01),
+           BatchResult('N60', 'hk', 'H10', '0', 1.5, 0.03),
+           BatchResult('N60', 'hk', 'H10', '90', 0.6, float('nan')),
+           BatchResult('N40', 'hk', 'H10', '0', 1.2, 0.024),
+           BatchResult('N40', 'hk', 'Ka', '', 1.0, 0.0)]
+
+
+@pytest.fixture
+def store():
+    with ResultStore() as store:
+        yield store
+
+
+class TestResultStore:
+    def test_insert_and_query(self, store):
+        assert store.insert('2024-05', RESULTS, 'abc') == 5
+        assert len(store) == 5
+        results = store.query(spectrum='N60', table='H10', angle='0')
+        assert list(results.columns) == COLUMNS
+        assert results.iloc[0].tolist() == ['2024-05', 'N60', 'hk', 'H10', '0', 1.5, 0.03, pytest.approx(2.0), 'abc']
+
+    def test_missing_uncertainty_is_null(self, store):
+        store.insert('2024-05', RESULTS)
+        results = store.query(angle='90')
+        assert np.isnan(results['sd'].iloc[0]) and np.isnan(results['cv'].iloc[0])
+
+    def test_history_across_campaigns(self, store):
+        for month in range(1, 13):
+            store.insert(f'2024-{month:02d}', [BatchResult('N60', 'hk', 'H10', '45', 1.0 + month, 0.01)])
+        assert store.campaigns()[0] == '2024-01'
+        history = store.query(spectrum='N60', table='H10', angle=45, last=3)
+        assert history['campaign'].tolist() == ['2024-10', '2024-11', '2024-12']
+        assert history['mean'].tolist() == [11.0, 12.0, 13.0]
+
+    def test_insert_again_replaces(self, store):
+        store.insert('2024-05', RESULTS, 'abc')
+        store.insert('2024-05', [BatchResult('N60', 'hvl', 'absorber', '', 2.6, 0.01)], 'abc')
+        store.insert('2024-05', [BatchResult('N60', 'hvl', 'absorber', '', 2.7, 0.01)], 'def')
+        assert store.query(quantity='hvl')['mean'].tolist() == [2.6, 2.7]
+
+    def test_persistence(self, tmp_path):
+        with ResultStore(tmp_path / 'results.db') as store:
+            store.insert('2024-05', RESULTS)
+        with ResultStore(tmp_path / 'results.db') as store:
+            assert len(store) == 5
+
+    def test_queries_use_the_index(self, store):
+        plan = store._connection.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM results WHERE spectrum = ? AND table_name = ? AND angle = ?",
+            ('N60', 'H10', '0')).fetchall()
+        assert 'results_lookup' in str(plan)
+
+
+class TestExportText:
+    def test_legacy_layout(self, store, tmp_path):
+        store.insert('2024-05', RESULTS)
+        paths = store.export_text(tmp_path / 'txt')
+        assert sorted(os.path.basename(path) for path in paths) == ['H10_0.txt', 'H10_90.txt', 'KA.txt']
+        h10 = pd.read_csv(tmp_path / 'txt' / 'H10_0.txt')
+        assert list(h10.columns) == ['_Nombre', '_Media_Espectro_0', '______Desviación______',
+                                     '_______V_HPK_______']
+        assert h10['_Nombre'].tolist() == ['N60', 'N40']
+        assert h10['_______V_HPK_______'].tolist() == pytest.approx([2.0, 2.0])
+        assert list(pd.read_csv(tmp_path / 'txt' / 'KA.txt').columns)[1] == '__Media_Espectro__'
+
+    def test_append_without_header(self, store, tmp_path):
+        store.insert('2024-05', RESULTS)
+        store.export_text(tmp_path)
+        store.export_text(tmp_path)
+        assert len(pd.read_csv(tmp_path / 'H10_0.txt')) == 4
+
+
+def test_parameters_hash():
+    assert parameters_hash(method='Akima1D', trials=10) == parameters_hash(trials=10, method='Akima1D')
+    assert parameters_hash(method='Akima1D', trials=10) != parameters_hash(method='Akima1D', trials=20)
@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.spectrometry.interpolator import Interpolator
+from src.spectrometry.tables import CoefficientTable, as_table, read_table
+
+
+class TestCoefficientTable:
+    def setup_method(self):
+        # Power laws are exactly reproduced by log-log interpolation
+        self.energy = np.array([10., 20., 40., 80., 160., 320.])
+        self.values = 5 * self.energy ** -2.5
+        self.new_energy = np.array([15., 33., 100., 250.])
+
+    def test_log_log_interpolation(self):
+        table = CoefficientTable(self.energy, self.values)
+        assert np.allclose(table(self.new_energy), 5 * self.new_energy ** -2.5)
+
+    def test_multiple_columns(self):
+        values = np.column_stack([self.values, 2 * self.values])
+        table = CoefficientTable(self.energy, values, labels=['a', 'b'])
+        result = table(self.new_energy)
+        assert result.shape == (4, 2)
+        assert np.allclose(result[:, 1], 2 * result[:, 0])
+
+    def test_zero_entries_are_masked(self):
+        values = np.column_stack([self.values, self.values])
+        values[:2, 1] = 0
+        table = CoefficientTable(self.energy, values)
+        result = table(np.array([15., 20., 30., 100.]))
+        # 30 keV is bracketed by an invalid entry (20 keV), 100 keV by two valid ones
+        assert np.all(result[:3, 1] == 0)
+        assert np.allclose(result[3:, 1], result[3:, 0])
+        assert np.allclose(result[:, 0], 5 * np.array([15., 20., 30., 100.]) ** -2.5)
+
+    def test_column_without_valid_entries(self):
+        values = np.column_stack([self.values, np.zeros_like(self.values)])
+        with pytest.raises(ValueError, match="at least one valid value"):
+            CoefficientTable(self.energy, values)
+
+    def test_invalid_shapes(self):
+        with pytest.raises(ValueError, match="same number of rows"):
+            CoefficientTable(self.energy, self.values[:-1])
+
+    def test_invalid_method(self):
+        with pytest.raises(ValueError, match="Invalid interpolation method"):
+            CoefficientTable(self.energy, self.values, method='InvalidMethod')
+
+
+class TestAsTable:
+    def setup_method(self):
+        self.energy = np.array([10., 20., 40., 80.])
+        self.values = np.array([4., 3., 2., 1.])
+
+    def test_table_is_returned_unchanged(self):
+        table = CoefficientTable(self.energy, self.values)
+        assert as_table(table) is table
+
+    def test_from_interpolator(self):
+        table = as_table(Interpolator(x=self.energy, y=self.values))
+        assert np.allclose(table(self.energy), self.values)
+
+    def test_from_dataframe(self):
+        df = pd.DataFrame({'E': self.energy, '0': self.values, '15': 2 * self.values})
+        table = as_table(df)
+        assert table.labels == ['0', '15']
+        assert np.allclose(table(self.energy), df[['0', '15']].values)
+
+    def test_from_array(self):
+        table = as_table(np.column_stack([self.energy, self.values]))
+        assert table.values.ndim == 1
+        assert np.allclose(table(self.energy), self.values)
+
+
+class TestReadTable:
+    def test_semicolon_with_header(self, tmp_path):
+        file_path = tmp_path / 'hp_10_slab.csv'
+        file_path.write_text("E;0;15;30\n10;1.0;0.9;0\n20;1.2;1.1;0.8\n40;1.5;1.4;1.2\n")
+        table = read_table(file_path)
+        assert table.labels == ['0', '15', '30']
+        assert table.values.shape == (3, 3)
+        assert table.mask is not None
+
+    def test_tab_without_header(self, tmp_path):
+        file_path = tmp_path / 'mutr.txt'
+        file_path.write_text("10\t4.6\n20\t0.54\n40\t0.068\n80\t0.024\n")
+        table = read_table(file_path)
+        assert table.values.ndim == 1
+        assert np.allclose(table(np.array([20.])), 0.54)
+
+    def test_file_not_found(self):
+        with pytest.raises(ValueError, match="Error reading file:"):
+            read_table('non_existent_file.csv')
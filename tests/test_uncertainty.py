@@ -0,0 +1,256 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from src.spectrometry.uncertainty import (monte_carlo, conversion_coefficient, conversion_coefficient_mc,
+                                         conversion_coefficient_gum, RunningStatistics, half_value_layer)
+
+
+def make_inputs(coefficients, bins=50):
+    energy = np.linspace(20, 80, bins)
+    fluence = np.exp(-((energy - 50) / 10) ** 2)
+    return energy, fluence, coefficients.mu_tr(energy), coefficients.h10(energy)
+
+
+class TestMonteCarlo:
+    def test_statistics_of_samples(self):
+        result = monte_carlo(lambda x: x.sum(axis=-1), {'x': np.ones(4)}, {'x': 0.1}, trials=1000, seed=1,
+                             return_samples=True)
+        assert result.samples.shape == (1000,)
+        assert result.mean == pytest.approx(result.samples.mean())
+        assert result.std == pytest.approx(result.samples.std())
+        assert result.cv == pytest.approx(result.std * 100 / result.mean)
+        # Sum of 4 independent inputs with sd 0.1
+        assert result.std == pytest.approx(0.2, rel=0.1)
+
+    def test_unperturbed_inputs(self):
+        result = monte_carlo(lambda x: x.sum(axis=-1), {'x': np.ones(4)}, {}, trials=10)
+        assert result.mean == 4
+        assert result.std == 0
+
+    def test_invalid_trials(self):
+        with pytest.raises(ValueError, match="number of trials"):
+            monte_carlo(lambda x: x, {'x': np.ones(4)}, {'x': 0.1}, trials=0)
+
+
+class TestRunningStatistics:
+    def test_merge_matches_direct_computation(self):
+        samples = np.random.default_rng(0).normal(3, 2, size=(1001, 2))
+        statistics = RunningStatistics()
+        for chunk in np.array_split(samples, 7):
+            statistics.update(chunk)
+        result = statistics.result()
+        assert result.trials == 1001
+        assert np.allclose(result.mean, samples.mean(axis=0))
+        assert np.allclose(result.std, samples.std(axis=0))
+
+    def test_quantiles(self):
+        samples = np.random.default_rng(0).normal(0, 1, size=100000)
+        statistics = RunningStatistics(quantiles=(0.025, 0.5, 0.975))
+        for chunk in np.array_split(samples, 10):
+            statistics.update(chunk)
+        expected = np.quantile(samples, (0.025, 0.5, 0.975))
+        assert np.allclose(statistics.result().quantiles, expected, atol=0.01)
+
+
+class TestConversionCoefficientMC:
+    @pytest.fixture(autouse=True)
+    def setup(self, coefficients):
+        self.energy, self.fluence, self.mu_tr, self.hk = make_inputs(coefficients)
+
+    def test_seed_is_reproducible(self):
+        first = conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk, trials=500, seed=7)
+        second = conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk, trials=500, seed=7)
+        assert np.array_equal(first.mean, second.mean)
+        assert np.array_equal(first.std, second.std)
+
+    def test_matches_loop_implementation(self):
+        # Nested loops as in dev/reference/uhk_experimental.py, on the same perturbed inputs
+        trials, bins = 20, len(self.energy)
+        rng = np.random.default_rng(3)
+        energy, fluence, mu_tr = [x * (1 + 0.01 * rng.standard_normal((trials, bins)))
+                                  for x in (self.energy, self.fluence, self.mu_tr)]
+        hpk = np.zeros(trials)
+        for j in range(trials):
+            numerator = denominator = 0.0
+            for i in range(bins):
+                numerator += energy[j, i] * fluence[j, i] * mu_tr[j, i] * self.hk[i, 0]
+                denominator += energy[j, i] * fluence[j, i] * mu_tr[j, i]
+            hpk[j] = numerator / denominator
+        assert np.allclose(conversion_coefficient(energy, fluence, mu_tr, 1.0, self.hk[:, 0]), hpk)
+
+    def test_angles(self):
+        result = conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk, trials=1000, seed=1)
+        nominal = conversion_coefficient(self.energy, self.fluence, self.mu_tr, 1.0, self.hk)
+        assert result.mean.shape == (2,)
+        assert np.allclose(result.mean, nominal, rtol=1e-3)
+
+    def test_chunks_bound_the_trials_in_memory(self):
+        seen = []
+
+        def quantity(**inputs):
+            seen.append(inputs['energy'].shape[0])
+            return conversion_coefficient(hk=self.hk, **inputs)
+
+        nominal = {'energy': self.energy, 'fluence': self.fluence, 'mu_tr': self.mu_tr, 'hk_factor': 1.0}
+        result = monte_carlo(quantity, nominal, {'energy': 0.01}, trials=1050, chunk_size=100, seed=1,
+                             quantiles=(0.5,), return_samples=True)
+        assert max(seen) == 100 and sum(seen) == 1050
+        assert result.samples.shape == (1050, 2)
+        assert result.quantiles.shape == (1, 2)
+        assert np.allclose(result.std, result.samples.std(axis=0))
+
+    def test_memory_budget(self):
+        seen = []
+
+        def quantity(**inputs):
+            seen.append(inputs['energy'].shape[0])
+            return inputs['energy'].sum(axis=-1)
+
+        monte_carlo(quantity, {'energy': self.energy}, {'energy': 0.01}, trials=1000, max_memory=8 * 50 * 5 * 10)
+        assert max(seen) == 10
+
+    def test_hk_uncertainty_increases_spread(self):
+        without = conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk, trials=2000, seed=1)
+        with_hk = conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk, u_hk=0.01, trials=2000,
+                                            seed=1)
+        assert np.all(with_hk.std > without.std)
+
+
+class TestParallelMonteCarlo:
+    @pytest.fixture(autouse=True)
+    def setup(self, coefficients):
+        self.energy, self.fluence, self.mu_tr, self.hk = make_inputs(coefficients)
+
+    def test_result_does_not_depend_on_jobs(self):
+        kwargs = dict(trials=2000, chunk_size=300, seed=11, quantiles=(0.05, 0.95))
+        serial = conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk, jobs=1, **kwargs)
+        parallel = conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk, jobs=3, **kwargs)
+        assert np.array_equal(serial.mean, parallel.mean)
+        assert np.array_equal(serial.std, parallel.std)
+        assert np.array_equal(serial.quantiles, parallel.quantiles)
+
+    def test_chunks_are_independent_streams(self):
+        result = conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk[:, 0], trials=200,
+                                           chunk_size=100, seed=5, return_samples=True)
+        assert not np.array_equal(result.samples[:100], result.samples[100:])
+
+
+class TestSamplingSchemes:
+    @pytest.fixture(autouse=True)
+    def setup(self, coefficients):
+        self.energy, self.fluence, self.mu_tr, self.hk = make_inputs(coefficients)
+        self.nominal = conversion_coefficient(self.energy, self.fluence, self.mu_tr, 1.0, self.hk[:, 0])
+
+    @pytest.mark.parametrize('sampling', ['antithetic', 'sobol'])
+    def test_agrees_with_random_sampling(self, sampling):
+        random = conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk[:, 0], trials=4096,
+                                           chunk_size=1024, seed=2)
+        result = conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk[:, 0], trials=4096,
+                                           chunk_size=1024, seed=2, sampling=sampling)
+        assert result.mean == pytest.approx(self.nominal, rel=1e-4)
+        assert result.std == pytest.approx(random.std, rel=0.1)
+
+    @pytest.mark.parametrize('sampling', ['antithetic', 'sobol'])
+    def test_reduces_error_of_the_mean(self, sampling):
+        means = {}
+        for scheme in ('random', sampling):
+            means[scheme] = [conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk[:, 0],
+                                                       trials=256, seed=seed, sampling=scheme).mean
+                             for seed in range(20)]
+        assert np.std(means[sampling]) < np.std(means['random'])
+
+    def test_sobol_does_not_depend_on_jobs(self):
+        kwargs = dict(trials=1024, chunk_size=256, seed=4, sampling='sobol')
+        serial = conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk, **kwargs)
+        parallel = conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk, jobs=2, **kwargs)
+        assert np.array_equal(serial.mean, parallel.mean)
+
+    def test_sobol_chunks_are_powers_of_two(self):
+        # 100 KB for 3 perturbed inputs of 50 bins: 28 trials per chunk, rounded down to 16
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            result = conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk, trials=1024, seed=1,
+                                               max_memory=100_000, sampling='sobol')
+        assert result.trials == 1024
+
+    def test_sobol_dimension_limit(self):
+        with pytest.raises(ValueError, match="supports up to 21201 perturbed values"):
+            monte_carlo(lambda x: x.sum(axis=-1), {'x': np.ones(30_000)}, {'x': 0.1}, trials=16, sampling='sobol')
+
+    def test_invalid_sampling(self):
+        with pytest.raises(ValueError, match="Invalid sampling scheme"):
+            conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk, sampling='invalid')
+
+
+class TestAdaptiveStopping:
+    @pytest.fixture(autouse=True)
+    def setup(self, coefficients):
+        self.energy, self.fluence, self.mu_tr, self.hk = make_inputs(coefficients)
+
+    def test_stops_when_tolerance_is_reached(self):
+        result = conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk, trials=10 ** 6,
+                                           chunk_size=500, seed=1, tolerance=1e-4)
+        assert result.trials < 10 ** 6
+        assert result.trials % 500 == 0
+        assert np.all(result.std / np.sqrt(2 * (result.trials - 1)) < 1e-4)
+
+    def test_stopping_point_does_not_depend_on_jobs(self):
+        kwargs = dict(trials=10 ** 5, chunk_size=200, seed=1, tolerance=2e-4)
+        serial = conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk, **kwargs)
+        parallel = conversion_coefficient_mc(self.energy, self.fluence, self.mu_tr, self.hk, jobs=2, **kwargs)
+        assert serial.trials == parallel.trials
+        assert np.array_equal(serial.std, parallel.std)
+
+
+class TestConversionCoefficientGUM:
+    @pytest.fixture(autouse=True)
+    def setup(self, coefficients):
+        self.energy, self.fluence, self.mu_tr, self.hk = make_inputs(coefficients)
+
+    def test_value(self):
+        result = conversion_coefficient_gum(self.energy, self.fluence, self.mu_tr, self.hk)
+        assert np.allclose(result.value, conversion_coefficient(self.energy, self.fluence, self.mu_tr, 1.0, self.hk))
+
+    def test_budget_combines_to_uncertainty(self):
+        result = conversion_coefficient_gum(self.energy, self.fluence, self.mu_tr, self.hk, u_hk=0.01)
+        assert set(result.budget) == {'energy', 'fluence', 'mu_tr', 'hk'}
+        combined = np.sqrt(sum(contribution ** 2 for contribution in result.budget.values()))
+        assert np.allclose(result.uncertainty, combined)
+        assert np.allclose(result.cv, result.uncertainty * 100 / result.value)
+
+    def test_matches_numerical_sensitivities(self):
+        u = 0.01
+        result = conversion_coefficient_gum(self.energy, self.fluence, self.mu_tr, self.hk[:, 0], u_energy=u,
+                                            u_fluence=0, u_mu_tr=0)
+        nominal = conversion_coefficient(self.energy, self.fluence, self.mu_tr, 1.0, self.hk[:, 0])
+        contributions = []
+        for i in range(len(self.energy)):
+            energy = self.energy.copy()
+            energy[i] *= 1 + 1e-6
+            derivative = (conversion_coefficient(energy, self.fluence, self.mu_tr, 1.0, self.hk[:, 0]) - nominal)
+            contributions.append(derivative / 1e-6 * u)
+        assert result.uncertainty == pytest.approx(np.sqrt(np.sum(np.square(contributions))), rel=1e-4)
+
+    def test_cross_check_with_monte_carlo(self):
+        result = conversion_coefficient_gum(self.energy, self.fluence, self.mu_tr, self.hk, u_hk=0.01,
+                                            cross_check=True, trials=20000, seed=1)
+        assert np.allclose(result.monte_carlo.std, result.uncertainty, rtol=0.05)
+
+
+class TestHalfValueLayer:
+    def test_monoenergetic(self):
+        # A single energy is attenuated exponentially: HVL = ln(2) / mu
+        hvl = half_value_layer(np.array([60.]), np.array([1.]), np.array([0.3]), np.array([0.05]))
+        assert hvl == pytest.approx(np.log(2) / 0.3)
+
+    def test_batch_of_trials(self, coefficients):
+        energy, fluence, mu_tr, _ = make_inputs(coefficients)
+        mu = coefficients.mu(energy)
+        batch = np.vstack([fluence, 2 * fluence, fluence[::-1]])
+        result = half_value_layer(energy, batch, mu, mu_tr)
+        expected = [half_value_layer(energy, row, mu, mu_tr) for row in batch]
+        assert result.shape == (3,)
+        assert np.allclose(result, expected, rtol=1e-12)
+        assert result[0] == pytest.approx(result[1])
@@ -0,0 +1,95 @@
+import os
+import shutil
+from threading import Event, Thread
+from time import monotonic, sleep
+
+import pytest
+
+from src.spectrometry.spectrometry import read_spectrum
+from src.spectrometry.watch import INOTIFY_AVAILABLE, FolderWatcher, watch
+
+BACKENDS = ['poll', pytest.param('inotify', marks=pytest.mark.skipif(not INOTIFY_AVAILABLE,
+                                                                      reason="inotify_simple is not installed"))]
+
+
+def wait_for(watcher, timeout=5):
+    deadline = monotonic() + timeout
+    paths = []
+    while not paths and monotonic() < deadline:
+        paths = watcher.changes(timeout=0.1)
+    return paths
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+class TestFolderWatcher:
+    def test_new_and_modified_files(self, tmp_path, backend):
+        shutil.copy('dev/reference/N15.csv', tmp_path)
+        with FolderWatcher(tmp_path, interval=0.05, backend=backend) as watcher:
+            assert watcher.changes(timeout=0.2) == []
+            shutil.copy('dev/reference/N60.csv', tmp_path)
+            (tmp_path / 'notes.txt').write_text('not a spectrum')
+            assert wait_for(watcher) == [os.path.join(str(tmp_path), 'N60.csv')]
+            with open(tmp_path / 'N15.csv', 'a') as file:
+                file.write('\n')
+            assert wait_for(watcher) == [os.path.join(str(tmp_path), 'N15.csv')]
+            assert watcher.changes(timeout=0.2) == []
+
+    def test_existing_files(self, tmp_path, backend):
+        shutil.copy('dev/reference/N15.csv', tmp_path)
+        with FolderWatcher(tmp_path, backend=backend, existing=True) as watcher:
+            assert watcher.changes(timeout=0) == [os.path.join(str(tmp_path), 'N15.csv')]
+
+
+class TestFolderWatcherErrors:
+    def test_missing_directory(self, tmp_path):
+        with pytest.raises(ValueError, match="Not a directory"):
+            FolderWatcher(tmp_path / 'missing')
+
+    def test_invalid_backend(self, tmp_path):
+        with pytest.raises(ValueError, match="Invalid backend"):
+            FolderWatcher(tmp_path, backend='kqueue')
+
+
+class TestWatch:
+    def test_results_of_new_files(self, tmp_path, tables):
+        hk, mutr, mu = {'H10': tables.hk['H10']}, tables.mutr, tables.mu
+        stop, ingested = Event(), []
+
+        def run():
+            for item in watch(tmp_path, hk, mutr, mu, density=2.699, interval=0.05, existing=True, stop=stop):
+                ingested.append((monotonic(), item))
+
+        def wait(count):
+            deadline = monotonic() + 30
+            while len(ingested) < count and monotonic() < deadline:
+                sleep(0.01)
+
+        thread = Thread(target=run)
+        thread.start()
+        try:
+            # Files that arrive while the kernels are compiled are processed afterwards
+            shutil.copy('dev/reference/N40.csv', tmp_path / 'N40.tmp')
+            os.replace(tmp_path / 'N40.tmp', tmp_path / 'N40.csv')
+            wait(1)
+            arrival = monotonic()
+            shutil.copy('dev/reference/N60.csv', tmp_path)
+            wait(2)
+            (tmp_path / 'broken.csv').write_text('not,a\nspectrum')
+            wait(3)
+        finally:
+            stop.set()
+            thread.join()
+
+        items = {os.path.basename(item.path): (time, item) for time, item in ingested}
+        assert set(items) == {'N40.csv', 'N60.csv', 'broken.csv'}
+        time, n60 = items['N60.csv']
+        assert time - arrival < 1
+        assert n60.error is None
+        assert [(result.quantity, result.angle) for result in n60.results] == [('hvl', ''), ('hk', '0'), ('hk', '90')]
+        hvl = read_spectrum('dev/reference/N60.csv').calculate_hvl(mu, mutr, density=2.699)
+        assert n60.results[0].value == pytest.approx(hvl)
+        assert items['broken.csv'][1].results == [] and items['broken.csv'][1].error
+
+    def test_missing_mutr_table(self, tmp_path):
+        with pytest.raises(ValueError, match="mutr/rho table of air is required"):
+            next(watch(tmp_path))